@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import tracemalloc
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from template import compile_template
+
+
+def legacy_fill(template_content, title, html_content, basepath):
+    """The previous generate_page approach: four full passes over the page."""
+    final_html = template_content.replace("{{ Title }}", title)
+    final_html = final_html.replace("{{ Content }}", html_content)
+    final_html = final_html.replace('href="/', f'href="{basepath}')
+    final_html = final_html.replace('src="/', f'src="{basepath}')
+    return final_html
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(20):
+        fn()
+    elapsed = (time.perf_counter() - start) / 20
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label}: {elapsed * 1000:.2f} ms per page, peak {peak / 1e6:.1f} MB")
+
+
+def main():
+    template_path = os.path.join(os.path.dirname(__file__), '..', 'template.html')
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template_content = f.read()
+
+    paragraph = '<p>Some text with a <a href="/blog/tom">link</a> and <img src="/images/tom.png" alt="tom"></img></p>'
+    html_content = "<div>" + paragraph * 50000 + "</div>"
+    print(f"Content size: {len(html_content) / 1e6:.1f} MB")
+
+    compiled = compile_template(template_content)
+    values = {"Title": "Big page", "Content": html_content, "basepath": "/static-site-gen/"}
+
+    def legacy():
+        with open(os.devnull, 'w', encoding='utf-8') as out:
+            out.write(legacy_fill(template_content, "Big page", html_content, "/static-site-gen/"))
+
+    def single_pass():
+        with open(os.devnull, 'w', encoding='utf-8') as out:
+            compiled.write(out, values)
+
+    measure("Four passes ", legacy)
+    measure("Single pass ", single_pass)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from incremental import build_site
+from manifest import file_hash
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    root = os.path.join(os.path.dirname(__file__), '..')
+    template_path = os.path.join(root, 'template.html')
+
+    with open(os.path.join(root, 'content', 'index.md'), 'r', encoding='utf-8') as f:
+        sample = f.read()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        content_dir = os.path.join(temp_dir, "content")
+        static_dir = os.path.join(root, 'src', 'static')
+        dest_dir = os.path.join(temp_dir, "docs")
+        md_paths = []
+        for i in range(count):
+            page_dir = os.path.join(content_dir, f"section{i % 100}", f"page{i}")
+            os.makedirs(page_dir)
+            path = os.path.join(page_dir, "index.md")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(sample.replace("Tolkien Fan Club", f"Page {i}", 1))
+            md_paths.append(path)
+        print(f"Pages: {count}")
+
+        for label in ("Full build", "No-op rebuild"):
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                result = build_site(static_dir, content_dir, template_path, dest_dir)
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {elapsed:.2f}s ({len(result.rendered)} rendered, {result.unchanged} unchanged)")
+
+        start = time.perf_counter()
+        for path in md_paths:
+            file_hash(path)
+        print(f"Hashing inputs alone: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import time
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from generate_page import page_values
+from link_check import check_links
+from page_index import PageIndex
+
+
+def page_links(i, count):
+    """Links of a typical blog post: navigation, neighbours, images and external sites."""
+    links = [("link", "/"), ("link", "/blog/"), ("link", "/about"), ("image", "/images/logo.png"),
+             ("link", f"post{(i + 1) % count}.html"), ("link", f"post{(i - 1) % count}.html"),
+             ("image", f"/images/post{i}.png"), ("link", "https://example.com/reference"),
+             ("link", "#comments"), ("link", f"/blog/post{(i * 7) % count}.html")]
+    if i % 1000 == 0:
+        links.append(("image", f"/images/missing{i}.png"))
+    return links
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as root:
+        dest_dir = os.path.join(root, "docs")
+        index = PageIndex.open(dest_dir)
+        targets = {"index.html", "about.html", "blog/index.html", "images/logo.png"}
+        for i in range(count):
+            index.put(f"blog/post{i}.html", f"blog/post{i}.md", f"/blog/post{i}.html", f"Post {i}", 300,
+                      page_links(i, count), 0)
+            targets.add(f"blog/post{i}.html")
+            targets.add(f"images/post{i}.png")
+        index.commit()
+
+        start = time.perf_counter()
+        broken = check_links(index.all_links(), targets, lambda output: output[:-len(".html")] + ".md", root)
+        checked = time.perf_counter() - start
+        index.close()
+        print(f"Pages: {count}, {len(broken)} broken links")
+        print(f"Link check: {checked * 1000:.0f} ms ({checked / count * 1e6:.1f} us per page)")
+
+        # Rendering a page of the same size, for comparison with the build
+        markdown = "# Post\n\n" + "\n\n".join(
+            f"Some *text* about [post {n}](post{n}.html) and ![image](/images/post{n}.png), "
+            f"with `code` and **bold** words." for n in range(10))
+        samples = 1000
+        start = time.perf_counter()
+        for _ in range(samples):
+            page_values(markdown, "/", info={})
+        rendered = (time.perf_counter() - start) / samples
+        print(f"Rendering: {rendered * 1e6:.1f} us per page; "
+              f"link check adds {checked / count / rendered * 100:.1f}% to rendering alone")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from depgraph import DependencyResolver
+from incremental import BuildResult, _update_generated
+from page_index import PageIndex
+
+
+def update(index, root, previous):
+    """Bring the listings up to date; returns (entries, result)."""
+    entries = {}
+    result = BuildResult()
+    resolver = DependencyResolver(os.path.join(root, "content"), root, {})
+    with redirect_stdout(io.StringIO()):
+        _update_generated(index, os.path.join(root, "content"), os.path.join(root, "template.html"),
+                          os.path.join(root, "docs"), "/", resolver, None, None, None, previous, entries,
+                          result)
+    return entries, result
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    entries, result = function()
+    print(f"{label}: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({len(result.rendered)} listing pages written)")
+    return entries
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "content"))
+        with open(os.path.join(root, "template.html"), 'w', encoding='utf-8') as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+
+        # Rows as the render pass leaves them; no markdown is read below
+        index = PageIndex.open(os.path.join(root, "docs"))
+        for i in range(count):
+            index.put(f"blog/post{i}.html", f"blog/post{i}.md", f"/blog/post{i}.html", f"Post {i}", 500,
+                      [], 0, f"2020-01-01T00:00:{i % 60:02}", f"Summary of post {i}")
+        index.commit()
+        print(f"Posts: {count}")
+
+        entries = timed("First build", lambda: update(index, root, {}))
+        entries = timed("No-op rebuild", lambda: update(index, root, entries))
+        index.put("blog/post123.html", "blog/post123.md", "/blog/post123.html", "Renamed", 500,
+                  [], 0, "2020-01-01T00:00:03", "Summary of post 123")
+        timed("One title changed", lambda: update(index, root, entries))
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from block_markdown import markdown_to_html_node
+from node_factory import NodeFactory
+
+
+def load_content(content_dir, scale):
+    """
+    Read every markdown file in the content tree, scale times over.
+
+    Paragraph lines get the copy number appended, so each copy has text of
+    its own like a real page, while headings, list items and code repeat.
+    """
+    documents = []
+    for root, dirs, files in os.walk(content_dir):
+        for file in sorted(files):
+            if file.endswith('.md'):
+                with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                    documents.append(f.read())
+
+    copies = []
+    for i in range(scale):
+        for md in documents:
+            lines = [f"{line} {i}" if line[:1].isalpha() else line for line in md.splitlines()]
+            copies.append("\n".join(lines))
+    return copies
+
+
+def render_all(documents, factory):
+    """Render the documents one at a time, as a build does, keeping no trees."""
+    start = time.perf_counter()
+    size = 0
+    for md in documents:
+        size += len(markdown_to_html_node(md, factory).to_html())
+    return time.perf_counter() - start, size
+
+
+def run_mode(mode, scale):
+    """Render in this process and print one result line."""
+    documents = load_content(os.path.join(os.path.dirname(__file__), '..', 'content'), scale)
+    factory = {"plain": None, "unbounded": NodeFactory(max_nodes=None), "bounded": NodeFactory()}[mode]
+    elapsed, size = render_all(documents, factory)
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    line = f"{mode:10s} {elapsed:.3f}s  peak RSS {peak:.1f} MB  output {size / 1e6:.1f} MB"
+    if factory is not None:
+        line += f"  ({factory.requests} node requests, {factory.unique_nodes()} nodes kept)"
+    print(line)
+
+
+def main():
+    if sys.argv[1:2] == ["--mode"]:
+        return run_mode(sys.argv[2], int(sys.argv[3]))
+
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"Rendering the content tree x{scale}")
+    # Each mode runs in a fresh process, since peak RSS never goes down
+    for mode in ("plain", "unbounded", "bounded"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, str(scale)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from generate_page import generate_pages_recursive
+
+
+def build_site(content_src, content_dir, copies):
+    """Replicate the real content tree into many sections."""
+    for i in range(copies):
+        shutil.copytree(content_src, os.path.join(content_dir, f"copy{i}"))
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    root = os.path.join(os.path.dirname(__file__), '..')
+    template_path = os.path.join(root, 'template.html')
+    cpus = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        content_dir = os.path.join(temp_dir, "content")
+        build_site(os.path.join(root, 'content'), content_dir, copies)
+        print(f"Pages: {copies * 5}, CPUs: {cpus}")
+
+        job_counts = sorted({1, 2, 4, 8, cpus})
+        baseline = None
+        for jobs in job_counts:
+            dest_dir = os.path.join(temp_dir, f"docs{jobs}")
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content_dir, template_path, dest_dir, "/", jobs=jobs)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"jobs={jobs}: {elapsed:.2f}s  speedup x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from page_index import PageIndex
+from search import write_search_index
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    written = function()
+    changed = sum(1 for _, file_changed in written if file_changed)
+    print(f"{label}: {(time.perf_counter() - start) * 1000:.0f} ms ({len(written)} files, {changed} written)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    with tempfile.TemporaryDirectory() as root:
+        dest_dir = os.path.join(root, "docs")
+        # A vocabulary with a long tail, like real prose
+        rng = random.Random(1)
+        vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+                      for _ in range(20000)]
+        index = PageIndex.open(dest_dir)
+        for i in range(count):
+            words = rng.choices(vocabulary, weights=[1 / (rank + 1) for rank in range(len(vocabulary))], k=300)
+            terms = {}
+            for word in words:
+                terms[word] = terms.get(word, 0) + 1
+            index.put(f"blog/post{i}.html", f"blog/post{i}.md", f"/blog/post{i}.html", f"Post {i}", 300,
+                      [], 0, terms=terms)
+        index.commit()
+        print(f"Pages: {count}")
+
+        timed("First write", lambda: write_search_index(dest_dir, index.terms()))
+        timed("Unchanged", lambda: write_search_index(dest_dir, index.terms()))
+        index.put("blog/post1.html", "blog/post1.md", "/blog/post1.html", "Post 1", 1, [], 0,
+                  terms={"zyzzyva": 1})
+        timed("One page changed", lambda: write_search_index(dest_dir, index.terms()))
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
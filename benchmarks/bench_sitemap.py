@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from page_index import PageIndex
+from sitemap import sitemap_pages, write_sitemaps
+
+
+def timed(label, function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        written = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    changed = sum(1 for _, file_changed in written if file_changed)
+    print(f"{label}: {elapsed * 1000:.0f} ms, peak {peak / 1024:.0f} KB "
+          f"({len(written)} files, {changed} written)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 120000
+
+    with tempfile.TemporaryDirectory() as root:
+        dest_dir = os.path.join(root, "docs")
+        # Rows as the render pass leaves them
+        index = PageIndex.open(dest_dir)
+        for i in range(count):
+            index.put(f"blog/post{i:06}.html", f"blog/post{i:06}.md", f"/blog/post{i:06}.html", f"Post {i}",
+                      500, [], i * 1_000_000_000)
+        index.commit()
+        outputs = sorted(index.outputs())
+        print(f"Pages: {count}")
+
+        def pages():
+            return sitemap_pages(outputs, index.modified_times(), dest_dir)
+
+        timed("First write", lambda: write_sitemaps(dest_dir, pages, "/", "https://example.com"))
+        timed("Unchanged", lambda: write_sitemaps(dest_dir, pages, "/", "https://example.com"))
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
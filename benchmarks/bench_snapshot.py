@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import time
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from generate_page import find_pages
+from snapshot import TreeSnapshot
+
+
+def walk_with_stats(root):
+    """How the copy and generate stages listed a tree before snapshots."""
+    record = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(dirpath, file)
+            stat = os.stat(path)
+            record[os.path.relpath(path, root)] = (stat.st_size, stat.st_mtime_ns)
+    return record
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    value = function()
+    print(f"{label}: {(time.perf_counter() - start) * 1000:.0f} ms")
+    return value
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        content_dir = os.path.join(temp_dir, "content")
+        for i in range(count):
+            page_dir = os.path.join(content_dir, f"section{i % 100}")
+            if i < 100:
+                os.makedirs(page_dir)
+            with open(os.path.join(page_dir, f"page{i}.md"), 'w', encoding='utf-8') as f:
+                f.write(f"# Page {i}\n")
+        print(f"Files: {count}")
+
+        timed("os.walk + relpath + stat", lambda: walk_with_stats(content_dir))
+        snapshot = timed("TreeSnapshot (no stats)", lambda: TreeSnapshot(content_dir))
+        print(f"  directory reads: {snapshot.reads}")
+        timed("  + size and mtime of every file", lambda: [entry.record() for entry in snapshot.files()])
+        timed("find_pages from the snapshot", lambda: find_pages(content_dir, "template.html", "docs", snapshot))
+
+        changed = [os.path.join(content_dir, "section7", "page7.md")]
+        timed("Update after one change", lambda: snapshot.update(changed))
+
+
+if __name__ == "__main__":
+    main()
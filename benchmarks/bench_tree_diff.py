@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from htmlnode import LeafNode, ParentNode
+from tree_diff import diff_trees
+
+
+def build_page(sections, items_per_section, changed=None):
+    """Build a page with sections of list items, roughly 3 nodes per item."""
+    children = []
+    for s in range(sections):
+        items = []
+        for i in range(items_per_section):
+            text = f"section {s} item {i}"
+            if changed == (s, i):
+                text = "changed"
+            items.append(ParentNode("li", [LeafNode(None, text), LeafNode("b", "!")]))
+        children.append(ParentNode("ul", items))
+    return ParentNode("div", children)
+
+
+def count_nodes(node):
+    if node.children is None:
+        return 1
+    return 1 + sum(count_nodes(child) for child in node.children)
+
+
+def main():
+    old = build_page(100, 334)
+    new = build_page(100, 334, changed=(50, 100))
+    print(f"Nodes per tree: {count_nodes(old)}")
+
+    start = time.perf_counter()
+    ops = diff_trees(old, new)
+    elapsed = time.perf_counter() - start
+    print(f"One changed leaf: {len(ops)} ops in {elapsed * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    ops = diff_trees(old, build_page(100, 334))
+    elapsed = time.perf_counter() - start
+    print(f"Identical trees: {len(ops)} ops in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# Add src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from incremental import build_site, rebuild_changed
+from manifest import BuildManifest
+from watcher import create_watcher, wait_for_changes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    edits = 20
+    root = os.path.join(os.path.dirname(__file__), '..')
+    template_path = os.path.join(root, 'template.html')
+
+    with open(os.path.join(root, 'content', 'index.md'), 'r', encoding='utf-8') as f:
+        sample = f.read()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        content_dir = os.path.join(temp_dir, "content")
+        static_dir = os.path.join(root, 'src', 'static')
+        dest_dir = os.path.join(temp_dir, "docs")
+        for i in range(count):
+            page_dir = os.path.join(content_dir, f"section{i % 100}", f"page{i}")
+            os.makedirs(page_dir)
+            with open(os.path.join(page_dir, "index.md"), 'w', encoding='utf-8') as f:
+                f.write(sample.replace("Tolkien Fan Club", f"Page {i}", 1))
+        print(f"Pages: {count}")
+
+        with redirect_stdout(io.StringIO()):
+            build_site(static_dir, content_dir, template_path, dest_dir)
+        manifest = BuildManifest.load(dest_dir)
+
+        start = time.perf_counter()
+        watcher = create_watcher([content_dir, static_dir], [template_path])
+        print(f"{type(watcher).__name__} set up in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        # Time from saving a file to its page being written
+        latencies = []
+        for i in range(edits):
+            path = os.path.join(content_dir, f"section{i % 100}", f"page{i}", "index.md")
+            start = time.perf_counter()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(sample.replace("Tolkien Fan Club", f"Edited page {i}", 1))
+            changed = wait_for_changes(watcher, timeout=5)
+            with redirect_stdout(io.StringIO()):
+                result, manifest = rebuild_changed(changed, static_dir, content_dir, template_path,
+                                                   dest_dir, manifest=manifest, save=False)
+            latencies.append(time.perf_counter() - start)
+            assert len(result.rendered) == 1
+        watcher.close()
+        manifest.save()
+
+        latencies.sort()
+        print(f"Edit-to-output latency over {edits} edits: "
+              f"median {latencies[edits // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+from generate_page import find_pages, render_page
+from output import write_if_changed
+
+
+class BuildEvent:
+    """
+    Progress notification yielded by build().
+
+    Attributes:
+        kind: "discovered" once all pages are known, "page" after each page
+            is written, and "finished" at the end
+        path: Destination path of the page for "page" events, else None
+        done: Number of pages written so far
+        total: Number of pages in the build
+    """
+
+    DISCOVERED = "discovered"
+    PAGE = "page"
+    FINISHED = "finished"
+
+    def __init__(self, kind, path, done, total):
+        self.kind = kind
+        self.path = path
+        self.done = done
+        self.total = total
+
+    def __eq__(self, other):
+        return (self.kind == other.kind and
+                self.path == other.path and
+                self.done == other.done and
+                self.total == other.total)
+
+    def __repr__(self):
+        return f"BuildEvent({self.kind}, {self.path}, {self.done}/{self.total})"
+
+
+async def build(content_dir, template_path, dest_dir, basepath="/", executor=None, concurrency=16):
+    """
+    Build the site without blocking the event loop, yielding progress events.
+
+    File discovery, reads and writes run in the loop's default thread pool;
+    rendering runs in the given executor (for example a ProcessPoolExecutor)
+    or in the default thread pool when none is given.
+
+    Usage:
+        async for event in build("content", "template.html", "docs"):
+            print(event)
+
+    Cancelling the consuming task, or leaving the async for loop early,
+    cancels every page that has not been written yet.
+
+    Args:
+        content_dir: Path to the content directory containing markdown files
+        template_path: Path to the default HTML template file
+        dest_dir: Path to the destination directory for generated HTML files
+        basepath: Base path for all URLs in the site (default: "/")
+        executor: Optional concurrent.futures executor used for rendering
+        concurrency: Maximum number of pages in flight at once
+
+    Yields:
+        BuildEvent objects
+    """
+    loop = asyncio.get_running_loop()
+
+    pages = await loop.run_in_executor(None, find_pages, content_dir, template_path, dest_dir)
+    total = len(pages)
+    yield BuildEvent(BuildEvent.DISCOVERED, None, 0, total)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def build_page(page):
+        markdown_path, page_template_path, dest_path = page
+        async with semaphore:
+            markdown_content = await loop.run_in_executor(None, _read_file, markdown_path)
+            html = await loop.run_in_executor(
+                executor, render_page, markdown_content, page_template_path, basepath)
+            await loop.run_in_executor(None, _write_file, dest_path, html)
+        return dest_path
+
+    tasks = [asyncio.ensure_future(build_page(page)) for page in pages]
+    done = 0
+    try:
+        for future in asyncio.as_completed(tasks):
+            dest_path = await future
+            done += 1
+            yield BuildEvent(BuildEvent.PAGE, dest_path, done, total)
+    finally:
+        # Runs on errors, cancellation and early exit from the async for loop
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    yield BuildEvent(BuildEvent.FINISHED, None, done, total)
+
+
+def _read_file(path):
+    """Read a markdown file; runs in a worker thread."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _write_file(path, content):
+    """Write a generated page unless it is unchanged; runs in a worker thread."""
+    write_if_changed(path, content)
@@ -89,7 +89,7 @@ def markdown_to_blocks(markdown):
     return filtered_blocks
 
 
-def text_to_children(text):
+def text_to_children(text, factory=None, basepath=None, collector=None):
     """
     Convert inline markdown text to a list of HTMLNode children.
     
@@ -98,6 +98,9 @@ def text_to_children(text):
     
     Args:
         text: String containing inline markdown
+        factory: Optional NodeFactory used to share identical nodes
+        basepath: Optional site basepath for root-relative link/image URLs
+        collector: Optional callable invoked with every parsed TextNode
         
     Returns:
         List of HTMLNode objects representing the inline elements
@@ -105,12 +108,21 @@ def text_to_children(text):
     text_nodes = text_to_textnodes(text)
     children = []
     for text_node in text_nodes:
-        html_node = text_node_to_html_node(text_node)
+        if collector is not None:
+            collector(text_node)
+        html_node = text_node_to_html_node(text_node, factory, basepath)
         children.append(html_node)
     return children
 
 
-def heading_to_html_node(block):
+def _make_parent(tag, children, factory=None):
+    """Create a ParentNode, or fetch the shared one when a factory is given."""
+    if factory is not None:
+        return factory.parent(tag, children)
+    return ParentNode(tag, children)
+
+
+def heading_to_html_node(block, factory=None, basepath=None, collector=None):
     """Convert a heading block to an HTMLNode."""
     # Count the number of # characters
     level = 0
@@ -125,20 +137,20 @@ def heading_to_html_node(block):
     
     # Create the heading tag
     tag = f"h{level}"
-    children = text_to_children(heading_text)
+    children = text_to_children(heading_text, factory, basepath, collector)
     
-    return ParentNode(tag, children)
+    return _make_parent(tag, children, factory)
 
 
-def paragraph_to_html_node(block):
+def paragraph_to_html_node(block, factory=None, basepath=None, collector=None):
     """Convert a paragraph block to an HTMLNode."""
     # Replace single newlines with spaces for paragraph text
     text = block.replace("\n", " ")
-    children = text_to_children(text)
-    return ParentNode("p", children)
+    children = text_to_children(text, factory, basepath, collector)
+    return _make_parent("p", children, factory)
 
 
-def code_to_html_node(block):
+def code_to_html_node(block, factory=None):
     """Convert a code block to an HTMLNode."""
     # Remove the opening and closing backticks
     code_text = block[3:-3]  # Remove ``` from start and end
@@ -150,14 +162,14 @@ def code_to_html_node(block):
     # Code blocks should not process inline markdown
     # Create a single text node and convert to HTML
     text_node = TextNode(code_text, TextType.TEXT)
-    code_leaf = text_node_to_html_node(text_node)
+    code_leaf = text_node_to_html_node(text_node, factory)
     
     # Wrap in <code> tag, then in <pre> tag
-    code_node = ParentNode("code", [code_leaf])
-    return ParentNode("pre", [code_node])
+    code_node = _make_parent("code", [code_leaf], factory)
+    return _make_parent("pre", [code_node], factory)
 
 
-def quote_to_html_node(block):
+def quote_to_html_node(block, factory=None, basepath=None, collector=None):
     """Convert a quote block to an HTMLNode."""
     # Remove the > from each line and join with newlines
     lines = block.split("\n")
@@ -173,12 +185,12 @@ def quote_to_html_node(block):
     
     # Join lines back together with newlines, then convert to spaces for inline processing
     quote_text = "\n".join(quote_lines).replace("\n", " ")
-    children = text_to_children(quote_text)
+    children = text_to_children(quote_text, factory, basepath, collector)
     
-    return ParentNode("blockquote", children)
+    return _make_parent("blockquote", children, factory)
 
 
-def unordered_list_to_html_node(block):
+def unordered_list_to_html_node(block, factory=None, basepath=None, collector=None):
     """Convert an unordered list block to an HTMLNode."""
     lines = block.split("\n")
     list_items = []
@@ -186,14 +198,14 @@ def unordered_list_to_html_node(block):
     for line in lines:
         # Remove the "- " from the beginning
         item_text = line[2:]
-        children = text_to_children(item_text)
-        list_item = ParentNode("li", children)
+        children = text_to_children(item_text, factory, basepath, collector)
+        list_item = _make_parent("li", children, factory)
         list_items.append(list_item)
     
-    return ParentNode("ul", list_items)
+    return _make_parent("ul", list_items, factory)
 
 
-def ordered_list_to_html_node(block):
+def ordered_list_to_html_node(block, factory=None, basepath=None, collector=None):
     """Convert an ordered list block to an HTMLNode."""
     lines = block.split("\n")
     list_items = []
@@ -203,19 +215,26 @@ def ordered_list_to_html_node(block):
         # Find the first ". " and remove everything up to and including it
         dot_index = line.find(". ")
         item_text = line[dot_index + 2:]
-        children = text_to_children(item_text)
-        list_item = ParentNode("li", children)
+        children = text_to_children(item_text, factory, basepath, collector)
+        list_item = _make_parent("li", children, factory)
         list_items.append(list_item)
     
-    return ParentNode("ol", list_items)
+    return _make_parent("ol", list_items, factory)
 
 
-def markdown_to_html_node(markdown):
+def markdown_to_html_node(markdown, factory=None, basepath=None, collector=None):
     """
     Convert a full markdown document into a single parent HTMLNode.
     
     Args:
         markdown: Full markdown document string
+        factory: Optional NodeFactory; when given, structurally equal nodes
+            are shared and cache their serialized HTML
+        basepath: Optional site basepath; root-relative link and image URLs
+            are resolved against it while the nodes are built
+        collector: Optional callable invoked with every inline TextNode as it
+            is parsed, so callers can gather links, images or text without
+            parsing the document a second time
         
     Returns:
         ParentNode representing the entire document as a div containing all blocks
@@ -229,22 +248,22 @@ def markdown_to_html_node(markdown):
         block_type = block_to_block_type(block)
         
         if block_type == BlockType.HEADING:
-            html_node = heading_to_html_node(block)
+            html_node = heading_to_html_node(block, factory, basepath, collector)
         elif block_type == BlockType.PARAGRAPH:
-            html_node = paragraph_to_html_node(block)
+            html_node = paragraph_to_html_node(block, factory, basepath, collector)
         elif block_type == BlockType.CODE:
-            html_node = code_to_html_node(block)
+            html_node = code_to_html_node(block, factory)
         elif block_type == BlockType.QUOTE:
-            html_node = quote_to_html_node(block)
+            html_node = quote_to_html_node(block, factory, basepath, collector)
         elif block_type == BlockType.UNORDERED_LIST:
-            html_node = unordered_list_to_html_node(block)
+            html_node = unordered_list_to_html_node(block, factory, basepath, collector)
         elif block_type == BlockType.ORDERED_LIST:
-            html_node = ordered_list_to_html_node(block)
+            html_node = ordered_list_to_html_node(block, factory, basepath, collector)
         else:
             # Default to paragraph
-            html_node = paragraph_to_html_node(block)
+            html_node = paragraph_to_html_node(block, factory, basepath, collector)
         
         block_nodes.append(html_node)
     
     # Wrap all blocks in a div
-    return ParentNode("div", block_nodes)
+    return _make_parent("div", block_nodes, factory)
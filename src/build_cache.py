@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from manifest import GENERATOR_VERSION, file_hash, template_fingerprint
+from output import temp_path
+
+
+# First bytes of every stored entry; bump when the entry layout changes
+ENTRY_MAGIC = b"SGC5"
+
+# Render info that only makes sense in the process that rendered the page
+_LOCAL_INFO = ("content", "written")
+
+
+def cache_key(markdown_hash, template_hash, basepath, generator=GENERATOR_VERSION):
+    """
+    Return the content address of a rendered page.
+
+    Args:
+        markdown_hash: SHA-256 hex digest of the markdown source
+        template_hash: Fingerprint of the template and its partials
+        basepath: Base path the page is rendered for
+        generator: Generator version the page is rendered by
+
+    Returns:
+        SHA-256 hex digest identifying the rendered output
+    """
+    digest = hashlib.sha256()
+    for part in (markdown_hash, template_hash, basepath, generator):
+        # Length-prefixed, so no two different inputs run together the same way
+        data = part.encode('utf-8')
+        digest.update(len(data).to_bytes(4, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def encode_entry(html, info):
+    """
+    Pack a rendered page and its render info into a cache entry.
+
+    The entry starts with a SHA-256 of the rest, so a truncated or corrupted
+    entry is detected on read instead of being written into the site. Every
+    fact in info (see generate_page.page_values) is kept, so a page taken
+    from the cache is indexed like a rendered one.
+    """
+    meta = {key: value for key, value in info.items() if key not in _LOCAL_INFO}
+    meta = json.dumps(meta, sort_keys=True, separators=(",", ":")).encode('utf-8')
+    payload = len(meta).to_bytes(4, "big") + meta + html
+    return ENTRY_MAGIC + hashlib.sha256(payload).hexdigest().encode('ascii') + payload
+
+
+def decode_entry(data):
+    """
+    Unpack a cache entry.
+
+    Returns:
+        Tuple of (html bytes, info dict)
+
+    Raises:
+        ValueError: If the entry is damaged or has an unknown layout
+    """
+    header = len(ENTRY_MAGIC) + 64
+    if len(data) < header + 4 or not data.startswith(ENTRY_MAGIC):
+        raise ValueError("Not a build cache entry")
+    payload = data[header:]
+    if hashlib.sha256(payload).hexdigest().encode('ascii') != data[len(ENTRY_MAGIC):header]:
+        raise ValueError("Build cache entry failed its integrity check")
+
+    meta_length = int.from_bytes(payload[:4], "big")
+    info = json.loads(payload[4:4 + meta_length])
+    info["links"] = [tuple(link) for link in info["links"]]
+    return payload[4 + meta_length:], info
+
+
+class LocalDirBackend:
+    """
+    Stores cache entries as files in a directory, sharded by key prefix.
+
+    Reading an entry updates its mtime, so collect_garbage() removes the
+    least recently used entries first.
+
+    Args:
+        path: Cache directory; created when the first entry is stored
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """Return the stored bytes for key, or None."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Store bytes under key, replacing any older entry in one rename."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Return (key, size, mtime_ns) for every stored entry."""
+        result = []
+        if not os.path.isdir(self.path):
+            return result
+        with os.scandir(self.path) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        if entry.name.startswith("."):
+                            continue
+                        stat = entry.stat()
+                        result.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return result
+
+    def collect_garbage(self, max_bytes):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            Tuple of (entries removed, bytes freed)
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        freed = 0
+        for key, size, _ in entries:
+            if total - freed <= max_bytes:
+                break
+            self.delete(key)
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def __repr__(self):
+        return f"LocalDirBackend({self.path})"
+
+
+class HTTPBackend:
+    """
+    Stores cache entries on an HTTP server with GET and PUT of <url>/<key>.
+
+    Any static file server that accepts PUT works, such as nginx with
+    WebDAV enabled. Network errors count as cache misses, so an unreachable
+    server slows the build down but never breaks it.
+
+    Args:
+        base_url: URL entries live under
+        timeout: Seconds to wait for each request
+    """
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, key):
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/{key}", timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                print(f"Warning: build cache GET {key} failed: {e}")
+            return None
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Warning: build cache GET {key} failed: {e}")
+            return None
+
+    def put(self, key, data):
+        request = urllib.request.Request(f"{self.base_url}/{key}", data=data, method="PUT",
+                                         headers={"Content-Type": "application/octet-stream"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Warning: build cache PUT {key} failed: {e}")
+
+    def delete(self, key):
+        request = urllib.request.Request(f"{self.base_url}/{key}", method="DELETE")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except (urllib.error.URLError, OSError):
+            pass
+
+    def __repr__(self):
+        return f"HTTPBackend({self.base_url})"
+
+
+class BuildCache:
+    """
+    Content-addressed cache of rendered pages in front of one or two backends.
+
+    Lookups read through: a miss in the local backend is looked up in the
+    remote one and, when found there, copied into the local one. Stores are
+    written to the local backend at once and queued for the remote one, then
+    sent in the background and finished by flush() (write-back).
+
+    Entries that fail their integrity check are deleted and treated as
+    misses.
+
+    Args:
+        local: Backend consulted first, usually a LocalDirBackend
+        remote: Optional shared backend, usually an HTTPBackend
+    """
+
+    def __init__(self, local, remote=None):
+        self.local = local
+        self.remote = remote
+        self.hits = 0
+        self.misses = 0
+        self.remote_hits = 0
+        self._templates = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._uploader = None
+
+    def key_for(self, markdown_path, template_path, basepath):
+        """Return the cache key of a page from its current inputs."""
+        abs_path = os.path.abspath(template_path)
+        if abs_path not in self._templates:
+            self._templates[abs_path] = template_fingerprint(abs_path)
+        return cache_key(file_hash(markdown_path), self._templates[abs_path], basepath)
+
+    def get(self, key):
+        """
+        Look up a rendered page.
+
+        Returns:
+            Tuple of (html bytes, info dict), or None on a miss
+        """
+        entry = self._read(self.local, key)
+        if entry is None and self.remote is not None:
+            entry = self._read(self.remote, key)
+            if entry is not None:
+                self.remote_hits += 1
+                self.local.put(key, encode_entry(*entry))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def _read(self, backend, key):
+        data = backend.get(key)
+        if data is None:
+            return None
+        try:
+            return decode_entry(data)
+        except ValueError as e:
+            print(f"Warning: dropping damaged build cache entry {key} from {backend}: {e}")
+            backend.delete(key)
+            return None
+
+    def put(self, key, html, info):
+        """Store a rendered page under its key."""
+        data = encode_entry(html, info)
+        self.local.put(key, data)
+        if self.remote is not None:
+            with self._lock:
+                self._pending.append((key, data))
+                if self._uploader is None:
+                    self._uploader = threading.Thread(target=self._upload, name="cache-upload",
+                                                      daemon=True)
+                    self._uploader.start()
+
+    def _upload(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._uploader = None
+                    return
+                key, data = self._pending.pop(0)
+            self.remote.put(key, data)
+
+    def flush(self):
+        """Wait until every queued remote store has been sent."""
+        while True:
+            with self._lock:
+                uploader = self._uploader
+            if uploader is None:
+                return
+            uploader.join()
+
+    def __repr__(self):
+        return (f"BuildCache(hits: {self.hits}, misses: {self.misses}, "
+                f"remote hits: {self.remote_hits})")
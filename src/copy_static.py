@@ -1,8 +1,11 @@
+import filecmp
 import os
 import shutil
+from output import copy_file
+from snapshot import TreeSnapshot
 
 
-def copy_files_recursive(source_dir_path, dest_dir_path):
+def copy_files_recursive(source_dir_path, dest_dir_path, snapshot=None):
     """
     Recursively copy all files and directories from source to destination.
     
@@ -14,6 +17,8 @@ def copy_files_recursive(source_dir_path, dest_dir_path):
     Args:
         source_dir_path: Path to the source directory
         dest_dir_path: Path to the destination directory
+        snapshot: Optional TreeSnapshot of source_dir_path to copy from
+            instead of reading the directories again
     """
     print(f"Copying files from {source_dir_path} to {dest_dir_path}")
     
@@ -27,41 +32,112 @@ def copy_files_recursive(source_dir_path, dest_dir_path):
     os.mkdir(dest_dir_path)
     
     # Step 3: Copy all contents recursively
-    _copy_directory_contents(source_dir_path, dest_dir_path)
+    if snapshot is None:
+        snapshot = TreeSnapshot(source_dir_path)
+    if not snapshot.exists:
+        print(f"Warning: Source directory {source_dir_path} does not exist")
+    
+    for rel_dir, dirs, files in snapshot.walk():
+        dest_dir = os.path.join(dest_dir_path, *rel_dir.split("/")) if rel_dir else dest_dir_path
+        if rel_dir:
+            print(f"Creating directory: {dest_dir}")
+            os.mkdir(dest_dir)
+        for entry in files:
+            dest_path = os.path.join(dest_dir, os.path.basename(entry.path))
+            print(f"Copying file: {entry.path} -> {dest_path}")
+            shutil.copy(entry.path, dest_path)
     
     print(f"Finished copying files from {source_dir_path} to {dest_dir_path}")
 
 
-def _copy_directory_contents(source_dir, dest_dir):
+def sync_files_recursive(source_dir_path, dest_dir_path, previous=None, snapshot=None):
     """
-    Helper function to recursively copy directory contents.
+    Copy only new or changed files from source to destination.
+    
+    Unlike copy_files_recursive the destination is not cleaned first. A file
+    is copied when its size or mtime differs from the previous record or the
+    destination copy is missing, unless the destination already holds the
+    same bytes. Files recorded previously but no longer in the source are
+    removed from the destination.
     
     Args:
-        source_dir: Source directory path
-        dest_dir: Destination directory path
+        source_dir_path: Path to the source directory
+        dest_dir_path: Path to the destination directory
+        previous: Dict from the last sync mapping relative paths to
+            [size, mtime_ns], or None to copy everything
+        snapshot: Optional TreeSnapshot of source_dir_path, whose sizes and
+            mtimes are reused instead of statting every file again
+        
+    Returns:
+        Tuple of (record, copied, removed) where record is the new dict to
+        pass as previous next time (covering every source file), and
+        copied/removed are lists of relative paths
     """
-    # Check if source directory exists
-    if not os.path.exists(source_dir):
-        print(f"Warning: Source directory {source_dir} does not exist")
-        return
+    previous = previous or {}
+    copied = []
+    removed = []
     
-    # Get all items in the source directory
-    items = os.listdir(source_dir)
+    if snapshot is None:
+        snapshot = TreeSnapshot(source_dir_path)
+    if not snapshot.exists:
+        print(f"Warning: Source directory {source_dir_path} does not exist")
+    record = file_record(source_dir_path, snapshot)
     
-    for item in items:
-        source_path = os.path.join(source_dir, item)
-        dest_path = os.path.join(dest_dir, item)
+    for entry in snapshot.files():
+        rel_path = entry.rel_path
+        dest_path = os.path.join(dest_dir_path, rel_path)
         
-        if os.path.isfile(source_path):
-            # Copy file
-            print(f"Copying file: {source_path} -> {dest_path}")
-            shutil.copy(source_path, dest_path)
-        else:
-            # Create directory and recursively copy its contents
-            print(f"Creating directory: {dest_path}")
-            os.mkdir(dest_path)
-            print(f"Recursively copying directory: {source_path} -> {dest_path}")
-            _copy_directory_contents(source_path, dest_path)
+        if previous.get(rel_path) == record[rel_path] and os.path.exists(dest_path):
+            continue
+        
+        # A touched but unchanged file keeps its old copy and mtime
+        if (os.path.exists(dest_path) and os.path.getsize(dest_path) == entry.size
+                and filecmp.cmp(entry.path, dest_path, shallow=False)):
+            continue
+        
+        print(f"Copying file: {entry.path} -> {dest_path}")
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        copy_file(entry.path, dest_path)
+        copied.append(rel_path)
+    
+    for rel_path in sorted(previous):
+        if rel_path not in record:
+            dest_path = os.path.join(dest_dir_path, rel_path)
+            if os.path.exists(dest_path):
+                print(f"Removing deleted file: {dest_path}")
+                os.remove(dest_path)
+                remove_empty_dirs(os.path.dirname(dest_path), dest_dir_path)
+            removed.append(rel_path)
+    
+    return record, copied, removed
+
+
+def file_record(source_dir_path, snapshot=None):
+    """
+    Return the record sync_files_recursive would make, without copying.
+    
+    Args:
+        source_dir_path: Path to the source directory
+        snapshot: Optional TreeSnapshot of source_dir_path
+    
+    Returns:
+        Dict mapping relative paths ("/" separators) to [size, mtime_ns]
+    """
+    if snapshot is None:
+        snapshot = TreeSnapshot(source_dir_path)
+    return {entry.rel_path: entry.record() for entry in snapshot.files()}
+
+
+def remove_empty_dirs(dir_path, stop_dir_path):
+    """Remove dir_path and its parents while they are empty, up to stop_dir_path."""
+    stop_dir_path = os.path.abspath(stop_dir_path)
+    current = os.path.abspath(dir_path)
+    while current != stop_dir_path and current.startswith(stop_dir_path + os.sep):
+        try:
+            os.rmdir(current)
+        except OSError:
+            return
+        current = os.path.dirname(current)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import os
+from manifest import file_hash
+from template import asset_hash, load_template
+
+
+# Kinds of dependency keys, written as "<kind>:<path>"
+SOURCE = "source"
+TEMPLATE = "template"
+STATIC = "static"
+ASSET = "asset"
+PAGE = "page"
+
+# A page that only links to a static file does not change with its bytes,
+# so a "static:" dependency records that the file exists: editing a
+# stylesheet rebuilds no page. Templates that fingerprint a URL write the
+# file's content hash into the page, recorded as an "asset:" dependency.
+STATIC_PRESENT = "present"
+
+
+def dep_key(kind, path):
+    """Build a dependency key such as "static:images/tom.png"."""
+    return f"{kind}:{path}"
+
+
+def split_key(key):
+    """Split a dependency key into (kind, path)."""
+    kind, _, path = key.partition(":")
+    return kind, path
+
+
+class DependencyResolver:
+    """
+    Computes the current hash of dependency keys during one build.
+
+    Hashes are memoized, so a template shared by every page is hashed once.
+    Sources, templates and fingerprinted assets are hashed from their
+    contents and other static files stand for STATIC_PRESENT, never sizes or
+    mtimes, so the hashes in a manifest hold on any checkout of the same
+    sources. Assets are read from the directory set with set_asset_dir, the
+    one fingerprinted URLs are rendered from.
+
+    Args:
+        content_dir: Root of the markdown sources ("source:" keys)
+        template_base_dir: Directory "template:" keys are relative to
+        static_record: Static file record from sync_files_recursive, which
+            says which static files exist
+    """
+
+    def __init__(self, content_dir, template_base_dir, static_record):
+        self.content_dir = content_dir
+        self.template_base_dir = template_base_dir
+        self.static_record = static_record
+        self._hashes = {}
+        self._templates = {}
+
+    def current_hash(self, key):
+        """Return the hash of a key's current state, or None if it is gone."""
+        if key in self._hashes:
+            return self._hashes[key]
+
+        kind, path = split_key(key)
+        value = None
+        if kind == SOURCE or kind == TEMPLATE:
+            base = self.content_dir if kind == SOURCE else self.template_base_dir
+            full_path = os.path.join(base, path)
+            if os.path.exists(full_path):
+                value = file_hash(full_path)
+        elif kind == STATIC:
+            if path in self.static_record:
+                value = STATIC_PRESENT
+        elif kind == ASSET:
+            value = asset_hash(path)
+
+        self._hashes[key] = value
+        return value
+
+    def template_dependencies(self, template_path):
+        """
+        Return the dependencies every page rendered with a template has.
+
+        Returns:
+            Tuple of (deps, urls): deps maps "template:" keys of the template
+            and all partials it includes, and "asset:" keys of the URLs they
+            fingerprint, to their hashes, and urls lists the root-relative
+            URLs written in those templates
+        """
+        abs_path = os.path.abspath(template_path)
+        if abs_path not in self._templates:
+            deps = {}
+            urls = []
+            self._collect_template(abs_path, deps, urls)
+            self._templates[abs_path] = (deps, urls)
+        return self._templates[abs_path]
+
+    def _collect_template(self, abs_path, deps, urls):
+        key = dep_key(TEMPLATE, os.path.relpath(abs_path, self.template_base_dir).replace(os.sep, "/"))
+        if key in deps or not os.path.exists(abs_path):
+            return
+        deps[key] = self.current_hash(key)
+
+        template = load_template(abs_path)
+        for url in template.urls:
+            if url not in urls:
+                urls.append(url)
+        for path in template.assets:
+            key = dep_key(ASSET, path)
+            deps[key] = self.current_hash(key)
+        for name in template.includes:
+            self._collect_template(template.resolve_include(name), deps, urls)
+
+    def static_dependencies(self, urls):
+        """Map root-relative URLs that point at static files to their keys and hashes."""
+        deps = {}
+        for url in urls:
+            path = static_path(url)
+            if path is not None and path in self.static_record:
+                key = dep_key(STATIC, path)
+                deps[key] = self.current_hash(key)
+        return deps
+
+
+def static_path(url):
+    """
+    Turn a root-relative URL into a static file path, or None.
+
+    Example:
+        static_path("/images/tom.png?v=2") -> "images/tom.png"
+    """
+    if not url.startswith("/") or url.startswith("//"):
+        return None
+    path = url[1:].split("#", 1)[0].split("?", 1)[0]
+    return path or None
+
+
+class DependencyGraph:
+    """
+    Queryable view of the dependencies recorded in a build manifest.
+
+    Args:
+        pages: The pages dict of a BuildManifest; each entry has a "deps"
+            dict mapping dependency keys to hashes
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self._dependents = None
+
+    def dependencies(self, output):
+        """Return {key: hash} for everything an output was built from."""
+        entry = self.pages.get(output)
+        if entry is None:
+            return {}
+        return dict(entry.get("deps", {}))
+
+    def dependents(self, key):
+        """Return the sorted outputs that depend on a key."""
+        if self._dependents is None:
+            self._dependents = {}
+            for output, entry in self.pages.items():
+                for dep in entry.get("deps", {}):
+                    self._dependents.setdefault(dep, []).append(output)
+        return sorted(self._dependents.get(key, []))
+
+    def affected(self, changed_keys):
+        """Return the sorted outputs that must be rebuilt when keys change."""
+        outputs = set()
+        for key in changed_keys:
+            outputs.update(self.dependents(key))
+        return sorted(outputs)
+
+    def why(self, target):
+        """
+        Explain a target as printable lines.
+
+        For an output path this lists what it was built from and which pages
+        depend on it; for a dependency key it lists the outputs using it.
+        """
+        if target in self.pages:
+            lines = [f"{target} was built from:"]
+            for key, value in sorted(self.dependencies(target).items()):
+                lines.append(f"  {key}  ({value[:12] if value else 'missing'})")
+            dependents = self.dependents(dep_key(PAGE, target))
+            lines.append(f"Pages that depend on {target}:" if dependents else
+                         f"No other pages depend on {target}")
+            lines.extend(f"  {output}" for output in dependents)
+            return lines
+
+        dependents = self.dependents(target)
+        if not dependents:
+            return [f"Nothing depends on {target}"]
+        return [f"Outputs that depend on {target}:"] + [f"  {output}" for output in dependents]
@@ -0,0 +1,362 @@
+import mimetypes
+import os
+import queue
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from front_matter import page_template, split_front_matter
+from generate_page import page_values
+from livereload import EVENTS_PATH, LiveReload, inject_script
+from template import (TEMPLATE_FILENAME, find_template, load_template, set_asset_dir, template_files,
+                      template_watch_files)
+from watcher import EVERYTHING, create_watcher, wait_for_changes
+
+
+class PageCache:
+    """
+    LRU cache of rendered pages bounded by their total size in bytes.
+
+    Each entry remembers the files it was rendered from, so a change to a
+    markdown file, template or partial drops exactly the pages built from it.
+
+    Args:
+        max_bytes: Largest total size of the cached pages
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (body, files)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached body for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, body, files):
+        """Cache body under key, evicting the least recently used pages."""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (body, frozenset(files))
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate(self, paths):
+        """
+        Drop every page rendered from one of the given files.
+
+        Returns:
+            List of the keys that were dropped
+        """
+        paths = set(paths)
+        with self._lock:
+            stale = [key for key, (_, files) in self._entries.items() if not files.isdisjoint(paths)]
+            for key in stale:
+                self._remove(key)
+        return stale
+
+    def clear(self):
+        """Drop every page and return the keys that were dropped."""
+        with self._lock:
+            dropped = list(self._entries)
+            self._entries.clear()
+            self.size = 0
+        return dropped
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f"PageCache({len(self._entries)} pages, {self.size}/{self.max_bytes} bytes, "
+                f"hits: {self.hits}, misses: {self.misses})")
+
+
+class DevSite:
+    """
+    Serves the site straight from its sources, rendering pages on request.
+
+    Nothing is written to disk: a request for /blog/tom/ renders
+    content/blog/tom/index.md with the same code generate_page uses, and
+    other files are read from the static directory. Fingerprinted URLs
+    carry the hash of the static file served for them, and a cached page is
+    dropped when one of those files changes.
+
+    Args:
+        content_dir: Path to the content directory containing markdown files
+        static_dir: Path to the static files directory
+        template_path: Path to the default HTML template file
+        basepath: Base path the site is served under (default: "/")
+        cache_bytes: Size limit of the rendered page cache
+    """
+
+    def __init__(self, content_dir, static_dir, template_path, basepath="/", cache_bytes=64 << 20):
+        self.content_dir = os.path.abspath(content_dir)
+        self.static_dir = os.path.abspath(static_dir)
+        self.template_path = os.path.abspath(template_path)
+        self.basepath = basepath
+        set_asset_dir(self.static_dir)
+        self.cache = PageCache(cache_bytes)
+        # Bumped by invalidate(), so a page rendered while its source was
+        # changing is not cached
+        self._changes = 0
+
+    def lookup(self, url_path):
+        """
+        Resolve a request path.
+
+        Returns:
+            Tuple of (kind, value): ("page", markdown path),
+            ("static", file path), ("redirect", location) or ("missing", None)
+        """
+        path = urllib.parse.unquote(url_path.split("?", 1)[0].split("#", 1)[0])
+        if not path.startswith(self.basepath):
+            return "missing", None
+        rel_path = os.path.normpath("/" + path[len(self.basepath):]).lstrip("/")
+        if rel_path == ".":
+            rel_path = ""
+
+        markdown_path = None
+        if path.endswith("/"):
+            markdown_path = os.path.join(self.content_dir, rel_path, "index.md")
+        elif rel_path.endswith(".html"):
+            markdown_path = os.path.join(self.content_dir, rel_path[:-len(".html")] + ".md")
+        if markdown_path is not None and os.path.isfile(markdown_path):
+            return "page", markdown_path
+
+        static_path = os.path.join(self.static_dir, rel_path)
+        if os.path.isfile(static_path):
+            return "static", static_path
+        if os.path.isfile(os.path.join(self.content_dir, rel_path, "index.md")):
+            return "redirect", path + "/"
+        return "missing", None
+
+    def render(self, markdown_path):
+        """Return the HTML bytes of a page, from the cache when possible."""
+        body = self.cache.get(markdown_path)
+        if body is not None:
+            return body
+        return self.render_tree(markdown_path)[0]
+
+    def render_tree(self, markdown_path):
+        """
+        Render a page without looking at the cache, and cache the result.
+
+        Returns:
+            Tuple of (body, content) where body is the HTML bytes of the page
+            and content the HTMLNode tree of its markdown content
+        """
+        changes = self._changes
+        with open(markdown_path, 'r', encoding='utf-8') as f:
+            markdown_content = f.read()
+        # Drafts are served too, so they can be previewed
+        meta = split_front_matter(markdown_content, markdown_path)[0]
+        template_path = page_template(meta, find_template(os.path.dirname(markdown_path), self.content_dir,
+                                                          self.template_path), self.template_path)
+        info = {}
+        values = page_values(markdown_content, self.basepath, info=info, path=markdown_path)
+        body = load_template(template_path).render(values).encode('utf-8')
+
+        files = template_files(template_path, {markdown_path})
+        for path in list(files):
+            if path != markdown_path:
+                files.update(os.path.join(self.static_dir, asset) for asset in load_template(path).assets)
+        if changes == self._changes:
+            self.cache.put(markdown_path, body, files)
+        return body, info["content"]
+
+    def invalidate(self, changed_paths):
+        """
+        Forget pages affected by changed files.
+
+        Returns:
+            List of the markdown paths of the pages that were dropped
+        """
+        self._changes += 1
+        if EVERYTHING in changed_paths:
+            return self.cache.clear()
+        changed_paths = {os.path.abspath(path) for path in changed_paths}
+        if any(os.path.basename(path) == TEMPLATE_FILENAME and
+               path.startswith(os.path.join(self.content_dir, "")) for path in changed_paths):
+            # A directory template can change which template any page uses
+            return self.cache.clear()
+        return self.cache.invalidate(changed_paths)
+
+
+class DevRequestHandler(BaseHTTPRequestHandler):
+    """Answers GET and HEAD requests from the server's DevSite."""
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        site = self.server.site
+        live = self.server.live
+        if live is not None and self.path.startswith(EVENTS_PATH + "?"):
+            self._stream_events(live)
+            return
+        kind, value = site.lookup(self.path)
+
+        if kind == "redirect":
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if kind == "page":
+            try:
+                body = site.render(value)
+            except Exception as e:
+                # Show the error in the browser instead of killing the server
+                self._send(HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain; charset=utf-8",
+                           f"Error rendering {value}: {e}\n".encode('utf-8'), send_body)
+                return
+            if live is not None:
+                body = inject_script(body)
+            self._send(HTTPStatus.OK, "text/html; charset=utf-8", body, send_body)
+        elif kind == "static":
+            with open(value, 'rb') as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(value)[0] or "application/octet-stream"
+            self._send(HTTPStatus.OK, content_type, body, send_body)
+        else:
+            self._send(HTTPStatus.NOT_FOUND, "text/plain; charset=utf-8",
+                       f"Not found: {self.path}\n".encode('utf-8'), send_body)
+
+    def _stream_events(self, live):
+        """Keep the connection open and write live reload events to it."""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        kind, markdown_path = self.server.site.lookup(query.get("page", [""])[0])
+        if kind != "page":
+            self._send(HTTPStatus.NOT_FOUND, "text/plain; charset=utf-8", b"Unknown page\n", True)
+            return
+        try:
+            events = live.subscribe(markdown_path)
+        except (OSError, ValueError):
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain; charset=utf-8",
+                       b"Page does not render\n", True)
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while not self.server.closed.is_set():
+                try:
+                    name, data = events.get(timeout=1)
+                except queue.Empty:
+                    # A comment line; also notices clients that went away
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(f"event: {name}\ndata: {data}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            live.unsubscribe(markdown_path, events)
+            self.close_connection = True
+
+    def _send(self, status, content_type, body, send_body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+
+class DevServer(ThreadingHTTPServer):
+    """
+    HTTP server for a DevSite that drops cached pages when sources change.
+
+    With live reload, every page gets a small script that listens for
+    Server-Sent Events (see livereload.py), so open pages update on their
+    own after an edit.
+
+    Usage:
+        server = DevServer(("127.0.0.1", 8888), site)
+        server.serve_forever()
+
+    Args:
+        address: (host, port) to listen on
+        site: DevSite to serve
+        watch: Start a background thread that watches the sources
+        live_reload: Push changes to open pages
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, site, watch=True, live_reload=True):
+        super().__init__(address, DevRequestHandler)
+        self.site = site
+        self.live = LiveReload(site) if live_reload else None
+        self.closed = threading.Event()
+        self._watcher = None
+        if watch:
+            self._watcher = create_watcher([site.content_dir, site.static_dir],
+                                           template_watch_files(site.template_path))
+            threading.Thread(target=self._watch, name="watcher", daemon=True).start()
+
+    def _watch(self):
+        while not self.closed.is_set():
+            watcher = self._watcher
+            if watcher is None:
+                return
+            try:
+                changed = wait_for_changes(watcher, timeout=0.5)
+                if changed:
+                    self.on_change(changed)
+                    # An edit may have included a new partial
+                    watcher.add_files(template_watch_files(self.site.template_path))
+            except Exception as e:
+                # Errors from a watcher closed by server_close() end the
+                # thread; anything else, such as a template that does not
+                # compile, must not stop the server noticing later edits
+                if self.closed.is_set() or self._watcher is None:
+                    return
+                print(f"Error while handling changes: {e}")
+                self.closed.wait(0.5)
+
+    def on_change(self, changed_paths):
+        """Called from the watcher thread with the paths of changed files."""
+        dropped = self.site.invalidate(changed_paths)
+        print(f"{len(changed_paths)} change(s), {len(dropped)} cached page(s) dropped")
+        if self.live is not None:
+            for markdown_path, event in sorted(self.live.notify(changed_paths).items()):
+                print(f"Sent {event} for {markdown_path}")
+
+    def server_close(self):
+        self.closed.set()
+        super().server_close()
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.close()
@@ -0,0 +1,213 @@
+import hashlib
+import io
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import XMLGenerator
+from listing import record_hash
+from output import OutputWriter
+
+
+# Feed formats, and the file each is written to in a listed directory
+RSS = "rss"
+ATOM = "atom"
+FEED_FILENAMES = {RSS: "feed.xml", ATOM: "atom.xml"}
+
+# Entries in each feed unless configured otherwise
+FEED_SIZE = 20
+
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+
+# href="/..." and src="/..." in content HTML, but not protocol-relative "//"
+_ROOT_URL_RE = re.compile(r'(\s(?:href|src)=")/(?!/)')
+
+
+class FeedSettings:
+    """
+    Which feeds a build writes.
+
+    Every directory that gets a listing (see listing.py) also gets an RSS
+    2.0 feed and an Atom feed next to its first listing page, holding the
+    newest entries of the listing.
+
+    Args:
+        site_url: Scheme and host the site is published at, such as
+            "https://example.com"; feed readers need absolute links
+        full: Put the content HTML of each entry in the feed instead of
+            its summary
+        size: Entries per feed
+
+    Raises:
+        ValueError: If site_url is not an http(s) URL or size is below 1
+    """
+
+    def __init__(self, site_url, full=False, size=FEED_SIZE):
+        if not site_url.startswith(("http://", "https://")):
+            raise ValueError(f"Site URL must start with http:// or https://, not {site_url!r}")
+        if size < 1:
+            raise ValueError(f"Feeds need at least one entry, not {size}")
+        self.site_url = site_url.rstrip("/")
+        self.full = full
+        self.size = size
+
+    def __repr__(self):
+        return f"FeedSettings({self.site_url}, {'full' if self.full else 'summary'}, {self.size} entries)"
+
+
+def feed_output(rel_dir, kind):
+    """Return the output path of a directory's feed of one format."""
+    return (rel_dir + "/" if rel_dir else "") + FEED_FILENAMES[kind]
+
+
+def entry_hash(record, content_hash=None):
+    """
+    Hash everything a feed shows about one entry.
+
+    Feeds record a "page:" dependency with this hash for every entry, so a
+    feed is rewritten only when one of its entries changes.
+
+    Args:
+        record: PageRecord of the entry
+        content_hash: Hash of the entry's content HTML for a full feed
+            (see PageIndex.content_hash), or None
+    """
+    facts = "\0".join((record_hash(record), _updated(record), content_hash or ""))
+    return hashlib.sha256(facts.encode('utf-8')).hexdigest()
+
+
+def absolute_urls(html, site_url):
+    """Prefix the root-relative href and src URLs in HTML with site_url."""
+    return _ROOT_URL_RE.sub(lambda match: match.group(1) + site_url + "/", html)
+
+
+def write_feed(path, kind, title, link, feed_url, entries, site_url):
+    """
+    Write a feed, streaming the XML straight to the output file.
+
+    Args:
+        path: Where to write the feed; parent directories are created
+        kind: RSS or ATOM
+        title: Title of the feed
+        link: Absolute URL of the page the feed belongs to
+        feed_url: Absolute URL of the feed itself
+        entries: List of (PageRecord, content) pairs, newest first, where
+            content is the content HTML of the page for a full feed, or None
+            to use its summary
+        site_url: Scheme and host, to make URLs in content absolute
+
+    Returns:
+        True if the file was written, False if it already held the same bytes
+    """
+    dest_dir = os.path.dirname(path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    with OutputWriter(path) as out:
+        xml = XMLGenerator(_TextSink(out), encoding="utf-8", short_empty_elements=True)
+        xml.startDocument()
+        if kind == RSS:
+            _write_rss(xml, title, link, feed_url, entries, site_url)
+        elif kind == ATOM:
+            _write_atom(xml, title, link, feed_url, entries, site_url)
+        else:
+            raise ValueError(f"Unknown feed format: {kind}")
+        xml.ignorableWhitespace("\n")
+        xml.endDocument()
+    return out.changed
+
+
+def _write_rss(xml, title, link, feed_url, entries, site_url):
+    xml.startElement("rss", {"version": "2.0", "xmlns:atom": ATOM_NAMESPACE})
+    xml.startElement("channel", {})
+    _element(xml, "title", title)
+    _element(xml, "link", link)
+    _element(xml, "description", title)
+    _element(xml, "atom:link", None, {"href": feed_url, "rel": "self", "type": "application/rss+xml"})
+    if entries:
+        _element(xml, "lastBuildDate", format_datetime(max(_timestamp(_updated(record))
+                                                           for record, _ in entries), usegmt=True))
+    for record, content in entries:
+        url = site_url + record.url
+        xml.ignorableWhitespace("\n")
+        xml.startElement("item", {})
+        _element(xml, "title", record.title)
+        _element(xml, "link", url)
+        _element(xml, "guid", url, {"isPermaLink": "true"})
+        if record.date:
+            _element(xml, "pubDate", format_datetime(_timestamp(record.date), usegmt=True))
+        _element(xml, "description", absolute_urls(content, site_url) if content is not None else record.summary)
+        xml.endElement("item")
+    xml.ignorableWhitespace("\n")
+    xml.endElement("channel")
+    xml.endElement("rss")
+
+
+def _write_atom(xml, title, link, feed_url, entries, site_url):
+    xml.startElement("feed", {"xmlns": ATOM_NAMESPACE})
+    _element(xml, "title", title)
+    _element(xml, "id", link)
+    _element(xml, "link", None, {"href": link})
+    _element(xml, "link", None, {"href": feed_url, "rel": "self"})
+    if entries:
+        _element(xml, "updated", _atom_time(max(_timestamp(_updated(record)) for record, _ in entries)))
+    for record, content in entries:
+        url = site_url + record.url
+        xml.ignorableWhitespace("\n")
+        xml.startElement("entry", {})
+        _element(xml, "title", record.title)
+        _element(xml, "link", None, {"href": url})
+        _element(xml, "id", url)
+        _element(xml, "updated", _atom_time(_timestamp(_updated(record))))
+        if record.date:
+            _element(xml, "published", _atom_time(_timestamp(record.date)))
+        if content is not None:
+            _element(xml, "content", absolute_urls(content, site_url), {"type": "html"})
+        else:
+            _element(xml, "summary", record.summary)
+        xml.endElement("entry")
+    xml.ignorableWhitespace("\n")
+    xml.endElement("feed")
+
+
+def _element(xml, name, text, attrs=None):
+    """Write one element with optional text content."""
+    xml.ignorableWhitespace("\n")
+    xml.startElement(name, attrs or {})
+    if text:
+        xml.characters(text)
+    xml.endElement(name)
+
+
+def _updated(record):
+    """When an entry last changed: its date, or else its source mtime."""
+    return record.date or record.modified
+
+
+def _timestamp(value):
+    """Parse an ISO 8601 date or time as UTC; dates without a zone are taken as UTC."""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def _atom_time(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _TextSink(io.TextIOBase):
+    """
+    Text stream over an OutputWriter.
+
+    XMLGenerator writes to text streams as they are, but wraps anything else
+    in an encoder that hands it bytes.
+    """
+
+    def __init__(self, out):
+        self._out = out
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        return self._out.write(text)
@@ -0,0 +1,168 @@
+import os
+import re
+from datetime import datetime
+
+
+# Lines that open and close a front matter block
+DELIMITER = "---"
+CLOSING = ("---", "...")
+
+# Headers longer than this are taken to be a missing closing line
+MAX_FRONT_MATTER_BYTES = 16 * 1024
+
+# Bytes read at a time while looking for the end of the header
+READ_SIZE = 4096
+
+_OPENING = DELIMITER.encode()
+_CLOSING_RE = re.compile(rb"\n(?:---|\.\.\.)\r?\n")
+
+_KEY_RE = re.compile(r"[A-Za-z_][\w-]*$")
+
+
+def read_front_matter(path):
+    """
+    Read the front matter of a markdown file without reading its body.
+
+    Only the lines up to the closing delimiter are read, so listing the
+    metadata of every page costs a few KB per file whatever its length.
+
+    Args:
+        path: Path to the markdown file
+
+    Returns:
+        Dict of metadata; empty if the file has no front matter
+
+    Raises:
+        ValueError: If the front matter is malformed
+    """
+    # Raw reads: most pages have no front matter, and for them this costs
+    # one small read instead of setting up a buffered text file
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.read(fd, READ_SIZE)
+        if not data.startswith(_OPENING):
+            return {}
+        while True:
+            match = _CLOSING_RE.search(data)
+            if match is not None:
+                data = data[:match.end()]
+                break
+            if len(data) > MAX_FRONT_MATTER_BYTES:
+                raise ValueError(f"{path}: front matter is not closed with {DELIMITER}")
+            chunk = os.read(fd, READ_SIZE)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        os.close(fd)
+    return split_front_matter(data.decode('utf-8'), path)[0]
+
+
+def split_front_matter(markdown, path=None):
+    """
+    Separate the front matter of markdown text from its body.
+
+    Args:
+        markdown: Markdown text, possibly starting with a front matter block
+        path: Optional file name to put in error messages
+
+    Returns:
+        Tuple of (metadata dict, body, number of lines before the body)
+
+    Raises:
+        ValueError: If the front matter is malformed
+    """
+    if not markdown.startswith(DELIMITER):
+        return {}, markdown, 0
+    lines = markdown.splitlines(keepends=True)
+    if lines[0].rstrip("\r\n") != DELIMITER:
+        return {}, markdown, 0
+    for number, line in enumerate(lines[1:], 1):
+        if line.rstrip("\r\n") in CLOSING:
+            return _parse(lines[1:number], path), "".join(lines[number + 1:]), number + 1
+    raise ValueError(f"{path or 'markdown'}: front matter is not closed with {DELIMITER}")
+
+
+def page_template(meta, dir_template_path, default_template_path):
+    """
+    Return the template a page is rendered with.
+
+    A "template" in the front matter names a file relative to the directory
+    of the default template; otherwise the template of the page's directory
+    applies.
+    """
+    name = meta.get("template")
+    if not name:
+        return dir_template_path
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(default_template_path)), name))
+
+
+def _parse(lines, path):
+    """
+    Parse the lines of a front matter block.
+
+    The block is a small subset of YAML: "key: value" lines, with values
+    that are strings (optionally quoted), booleans, or lists written as
+    [a, b] or as "- item" lines below the key. Blank lines and lines
+    starting with # are ignored.
+    """
+    where = path or "markdown"
+    meta = {}
+    key = None
+    for number, line in enumerate(lines, 2):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") or stripped == "-":
+            if key is None or not isinstance(meta[key], list):
+                raise ValueError(f"{where}:{number}: list item without a key")
+            meta[key].append(_scalar(stripped[1:].strip()))
+            continue
+
+        key, sep, value = stripped.partition(":")
+        key = key.strip()
+        if not sep or not _KEY_RE.match(key):
+            raise ValueError(f"{where}:{number}: expected 'key: value', got {stripped!r}")
+        value = value.strip()
+        if not value:
+            # Either empty or followed by "- item" lines
+            meta[key] = []
+        elif value.startswith("[") and value.endswith("]"):
+            meta[key] = [_scalar(item.strip()) for item in value[1:-1].split(",") if item.strip()]
+        else:
+            meta[key] = _scalar(value)
+    return _check(meta, where)
+
+
+def _scalar(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    lowered = value.lower()
+    if lowered in ("true", "yes"):
+        return True
+    if lowered in ("false", "no"):
+        return False
+    return value
+
+
+def _check(meta, where):
+    """Validate and normalize the keys the generator itself uses."""
+    if "date" in meta:
+        date = meta["date"]
+        try:
+            datetime.fromisoformat(date)
+        except (TypeError, ValueError):
+            raise ValueError(f"{where}: date must be an ISO 8601 date such as 2024-05-01, "
+                             f"not {date!r}") from None
+    if "draft" in meta and not isinstance(meta["draft"], bool):
+        raise ValueError(f"{where}: draft must be true or false, not {meta['draft']!r}")
+    if "tags" in meta:
+        tags = meta["tags"]
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        elif not isinstance(tags, list):
+            tags = [tags]
+        meta["tags"] = [str(tag) for tag in tags]
+    if meta.get("template") and not isinstance(meta["template"], str):
+        raise ValueError(f"{where}: template must be a file name")
+    return meta
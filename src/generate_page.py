@@ -1,9 +1,31 @@
+import hashlib
+import io
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from extract_title import extract_title
+from front_matter import page_template, read_front_matter, split_front_matter
 from block_markdown import markdown_to_html_node
+from node_factory import NodeFactory
+from output import OutputWriter
+from search import term_frequencies
+from textnode import TextType
+from shard import BY_HASH, select_shard
+from snapshot import TreeSnapshot
+from template import (TEMPLATE_FILENAME, load_template, get_asset_dir, get_template_cache_dir, set_asset_dir,
+                      set_template_cache_dir)
 
 
-def generate_page(from_path, template_path, dest_path, basepath="/"):
+# A word is a run of non-space characters with at least one letter or digit,
+# so stray punctuation between inline nodes is not counted
+_WORD_RE = re.compile(r"\S*\w\S*")
+
+# Longest summary taken from the first paragraph of a page, in characters
+SUMMARY_LENGTH = 200
+
+
+def generate_page(from_path, template_path, dest_path, basepath="/", context=None, factory=None):
     """
     Generate an HTML page from a markdown file using a template.
     
@@ -12,6 +34,14 @@ def generate_page(from_path, template_path, dest_path, basepath="/"):
         template_path: Path to the HTML template file  
         dest_path: Path where the generated HTML should be written
         basepath: Base path for all URLs in the site (default: "/")
+        context: Optional dict of extra template variables, such as page
+            collections for {% for %} loops
+        factory: Optional NodeFactory that shares identical nodes between
+            pages (see node_factory.py)
+        
+    Returns:
+        Dict of facts gathered while rendering (see page_values), plus
+        "written": False when the existing file was already identical
     """
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
     
@@ -19,71 +49,327 @@ def generate_page(from_path, template_path, dest_path, basepath="/"):
     with open(from_path, 'r', encoding='utf-8') as f:
         markdown_content = f.read()
     
-    # Read the template file
-    with open(template_path, 'r', encoding='utf-8') as f:
-        template_content = f.read()
+    # Compiled once per template and reused while the file is unchanged
+    template = load_template(template_path)
+    info = {}
+    values = page_values(markdown_content, basepath, context, info, from_path, factory)
+    # Only in-memory renderers need the tree; don't ship it back from workers
+    del info["content"]
+    
+    # Create destination directory if it doesn't exist; parallel workers
+    # may race to create the same directory
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    
+    # Write the final HTML segment by segment, without building the full
+    # page; a file that already holds the same bytes is left untouched
+    with OutputWriter(dest_path) as f:
+        template.write(f, values)
+    info["written"] = f.changed
+    
+    if f.changed:
+        print(f"Page generated successfully at {dest_path}")
+    else:
+        print(f"Page unchanged at {dest_path}")
+    return info
+
+
+def page_values(markdown_content, basepath="/", context=None, info=None, path=None, factory=None):
+    """
+    Render markdown and collect the template variables for one page.
+    
+    A front matter block at the top of the markdown (see front_matter.py)
+    is removed before rendering.
+    
+    Args:
+        markdown_content: Markdown text of the page, with or without front
+            matter
+        basepath: Base path for all URLs in the site (default: "/")
+        context: Optional dict of extra template variables
+        info: Optional dict that receives facts gathered during rendering:
+            "title", "links", a list of (text_type value, url) pairs for
+            every link and image with its URL as written in the markdown,
+            "words", the number of words of text outside code blocks,
+            "date" and "tags" from the front matter (None and [] without),
+            "summary", the front matter summary or else the start of the
+            first paragraph, "content_hash", the SHA-256 hex digest of the
+            rendered content HTML, "terms", the
+            search terms of the text with their frequencies, and "content",
+            the HTMLNode tree of the page content
+        path: Optional file name for front matter error messages
+        factory: Optional NodeFactory; identical nodes are then shared and
+            serialized once (see node_factory.py)
+        
+    Returns:
+        Dict of template variables including Title, Content and basepath
     
-    # Convert markdown to HTML
-    html_node = markdown_to_html_node(markdown_content)
+    Raises:
+        ValueError: If the front matter is malformed
+    """
+    meta, markdown_content, _ = split_front_matter(markdown_content, path)
+    collector = None
+    if info is not None:
+        links = []
+        texts = []
+        
+        def collector(text_node):
+            if text_node.url is not None:
+                links.append((text_node.text_type.value, text_node.url))
+            if text_node.text_type != TextType.IMAGE:
+                texts.append(text_node.text)
+        
+        info["links"] = links
+    
+    # Convert markdown to HTML, resolving content URLs against the basepath
+    html_node = markdown_to_html_node(markdown_content, factory, basepath, collector)
     html_content = html_node.to_html()
     
     # Extract the title
     title = extract_title(markdown_content)
+    if info is not None:
+        info["title"] = title
+        info["date"] = meta.get("date")
+        info["tags"] = meta.get("tags", [])
+        info["summary"] = meta.get("summary") or _summary(html_node)
+        info["content_hash"] = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+        # Joined with spaces, words never run across two inline nodes
+        text = " ".join(texts)
+        info["words"] = len(_WORD_RE.findall(text))
+        info["terms"] = term_frequencies(text)
+        info["content"] = html_node
     
-    # Replace placeholders in template
-    final_html = template_content.replace("{{ Title }}", title)
-    final_html = final_html.replace("{{ Content }}", html_content)
+    # Placeholders and the template's root-relative URLs are slots
+    values = dict(context) if context else {}
+    values.update({"Title": title, "Content": html_content, "basepath": basepath})
+    return values
+
+
+def render_page(markdown_content, template_path, basepath="/", context=None, info=None, path=None,
+                factory=None):
+    """
+    Render markdown text into a complete HTML page string.
     
-    # Replace URL paths with basepath
-    final_html = final_html.replace('href="/', f'href="{basepath}')
-    final_html = final_html.replace('src="/', f'src="{basepath}')
+    Args:
+        markdown_content: Markdown text of the page
+        template_path: Path to the HTML template file
+        basepath: Base path for all URLs in the site (default: "/")
+        context: Optional dict of extra template variables
+        info: Optional dict that receives the facts gathered during
+            rendering (see page_values)
+        path: Optional file name for front matter error messages
+        factory: Optional NodeFactory that shares identical nodes
+        
+    Returns:
+        The final HTML of the page
+    """
+    template = load_template(template_path)
+    return template.render(page_values(markdown_content, basepath, context, info, path, factory))
+
+
+def _summary(html_node):
+    """Return the text of the first paragraph, shortened to SUMMARY_LENGTH."""
+    # Paragraphs holding nothing but links and images, such as a "back
+    # home" link, are navigation rather than text
+    paragraph = next((child for child in html_node.children if child.tag == "p" and
+                      any(node.tag not in ("a", "img") and node.to_html().strip() for node in child.children)),
+                     None)
+    if paragraph is None:
+        return ""
+    parts = []
+    _collect_text(paragraph, parts)
+    text = " ".join("".join(parts).split())
+    if len(text) <= SUMMARY_LENGTH:
+        return text
+    cut = text.rfind(" ", 0, SUMMARY_LENGTH)
+    return text[:cut if cut > 0 else SUMMARY_LENGTH].rstrip(",;:") + "\u2026"
+
+
+def _collect_text(node, parts):
+    if node.children is None:
+        # Images have no text of their own
+        if node.tag != "img":
+            parts.append(node.value)
+        return
+    for child in node.children:
+        _collect_text(child, parts)
+
+
+def page_output_path(rel_path):
+    """
+    Map a markdown path relative to the content directory to its HTML path.
     
-    # Create destination directory if it doesn't exist
-    dest_dir = os.path.dirname(dest_path)
-    if dest_dir and not os.path.exists(dest_dir):
-        os.makedirs(dest_dir)
+    Only the extension changes, so directories such as "notes.md/" keep
+    their name.
+    """
+    if rel_path.endswith('.md'):
+        return rel_path[:-len('.md')] + '.html'
+    return os.path.splitext(rel_path)[0] + '.html'
+
+
+def find_pages(dir_path_content, template_path, dest_dir_path, snapshot=None, drafts=False):
+    """
+    List every markdown page in a content directory.
     
-    # Write the final HTML to the destination file
-    with open(dest_path, 'w', encoding='utf-8') as f:
-        f.write(final_html)
+    Directories and files are visited in sorted order, so the result (and
+    everything built from it) is the same on every run and every machine.
     
-    print(f"Page generated successfully at {dest_path}")
+    Only the front matter of each page is read, not its body: pages marked
+    "draft: true" are left out, and a "template" entry overrides the
+    template of the page's directory.
+    
+    Args:
+        dir_path_content: Path to the content directory containing markdown files
+        template_path: Path to the default HTML template file
+        dest_dir_path: Path to the destination directory for generated HTML files
+        snapshot: Optional TreeSnapshot of dir_path_content to list the
+            files from instead of reading the directories again
+        drafts: Include pages marked as drafts
+        
+    Returns:
+        List of (markdown_path, template_path, dest_path) tuples
+    
+    Raises:
+        ValueError: If the front matter of a page is malformed
+    """
+    if snapshot is None:
+        snapshot = TreeSnapshot(dir_path_content)
+    pages = []
+    dir_templates = {}
+    
+    for rel_dir, dirs, files in snapshot.walk():
+        # Same lookup as find_template, but using the listing the snapshot
+        # already made: a template.html here wins, otherwise inherit from
+        # the parent
+        dir_template = snapshot.get(f"{rel_dir}/{TEMPLATE_FILENAME}" if rel_dir else TEMPLATE_FILENAME)
+        if dir_template is not None:
+            page_template_path = dir_template.path
+        elif rel_dir:
+            page_template_path = dir_templates[rel_dir.rpartition("/")[0]]
+        else:
+            page_template_path = template_path
+        dir_templates[rel_dir] = page_template_path
+        
+        # Pages keep their directory below dest_dir_path; joined once per
+        # directory rather than once per file
+        dest_prefix = os.path.join(dest_dir_path, *rel_dir.split("/"), "")
+        
+        for entry in files:
+            name = entry.name
+            if name.endswith('.md'):
+                meta = read_front_matter(entry.path)
+                if meta.get("draft") and not drafts:
+                    continue
+                # Change the extension from .md to .html
+                dest_path = dest_prefix + page_output_path(name)
+                
+                pages.append((entry.path, page_template(meta, page_template_path, template_path),
+                              dest_path))
+    
+    return pages
 
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath="/"):
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath="/", jobs=1,
+                             shard=None, shard_by=BY_HASH):
     """
     Recursively generate HTML pages from all markdown files in a directory.
     
+    A template.html placed inside the content tree overrides template_path
+    for its directory and all subdirectories.
+    
+    With jobs > 1 pages are rendered on a process pool. Each worker loads its
+    configuration and compiled templates once. The log of every page is
+    captured in the worker and printed here in page order, so output files
+    and the build log are identical for any number of workers.
+    
+    With shard, only the pages of one shard are generated, so several
+    machines can each build a part of a large site (see shard.py).
+    
     Args:
         dir_path_content: Path to the content directory containing markdown files
-        template_path: Path to the HTML template file
+        template_path: Path to the default HTML template file
         dest_dir_path: Path to the destination directory for generated HTML files
         basepath: Base path for all URLs in the site (default: "/")
+        jobs: Number of worker processes (default: 1, render in this process)
+        shard: Optional (index, count) tuple from shard.parse_shard
+        shard_by: How pages are assigned to shards, shard.BY_HASH or
+            shard.BY_SIZE
     """
     print(f"Generating pages recursively from {dir_path_content} to {dest_dir_path}")
     
-    # Walk through all directories and files in the content directory
-    for root, dirs, files in os.walk(dir_path_content):
-        for file in files:
-            if file.endswith('.md'):
-                # Get the full path to the markdown file
-                markdown_path = os.path.join(root, file)
-                
-                # Calculate the relative path from the content directory
-                rel_path = os.path.relpath(markdown_path, dir_path_content)
-                
-                # Change the extension from .md to .html
-                html_rel_path = rel_path.replace('.md', '.html')
-                
-                # Create the destination path
-                dest_path = os.path.join(dest_dir_path, html_rel_path)
-                
-                # Generate the page
-                generate_page(markdown_path, template_path, dest_path, basepath)
+    pages = find_pages(dir_path_content, template_path, dest_dir_path)
+    if shard is not None:
+        pages = select_shard(pages, dir_path_content, shard, shard_by)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(pages)} page(s)")
+    generate_pages(pages, basepath, jobs)
     
     print(f"Finished generating all pages from {dir_path_content}")
 
 
+def generate_pages(pages, basepath="/", jobs=1, factory=None):
+    """
+    Generate a list of pages, serially or on a process pool.
+    
+    Args:
+        pages: List of (markdown_path, template_path, dest_path) tuples, as
+            returned by find_pages
+        basepath: Base path for all URLs in the site (default: "/")
+        jobs: Number of worker processes (default: 1, render in this process)
+        factory: Optional NodeFactory shared by every page; nodes cannot
+            cross processes, so with jobs > 1 each worker shares nodes
+            through a NodeFactory of its own instead
+        
+    Returns:
+        List with the info dict returned by generate_page for each page, in
+        the same order as pages
+    """
+    if jobs <= 1 or len(pages) <= 1:
+        return [
+            generate_page(markdown_path, page_template_path, dest_path, basepath, factory=factory)
+            for markdown_path, page_template_path, dest_path in pages
+        ]
+    
+    template_paths = sorted({page[1] for page in pages})
+    chunksize = max(1, len(pages) // (jobs * 4))
+    
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(basepath, template_paths, get_template_cache_dir(), get_asset_dir(), factory is not None),
+    ) as executor:
+        infos = []
+        for log, info in executor.map(_generate_page_job, pages, chunksize=chunksize):
+            print(log, end="")
+            infos.append(info)
+        return infos
+
+
+# Build configuration of a pool worker, set once by _init_worker
+_worker_basepath = "/"
+_worker_factory = None
+
+
+def _init_worker(basepath, template_paths, template_cache_dir, asset_dir, share_nodes=False):
+    """Load configuration and compile templates once per worker process."""
+    global _worker_basepath, _worker_factory
+    _worker_basepath = basepath
+    _worker_factory = NodeFactory() if share_nodes else None
+    set_template_cache_dir(template_cache_dir)
+    set_asset_dir(asset_dir)
+    for path in template_paths:
+        load_template(path)
+
+
+def _generate_page_job(page):
+    """Generate one page in a worker and return its captured log and info."""
+    markdown_path, page_template_path, dest_path = page
+    log = io.StringIO()
+    with redirect_stdout(log):
+        info = generate_page(markdown_path, page_template_path, dest_path, _worker_basepath,
+                             factory=_worker_factory)
+    return log.getvalue(), info
+
+
 if __name__ == "__main__":
     # Test the functions
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -0,0 +1,796 @@
+import os
+from copy_static import file_record, sync_files_recursive, remove_empty_dirs
+from front_matter import page_template, read_front_matter
+from generate_page import find_pages, generate_pages, page_output_path, page_values
+from depgraph import DependencyGraph, DependencyResolver, ASSET, PAGE, SOURCE, STATIC, TEMPLATE, dep_key, split_key
+from feed import ATOM, RSS, entry_hash, feed_output, write_feed
+from link_check import BrokenLink, check_links
+from listing import directory_title, find_listings, listing_output, listing_values, paginate, record_hash
+from node_factory import NodeFactory
+from manifest import BuildManifest, GENERATOR_VERSION, MANIFEST_FILENAME, is_build_state
+from page_index import PageIndex
+from pipeline import run_pipeline
+from output import copy_file, write_if_changed
+from shard import BY_HASH, select_shard
+from search import SEARCH_DIR, SEARCH_SCRIPT_FILENAME, write_search_index
+from sitemap import page_url, sitemap_pages, write_sitemaps
+from snapshot import SiteSnapshot
+from template import TEMPLATE_FILENAME, find_template, load_template, set_asset_dir
+
+
+# What a generated output without a source is, by the key its manifest entry has
+_GENERATED_KINDS = (("listing", "listing page"), ("feed", "feed"), ("sitemap", "sitemap"),
+                    ("search", "search file"))
+
+
+class BuildResult:
+    """
+    Summary of an incremental build.
+
+    Attributes:
+        rendered: Output paths of pages that were regenerated
+        identical: Rendered or generated output paths whose file already
+            held the same bytes, so it was not rewritten
+        unchanged: Number of pages skipped because their inputs did not change
+        removed: Output paths of pages deleted because their source is gone
+        generated: Output paths of listing pages, feeds, sitemaps and search
+            files that were written
+        generated_unchanged: Number of those left as they were
+        generated_removed: Output paths of those deleted because they are no
+            longer needed
+        static_copied: Relative paths of static files copied
+        static_unchanged: Number of static files left as they were
+        static_removed: Relative paths of static files deleted
+        pruned: Relative paths of leftover files deleted from an output
+            directory that had no manifest
+        broken_links: BrokenLink of every link and image whose target the
+            site does not have (see link_check.py)
+        pipeline_stats: PipelineStats of the render step when pages were
+            rendered by the pipeline, else None
+    """
+
+    def __init__(self):
+        self.rendered = []
+        self.identical = []
+        self.unchanged = 0
+        self.removed = []
+        self.generated = []
+        self.generated_unchanged = 0
+        self.generated_removed = []
+        self.static_copied = []
+        self.static_unchanged = 0
+        self.static_removed = []
+        self.pruned = []
+        self.broken_links = []
+        self.pipeline_stats = None
+
+    def file_counts(self):
+        """
+        Count what happened to the files in the output directory.
+
+        Returns:
+            Tuple of (written, unchanged, deleted)
+        """
+        written = (len(self.rendered) + len(self.generated) - len(self.identical) +
+                   len(self.static_copied))
+        unchanged = self.unchanged + self.generated_unchanged + len(self.identical) + self.static_unchanged
+        deleted = len(self.removed) + len(self.generated_removed) + len(self.static_removed) + len(self.pruned)
+        return written, unchanged, deleted
+
+    def __repr__(self):
+        written, unchanged, deleted = self.file_counts()
+        return f"BuildResult(written: {written}, unchanged: {unchanged}, deleted: {deleted})"
+
+
+def build_site(static_dir, content_dir, template_path, dest_dir, basepath="/", jobs=1, full=False,
+               cache=None, shard=None, shard_by=BY_HASH, snapshot=None, feeds=None, site_url=None,
+               search=None, pipeline=None, share_nodes=False):
+    """
+    Build the site, regenerating only pages whose inputs changed.
+
+    The manifest stored in dest_dir records, for each page, the hash of
+    every dependency it was built from: its markdown source, its template
+    and each partial, and the static files its HTML links to (see
+    depgraph.py), together with the basepath and the generator version. A
+    page is regenerated when any of these differ or its output file is
+    missing. Outputs whose source was deleted are removed. Static files are
+    synced the same way by size and mtime.
+
+    A link to a static file only records that the file exists. URLs that a
+    template fingerprints (see template.py) carry the content hash of the
+    file in static_dir, so pages using that template record the hash too and
+    are rebuilt when the file's bytes change.
+
+    Without a manifest (first build) or with full=True, every page is
+    rendered and files in the output directory that the build did not
+    produce are deleted. Pages and static files whose bytes did not change
+    are never rewritten, so their mtimes survive even a full rebuild.
+
+    The facts gathered while rendering each page (title, URL, dates, word
+    count, summary and links) are kept in the page index of dest_dir (see
+    page_index.py); a page missing from the index is rendered again.
+
+    Directories with pages but no index.md get paginated listing pages (see
+    listing.py), made from the index rows, so no page is parsed twice.
+    Each listing page records a "page:" dependency on the facts of every
+    page it shows and is rewritten only when one of them changes. With
+    feeds, each listed directory also gets RSS and Atom feeds of its newest
+    pages (see feed.py), tracked the same way. With site_url, a sitemap of
+    every page is written too (see sitemap.py), and with search a search
+    index made from the terms each page's render pass collected (see
+    search.py); it is written again only when some page changed.
+
+    Every link and image in the index is then checked against the pages,
+    generated files and static files of the site, and each broken one is
+    reported with the source file and line it is written on (see
+    link_check.py).
+
+    With shard, only the pages assigned to that shard are built (see
+    shard.py) and static files are copied by the first shard only, so the
+    output directory holds one part of the site and a manifest for it;
+    merge_shards combines the parts. Listings need every page, so shards
+    make none, nor feeds, a sitemap or a search index, and check no
+    links; building the merged directory again does all of that and
+    renders nothing else.
+
+    Args:
+        static_dir: Path to the static files directory
+        content_dir: Path to the content directory containing markdown files
+        template_path: Path to the default HTML template file
+        dest_dir: Path to the output directory
+        basepath: Base path for all URLs in the site (default: "/")
+        jobs: Number of worker processes for page generation
+        full: Ignore the manifest and rebuild from a clean output directory
+        cache: Optional BuildCache; pages found in it are copied instead of
+            rendered, and rendered pages are added to it
+        shard: Optional (index, count) tuple from shard.parse_shard
+        shard_by: How pages are assigned to shards, shard.BY_HASH or
+            shard.BY_SIZE
+        snapshot: Optional SiteSnapshot of static_dir and content_dir that
+            is current; read here when not given
+        feeds: Optional FeedSettings; without it no feeds are written
+        site_url: Optional scheme and host the site is published at, such
+            as "https://example.com"; without it no sitemap is written
+        search: Optional SearchSettings; without it no search index is
+            written
+        pipeline: Optional dict of run_pipeline options, such as
+            {"read_queue_depth": 32}; stale pages are then rendered by the
+            threaded pipeline of pipeline.py instead of jobs processes
+        share_nodes: Render stale pages with a NodeFactory, so nodes that
+            repeat across pages are shared and serialized once (see
+            node_factory.py)
+
+    Returns:
+        BuildResult describing what was done
+    """
+    result = BuildResult()
+    # Fingerprinted URLs are rendered from, and recorded against, these files
+    set_asset_dir(os.path.abspath(static_dir))
+    # Both source trees are listed once and shared by every step
+    if snapshot is None:
+        snapshot = SiteSnapshot(static_dir, content_dir)
+
+    manifest = None if full else BuildManifest.load(dest_dir)
+    # Without a manifest nothing in dest_dir can be trusted: every page is
+    # rendered and leftover files are pruned at the end
+    prune = manifest is None
+    if manifest is None:
+        manifest = BuildManifest(os.path.join(dest_dir, MANIFEST_FILENAME))
+
+    # Step 1: static files
+    if shard is None or shard[0] == 1:
+        static_record, result.static_copied, result.static_removed = sync_files_recursive(
+            static_dir, dest_dir, manifest.static, snapshot.static)
+        result.static_unchanged = len(static_record) - len(result.static_copied)
+        copied_static = static_record
+    else:
+        # Other shards copy nothing, but pages still record the static
+        # files they link to
+        static_record = file_record(static_dir, snapshot.static)
+        copied_static = {}
+        for rel_path in sorted(manifest.static):
+            dest_path = os.path.join(dest_dir, rel_path)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+                remove_empty_dirs(os.path.dirname(dest_path), dest_dir)
+            result.static_removed.append(rel_path)
+
+    # Step 2: decide which pages are stale
+    pages = find_pages(content_dir, template_path, dest_dir, snapshot.content)
+    if shard is not None:
+        pages = select_shard(pages, content_dir, shard, shard_by, snapshot.content)
+    resolver = DependencyResolver(content_dir, os.path.dirname(os.path.abspath(template_path)),
+                                  static_record)
+    # Changes are committed only by close() at the end, so a failed build
+    # leaves the index as it was
+    index = PageIndex.open(dest_dir)
+    indexed = index.outputs()
+
+    # find_pages joins every path onto these prefixes
+    content_prefix = len(os.path.join(content_dir, ""))
+    dest_prefix = len(os.path.join(dest_dir, ""))
+    entries = {}
+    stale = []
+
+    for page in pages:
+        markdown_path, page_template_path, dest_path = page
+        rel_dest = dest_path[dest_prefix:].replace(os.sep, "/")
+        source = markdown_path[content_prefix:].replace(os.sep, "/")
+        template_deps = resolver.template_dependencies(page_template_path)[0]
+
+        previous = manifest.pages.get(rel_dest)
+        if (_is_stale(previous, source, template_deps, basepath, resolver) or rel_dest not in indexed
+                or not os.path.exists(dest_path)):
+            stale.append(page)
+            entries[rel_dest] = None
+            result.rendered.append(rel_dest)
+        else:
+            entries[rel_dest] = previous
+            result.unchanged += 1
+
+    # Step 3: render what changed, recording what each page was built from
+    _render_pages(stale, basepath, jobs, resolver, content_prefix, dest_prefix, entries, result,
+                  index, cache, pipeline, NodeFactory() if share_nodes else None)
+    index.retain(entries)
+
+    # Step 4: listing pages, feeds and the sitemap, from the index rows of
+    # the pages they list; a shard holds only some of those rows, so
+    # merge_shards writes them instead. When no page changed and no static
+    # file appeared or went away, they and the link check of step 5 would
+    # come out as last time, so the last build's entries and broken links
+    # are kept
+    settings = _generated_settings(basepath, feeds, site_url, search)
+    quiet = (shard is None and not stale and not prune and manifest.shard is None and
+             manifest.generated == settings and copied_static.keys() == manifest.static.keys() and
+             all(rel_dest in entries for rel_dest, entry in manifest.pages.items() if "source" in entry) and
+             _generated_current(manifest.pages, dest_dir, resolver))
+    if quiet:
+        for rel_dest, entry in manifest.pages.items():
+            if "source" not in entry:
+                entries[rel_dest] = entry
+                result.generated_unchanged += 1
+        result.broken_links = [BrokenLink(*link) for link in manifest.broken_links]
+    elif shard is None:
+        _update_generated(index, content_dir, template_path, dest_dir, basepath, resolver, feeds, site_url,
+                          search, manifest.pages, entries, result)
+
+    # Step 5: check every link and image against what the site now holds;
+    # a shard holds only part of it
+    if shard is None:
+        if not quiet:
+            result.broken_links = check_links(index.all_links(), set(entries) | set(copied_static),
+                                              lambda output: entries[output]["source"], content_dir)
+        for link in result.broken_links:
+            location = os.path.join(content_dir, link.source) + (f":{link.line}" if link.line else "")
+            print(f"Warning: broken {link.kind} in {location}: {link.url}")
+    index.close()
+
+    # Step 6: remove pages whose source is gone, generated files no longer
+    # needed, and pages that moved to another shard
+    for rel_dest in sorted(manifest.pages):
+        if rel_dest not in entries:
+            _remove_output(dest_dir, rel_dest, manifest.pages[rel_dest])
+            if "source" in manifest.pages[rel_dest]:
+                result.removed.append(rel_dest)
+            else:
+                result.generated_removed.append(rel_dest)
+
+    if prune:
+        result.pruned = _prune_outputs(dest_dir, set(entries) | set(copied_static))
+
+    if shard is not None:
+        settings = None
+    broken_links = [list(link) for link in result.broken_links]
+    # A no-op build leaves the manifest untouched
+    if (entries != manifest.pages or copied_static != manifest.static or shard != manifest.shard
+            or settings != manifest.generated or broken_links != manifest.broken_links
+            or not os.path.exists(manifest.path)):
+        manifest.pages = entries
+        manifest.static = copied_static
+        manifest.shard = shard
+        manifest.generated = settings
+        manifest.broken_links = broken_links
+        manifest.save()
+
+    return result
+
+
+def rebuild_changed(changed_paths, static_dir, content_dir, template_path, dest_dir,
+                    basepath="/", manifest=None, save=True, snapshot=None, feeds=None, site_url=None,
+                    search=None):
+    """
+    Update a built site after some input files changed, without rescanning it.
+
+    Only the changed files are looked at: changed static files are copied,
+    deleted ones removed, and the dependency graph recorded in the manifest
+    gives the pages to regenerate. Cost depends on the size of the change,
+    not the size of the site.
+
+    Changes that move pages between templates, or delete whole directories,
+    fall back to a full incremental build with build_site. Listing pages,
+    feeds, the sitemap and the search index are then updated from the page
+    index like build_site does.
+
+    Args:
+        changed_paths: Paths of changed, created or deleted files
+        static_dir: Path to the static files directory
+        content_dir: Path to the content directory containing markdown files
+        template_path: Path to the default HTML template file
+        dest_dir: Path to the output directory of an earlier build
+        basepath: Base path for all URLs in the site (default: "/"); must
+            match the earlier build
+        manifest: BuildManifest of dest_dir kept from the previous call, to
+            avoid loading it again
+        save: Write the updated manifest before returning; with save=False
+            the caller must call manifest.save() later, for example once
+            the site is idle
+        snapshot: SiteSnapshot kept from the previous call; it is updated
+            with changed_paths, so a fallback to build_site does not list
+            the source trees again
+        feeds: Optional FeedSettings, as given to build_site
+        site_url: Optional site URL for the sitemap, as given to build_site
+        search: Optional SearchSettings, as given to build_site
+
+    Returns:
+        Tuple of (BuildResult, manifest) to pass to the next call
+    """
+    static_dir = os.path.abspath(static_dir)
+    content_dir = os.path.abspath(content_dir)
+    template_dir = os.path.dirname(os.path.abspath(template_path))
+    dest_dir = os.path.abspath(dest_dir)
+    set_asset_dir(static_dir)
+    if snapshot is not None:
+        snapshot.update(changed_paths)
+
+    def full_build():
+        return (build_site(static_dir, content_dir, template_path, dest_dir, basepath,
+                           snapshot=snapshot, feeds=feeds, site_url=site_url, search=search),
+                BuildManifest.load(dest_dir))
+
+    if manifest is None:
+        manifest = BuildManifest.load(dest_dir)
+        if manifest is None:
+            return full_build()
+
+    result = BuildResult()
+    graph = DependencyGraph(manifest.pages)
+    sources = {entry["source"]: output for output, entry in manifest.pages.items() if "source" in entry}
+    affected = set()
+    # Dependency keys whose hash changed; their dependents are rebuilt
+    changed_keys = []
+    added = []
+    deleted = []
+
+    for path in sorted(os.path.abspath(p) for p in changed_paths):
+        if _is_below(path, static_dir):
+            rel_path = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            dest_path = os.path.join(dest_dir, rel_path)
+            # Pages depend on a static file existing, and on its bytes only
+            # where a template fingerprints its URL
+            changed_keys.append(dep_key(ASSET, rel_path))
+            existed = rel_path in manifest.static
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                manifest.static[rel_path] = [stat.st_size, stat.st_mtime_ns]
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                copy_file(path, dest_path)
+                result.static_copied.append(rel_path)
+            elif rel_path in manifest.static:
+                del manifest.static[rel_path]
+                if os.path.exists(dest_path):
+                    os.remove(dest_path)
+                    remove_empty_dirs(os.path.dirname(dest_path), dest_dir)
+                result.static_removed.append(rel_path)
+            elif not os.path.exists(path) and _has_below(manifest.static, rel_path):
+                return full_build()
+            if existed != (rel_path in manifest.static):
+                changed_keys.append(dep_key(STATIC, rel_path))
+
+        elif _is_below(path, content_dir) and os.path.basename(path) == TEMPLATE_FILENAME:
+            # A directory template that appears or disappears changes which
+            # pages use which template
+            key = _template_key(path, template_dir)
+            if not graph.dependents(key) or not os.path.isfile(path):
+                return full_build()
+            changed_keys.append(key)
+
+        elif (_is_below(path, content_dir) and not os.path.exists(path) and
+              _has_below(sources, os.path.relpath(path, content_dir))):
+            # A deleted or renamed directory stands for every page below it
+            return full_build()
+
+        elif _is_below(path, content_dir) and path.endswith('.md'):
+            source = os.path.relpath(path, content_dir).replace(os.sep, "/")
+            # A page marked as a draft is dropped like a deleted one
+            if os.path.isfile(path) and not read_front_matter(path).get("draft"):
+                if source in sources:
+                    affected.add(sources[source])
+                else:
+                    added.append(source)
+            elif source in sources:
+                deleted.append(sources[source])
+
+        else:
+            # The template or a partial
+            changed_keys.append(_template_key(path, template_dir))
+    affected.update(graph.affected(changed_keys))
+
+    index = PageIndex.open(dest_dir)
+    for rel_dest in deleted:
+        dest_path = os.path.join(dest_dir, rel_dest)
+        if os.path.exists(dest_path):
+            print(f"Removing page with deleted source: {dest_path}")
+            os.remove(dest_path)
+            remove_empty_dirs(os.path.dirname(dest_path), dest_dir)
+        del manifest.pages[rel_dest]
+        index.remove(rel_dest)
+        result.removed.append(rel_dest)
+
+    templates = {}
+    stale = []
+    # Listings are brought up to date after the pages they list
+    for source, rel_dest in ([(manifest.pages[rel_dest]["source"], rel_dest) for rel_dest in sorted(affected)
+                              if "source" in manifest.pages.get(rel_dest, {})] +
+                             [(source, page_output_path(source)) for source in added]):
+        markdown_path = os.path.join(content_dir, source)
+        dir_template = find_template(os.path.dirname(markdown_path), content_dir, template_path, templates)
+        stale.append((markdown_path,
+                      page_template(read_front_matter(markdown_path), dir_template, template_path),
+                      os.path.join(dest_dir, rel_dest)))
+        result.rendered.append(rel_dest)
+
+    resolver = DependencyResolver(content_dir, template_dir, manifest.static)
+    _render_pages(stale, basepath, 1, resolver, len(os.path.join(content_dir, "")),
+                  len(os.path.join(dest_dir, "")), manifest.pages, result, index)
+    # Listings, feeds, sitemaps and search files have no source; they are
+    # looked at only when a page, or something they use themselves, changed
+    settings = _generated_settings(basepath, feeds, site_url, search)
+    new_settings = settings != manifest.generated
+    if affected or added or deleted or new_settings:
+        generated = {rel_dest: entry for rel_dest, entry in manifest.pages.items() if "source" not in entry}
+        for rel_dest in generated:
+            del manifest.pages[rel_dest]
+        _update_generated(index, content_dir, template_path, dest_dir, basepath, resolver, feeds, site_url,
+                          search, generated, manifest.pages, result)
+        for rel_dest in sorted(set(generated) - set(manifest.pages)):
+            _remove_output(dest_dir, rel_dest, generated[rel_dest])
+            result.generated_removed.append(rel_dest)
+        manifest.generated = settings
+    else:
+        result.generated_unchanged = sum(1 for entry in manifest.pages.values() if "source" not in entry)
+    index.close()
+    result.unchanged = sum(1 for entry in manifest.pages.values() if "source" in entry) - len(result.rendered)
+
+    if save and (result.rendered or result.removed or result.generated or result.generated_removed
+                 or result.static_copied or result.static_removed or new_settings):
+        manifest.save()
+    return result, manifest
+
+
+def update_generated(index, content_dir, template_path, dest_dir, basepath, pages, static, previous,
+                     feeds=None, site_url=None, search=None):
+    """
+    Write the listing pages, feeds, sitemap and search index of a site
+    whose pages are already in dest_dir and in its page index.
+
+    Shards leave these files out, since each of them covers pages from
+    every shard; merge_shards has them written through this once the pages
+    of all shards are in one index.
+
+    Args:
+        index: Open PageIndex of dest_dir
+        content_dir: Path to the content directory containing markdown files
+        template_path: Path to the default HTML template file
+        dest_dir: Output directory
+        basepath: Base path the pages were built with
+        pages: Manifest entries of the pages; the entries of the generated
+            files are added to it
+        static: Static file record, which says which static files exist
+        previous: Manifest entries of the last build of dest_dir, so files
+            whose inputs did not change are not written again
+        feeds: Optional FeedSettings, as for build_site
+        site_url: Optional scheme and host for the sitemap, as for build_site
+        search: Optional SearchSettings, as for build_site
+
+    Returns:
+        BuildResult of the generated files
+    """
+    result = BuildResult()
+    resolver = DependencyResolver(content_dir, os.path.dirname(os.path.abspath(template_path)), static)
+    _update_generated(index, content_dir, template_path, dest_dir, basepath, resolver, feeds, site_url,
+                      search, previous, pages, result)
+    return result
+
+
+def _generated_settings(basepath, feeds, site_url, search):
+    """Return what the generated files of a build depend on besides its pages, as manifest data."""
+    return {
+        "basepath": basepath,
+        "feeds": repr(feeds) if feeds is not None else None,
+        "site_url": site_url or None,
+        "search": repr(search) if search is not None else None,
+    }
+
+
+def _generated_current(previous, dest_dir, resolver):
+    """Check that every generated file of the last build exists and its templates and static files are unchanged."""
+    for rel_dest, entry in previous.items():
+        if "source" in entry:
+            continue
+        if not os.path.exists(os.path.join(dest_dir, rel_dest)):
+            return False
+        for key, value in entry["deps"].items():
+            if split_key(key)[0] != PAGE and resolver.current_hash(key) != value:
+                return False
+    return True
+
+
+def _template_key(path, template_dir):
+    """Return the dependency key of a template file."""
+    return dep_key(TEMPLATE, os.path.relpath(path, template_dir).replace(os.sep, "/"))
+
+
+def _is_below(path, directory):
+    """Check whether an absolute path is inside a directory."""
+    return path.startswith(os.path.join(directory, ""))
+
+
+def _has_below(paths, rel_dir):
+    """Check whether any "/"-separated relative path lies under rel_dir."""
+    prefix = rel_dir.replace(os.sep, "/") + "/"
+    return any(path.startswith(prefix) for path in paths)
+
+
+def _render_pages(pages, basepath, jobs, resolver, content_prefix, dest_prefix, entries, result,
+                  index, cache=None, pipeline=None, factory=None):
+    """Generate pages, store their new manifest entries in entries and index them."""
+    def generate(pages):
+        if pipeline is None:
+            return generate_pages(pages, basepath, jobs, factory)
+        infos = []
+        result.pipeline_stats = run_pipeline(pages, basepath, infos=infos, factory=factory, **pipeline)
+        return infos
+
+    if cache is None:
+        infos = generate(pages)
+    else:
+        infos = _generate_cached(pages, basepath, cache, generate)
+
+    for page, info in zip(pages, infos):
+        markdown_path, page_template_path, dest_path = page
+        rel_dest = dest_path[dest_prefix:].replace(os.sep, "/")
+        if not info["written"]:
+            result.identical.append(rel_dest)
+        source_key = dep_key(SOURCE, markdown_path[content_prefix:].replace(os.sep, "/"))
+        template_deps, template_urls = resolver.template_dependencies(page_template_path)
+
+        deps = {source_key: resolver.current_hash(source_key)}
+        deps.update(template_deps)
+        deps.update(resolver.static_dependencies(template_urls + [url for _, url in info["links"]]))
+        index.put(rel_dest, split_key(source_key)[1], page_url(rel_dest, basepath), info["title"],
+                  info["words"], info["links"], os.stat(markdown_path).st_mtime_ns, info.get("date"),
+                  info.get("summary", ""), info.get("content_hash"), info.get("terms"))
+        entries[rel_dest] = {
+            "source": split_key(source_key)[1],
+            "title": info["title"],
+            "deps": deps,
+            "basepath": basepath,
+            "generator": GENERATOR_VERSION,
+        }
+
+
+def _update_generated(index, content_dir, template_path, dest_dir, basepath, resolver, feeds, site_url,
+                      search, previous, entries, result):
+    """Write the generated files whose contents changed and add their entries to entries."""
+    listings = find_listings(index.pages())
+    _update_listings(listings, content_dir, template_path, dest_dir, basepath, resolver, previous,
+                     entries, result)
+    if feeds is not None:
+        _update_feeds(listings, index, content_dir, dest_dir, basepath, feeds, previous, entries, result)
+    if site_url:
+        _update_sitemap(index, dest_dir, basepath, site_url, entries, result)
+    if search is not None:
+        _update_search(index, dest_dir, basepath, search, previous, entries, result)
+
+
+def _update_listings(listings, content_dir, template_path, dest_dir, basepath, resolver, previous, entries,
+                     result):
+    """Write the listing pages whose contents changed."""
+    templates = {}
+    for rel_dir, pages in sorted(listings.items()):
+        # Listings use the template the pages of their directory would use
+        listing_template = find_template(os.path.join(content_dir, rel_dir), content_dir, template_path,
+                                         templates)
+        template_deps, template_urls = resolver.template_dependencies(listing_template)
+        static_deps = resolver.static_dependencies(template_urls)
+        chunks = paginate(pages)
+        for number, chunk in enumerate(chunks, 1):
+            rel_dest = listing_output(rel_dir, number)
+            if rel_dest in entries:
+                # A markdown page with the same output wins
+                continue
+            deps = {dep_key(PAGE, record.output): record_hash(record) for record in chunk}
+            deps.update(template_deps)
+            deps.update(static_deps)
+            entry = {
+                "listing": rel_dir,
+                "page": number,
+                "last": number == len(chunks),
+                "deps": deps,
+                "basepath": basepath,
+                "generator": GENERATOR_VERSION,
+            }
+            entries[rel_dest] = entry
+            dest_path = os.path.join(dest_dir, rel_dest)
+            if previous.get(rel_dest) == entry and os.path.exists(dest_path):
+                result.generated_unchanged += 1
+                continue
+
+            print(f"Generating listing page {dest_path} using {listing_template}")
+            values = listing_values(rel_dir, number, number == len(chunks), chunk, basepath)
+            if not write_if_changed(dest_path, load_template(listing_template).render(values)):
+                result.identical.append(rel_dest)
+            result.generated.append(rel_dest)
+
+
+def _update_feeds(listings, index, content_dir, dest_dir, basepath, feeds, previous, entries, result):
+    """Write the feeds whose entries changed."""
+    for rel_dir, pages in sorted(listings.items()):
+        newest = pages[:feeds.size]
+        deps = {dep_key(PAGE, record.output): entry_hash(record, index.content_hash(record.output) if feeds.full
+                                                         else None)
+                for record in newest}
+        # Content is rendered again only for a feed that is written
+        items = None
+        link = page_url(listing_output(rel_dir, 1), basepath, feeds.site_url)
+        for kind in (RSS, ATOM):
+            rel_dest = feed_output(rel_dir, kind)
+            if rel_dest in entries:
+                continue
+            entry = {
+                "feed": rel_dir,
+                "format": kind,
+                "deps": deps,
+                "site_url": feeds.site_url,
+                "full": feeds.full,
+                "basepath": basepath,
+                "generator": GENERATOR_VERSION,
+            }
+            entries[rel_dest] = entry
+            dest_path = os.path.join(dest_dir, rel_dest)
+            if previous.get(rel_dest) == entry and os.path.exists(dest_path):
+                result.generated_unchanged += 1
+                continue
+
+            print(f"Generating {kind} feed {dest_path}")
+            if items is None:
+                items = [(record, _page_content(content_dir, record, basepath) if feeds.full else None)
+                         for record in newest]
+            if not write_feed(dest_path, kind, directory_title(rel_dir), link,
+                              page_url(rel_dest, basepath, feeds.site_url), items, feeds.site_url):
+                result.identical.append(rel_dest)
+            result.generated.append(rel_dest)
+
+
+def _page_content(content_dir, record, basepath):
+    """Render the content HTML of an indexed page from its source."""
+    path = os.path.join(content_dir, record.source)
+    with open(path, 'r', encoding='utf-8') as f:
+        return page_values(f.read(), basepath, path=path)["Content"]
+
+
+def _update_sitemap(index, dest_dir, basepath, site_url, entries, result):
+    """Write the sitemap of every page and listing page in entries."""
+    outputs = sorted(rel_dest for rel_dest, entry in entries.items() if "source" in entry or "listing" in entry)
+
+    def pages():
+        return sitemap_pages(outputs, index.modified_times(), dest_dir)
+
+    for rel_dest, changed in write_sitemaps(dest_dir, pages, basepath, site_url):
+        entries[rel_dest] = {
+            "sitemap": site_url,
+            "deps": {},
+            "basepath": basepath,
+            "generator": GENERATOR_VERSION,
+        }
+        if changed:
+            print(f"Generated sitemap {os.path.join(dest_dir, rel_dest)}")
+            result.generated.append(rel_dest)
+        else:
+            result.generated_unchanged += 1
+
+
+def _update_search(index, dest_dir, basepath, search, previous, entries, result):
+    """Write the search index, unless no page changed since it was last written."""
+    entry = {
+        "search": search.shard_budget,
+        "deps": {},
+        "basepath": basepath,
+        "generator": GENERATOR_VERSION,
+    }
+    kept = [rel_dest for rel_dest, old in previous.items() if "search" in old]
+    # Indexes written before the search script existed are written again
+    if (SEARCH_DIR + "/" + SEARCH_SCRIPT_FILENAME in kept and not index.changed
+            and all(previous[rel_dest] == entry and os.path.exists(os.path.join(dest_dir, rel_dest))
+                    for rel_dest in kept)):
+        for rel_dest in kept:
+            entries[rel_dest] = dict(entry)
+        result.generated_unchanged += len(kept)
+        return
+
+    for rel_dest, changed in write_search_index(dest_dir, index.terms(), search.shard_budget):
+        entries[rel_dest] = dict(entry)
+        if changed:
+            print(f"Generated search file {os.path.join(dest_dir, rel_dest)}")
+            result.generated.append(rel_dest)
+        else:
+            result.generated_unchanged += 1
+
+
+def _remove_output(dest_dir, rel_dest, entry):
+    """Delete the output file of a page that is no longer generated."""
+    dest_path = os.path.join(dest_dir, rel_dest)
+    if os.path.exists(dest_path):
+        if "source" in entry:
+            reason = "page with deleted source"
+        else:
+            reason = next(kind for key, kind in _GENERATED_KINDS if key in entry) + " no longer needed"
+        print(f"Removing {reason}: {dest_path}")
+        os.remove(dest_path)
+        remove_empty_dirs(os.path.dirname(dest_path), dest_dir)
+
+
+def _generate_cached(pages, basepath, cache, generate):
+    """Take pages from the build cache where possible and render the rest."""
+    infos = [None] * len(pages)
+    keys = [cache.key_for(markdown_path, template_path, basepath)
+            for markdown_path, template_path, _ in pages]
+    missing = []
+    for index, (page, key) in enumerate(zip(pages, keys)):
+        entry = cache.get(key)
+        if entry is None:
+            missing.append(index)
+            continue
+        html, info = entry
+        info["written"] = write_if_changed(page[2], html.decode('utf-8'))
+        print(f"Page restored from build cache at {page[2]}")
+        infos[index] = info
+
+    rendered = generate([pages[index] for index in missing])
+    for index, info in zip(missing, rendered):
+        with open(pages[index][2], 'rb') as f:
+            cache.put(keys[index], f.read(), info)
+        infos[index] = info
+    return infos
+
+
+def _prune_outputs(dest_dir, keep):
+    """Delete files in dest_dir that the build did not produce."""
+    pruned = []
+    for root, dirs, files in os.walk(dest_dir):
+        for file in files:
+            rel_path = os.path.relpath(os.path.join(root, file), dest_dir).replace(os.sep, "/")
+            if rel_path not in keep and not is_build_state(rel_path):
+                pruned.append(rel_path)
+
+    for rel_path in sorted(pruned):
+        path = os.path.join(dest_dir, rel_path)
+        print(f"Removing leftover file: {path}")
+        os.remove(path)
+        remove_empty_dirs(os.path.dirname(path), dest_dir)
+    return sorted(pruned)
+
+
+def _is_stale(previous, source, template_deps, basepath, resolver):
+    """Check a page's previous manifest entry against the current inputs."""
+    if previous is None or "deps" not in previous:
+        return True
+    if previous.get("basepath") != basepath or previous.get("generator") != GENERATOR_VERSION:
+        return True
+
+    deps = previous["deps"]
+    # A page that switched templates, or whose template gained a partial,
+    # has dependencies the previous build never recorded
+    if dep_key(SOURCE, source) not in deps or any(key not in deps for key in template_deps):
+        return True
+    return any(resolver.current_hash(key) != value for key, value in deps.items())
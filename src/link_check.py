@@ -0,0 +1,139 @@
+import os
+import posixpath
+import re
+from collections import namedtuple
+from urllib.parse import unquote, urlsplit
+
+
+# A link or image of a page whose target the build does not produce; line
+# is the line of the markdown source it is written on, or None
+BrokenLink = namedtuple("BrokenLink", ["source", "line", "kind", "url"])
+
+# What takes a URL off the fast path: a scheme, query, fragment, escape,
+# empty or dot segment
+_SPECIAL_RE = re.compile(r"[:?#%]|//|(?:^|/)\.")
+
+
+def link_target(url, output):
+    """
+    Return the output path a link of a page points at.
+
+    Root-relative URLs are relative to the site root, other URLs to the
+    directory of the page, and URLs ending in "/" point at an index.html.
+
+    Args:
+        url: URL as written in the markdown
+        output: Output path of the page the link is on
+
+    Returns:
+        Output path relative to the output directory, or None for links
+        that leave the site, such as "https://..." or "mailto:...", and
+        links within the page, such as "#top"
+
+    Example:
+        link_target("../images/tom.png?v=2", "blog/tom.html") -> "images/tom.png"
+    """
+    if url and _SPECIAL_RE.search(url) is None:
+        # Most links are plain paths, with nothing to split or normalize
+        if url.startswith("/"):
+            target = url[1:]
+        else:
+            target = posixpath.join(posixpath.dirname(output), url)
+        return target + "index.html" if not target or target.endswith("/") else target
+
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        path = posixpath.join("/", posixpath.dirname(output), path)
+    # As in a browser, ".." stops at the root
+    target = posixpath.normpath(path).lstrip("/")
+    if path.endswith("/") or not target:
+        return posixpath.join(target, "index.html")
+    return target
+
+
+def find_broken_links(links, targets):
+    """
+    Find the links and images whose target is not in the site.
+
+    A target exists if it is one of targets, or if it is a directory or
+    an extensionless page name whose index.html or .html file is, as a
+    static web server would serve it.
+
+    Args:
+        links: Iterable of (output, kind, url) tuples, such as
+            PageIndex.all_links()
+        targets: Set of every output path of the site: pages, generated
+            files and static files
+
+    Yields:
+        The (output, kind, url) tuples of broken links, in the order of
+        links
+    """
+    # Most links are shared by many pages, such as the home page or a
+    # logo, so each URL is resolved and looked up once per directory
+    found = {}
+    for link in links:
+        output, _, url = link
+        key = url if url.startswith("/") else (url, output.rpartition("/")[0])
+        exists = found.get(key)
+        if exists is None:
+            target = link_target(url, output)
+            exists = found[key] = (target is None or target in targets or target + ".html" in targets
+                                   or posixpath.join(target, "index.html") in targets)
+        if not exists:
+            yield link
+
+
+def check_links(links, targets, sources, content_dir):
+    """
+    Report the broken links and images of a site.
+
+    Args:
+        links: Iterable of (output, kind, url) tuples, such as
+            PageIndex.all_links(), with the links of each page in page order
+        targets: Set of every output path of the site
+        sources: Function returning the markdown path, relative to
+            content_dir, of an output path
+        content_dir: Content directory the sources are relative to, read
+            to find the line of each broken link
+
+    Returns:
+        List of BrokenLink, sorted by source and line
+    """
+    by_source = {}
+    for output, kind, url in find_broken_links(links, targets):
+        by_source.setdefault(sources(output), []).append((kind, url))
+
+    broken = []
+    for source, source_links in by_source.items():
+        lines = _link_lines(os.path.join(content_dir, source), source_links)
+        broken.extend(BrokenLink(source, line, kind, url) for (kind, url), line in zip(source_links, lines))
+    broken.sort(key=lambda link: (link.source, link.line or 0))
+    return broken
+
+
+def _link_lines(path, links):
+    """
+    Find the line each (kind, url) link of a markdown file is written on.
+
+    Only broken links get here, so the source is read again instead of
+    every link carrying its position through the render. Lines count from
+    the top of the file, front matter included; repeated links take the
+    lines they occur on in turn.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return [None] * len(links)
+
+    occurrences = {}
+    for _, url in links:
+        if url not in occurrences:
+            needle = "](" + url + ")"
+            occurrences[url] = iter([number for number, line in enumerate(lines, 1)
+                                     for _ in range(line.count(needle))])
+    return [next(occurrences[url], None) for _, url in links]
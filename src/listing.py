@@ -0,0 +1,138 @@
+import hashlib
+from html import escape
+from sitemap import page_url
+
+
+# Pages listed on each listing page
+PAGE_SIZE = 10
+
+
+def find_listings(records):
+    """
+    Group indexed pages into the directories that get a generated listing.
+
+    A directory gets a listing when it holds pages, either markdown files
+    of its own or subdirectories with an index.md, but has no index.md
+    itself. Pages are listed newest first; pages without a date come
+    last, and ties are listed by output path.
+
+    Args:
+        records: PageRecord rows from the page index
+
+    Returns:
+        Dict mapping each listed directory ("" for the content root) to its
+        list of PageRecord, in listing order
+    """
+    has_index = set()
+    children = {}
+    for record in records:
+        rel_dir, _, name = record.source.rpartition("/")
+        if name == "index.md":
+            has_index.add(rel_dir)
+            if not rel_dir:
+                continue
+            # A directory page is listed by its parent
+            rel_dir = rel_dir.rpartition("/")[0]
+        children.setdefault(rel_dir, []).append(record)
+
+    listings = {}
+    for rel_dir, pages in children.items():
+        if rel_dir in has_index:
+            continue
+        # Stable sorts: by output first, then newest first with undated last
+        pages.sort(key=lambda record: record.output)
+        pages.sort(key=lambda record: record.date or "", reverse=True)
+        listings[rel_dir] = pages
+    return listings
+
+
+def listing_output(rel_dir, number):
+    """
+    Return the output path of one page of a directory's listing.
+
+    Example:
+        listing_output("blog", 1) -> "blog/index.html"
+        listing_output("blog", 3) -> "blog/page/3/index.html"
+    """
+    prefix = rel_dir + "/" if rel_dir else ""
+    if number == 1:
+        return prefix + "index.html"
+    return f"{prefix}page/{number}/index.html"
+
+
+def paginate(pages, page_size=PAGE_SIZE):
+    """Split a listing into its pages; returns a list of lists of PageRecord."""
+    return [pages[start:start + page_size] for start in range(0, len(pages), page_size)]
+
+
+def record_hash(record):
+    """
+    Hash the facts a listing shows about a page.
+
+    A listing page depends on "page:" keys with these hashes, so changing
+    the body of a post rebuilds no listing, and changing its title rebuilds
+    only the listing page showing it.
+    """
+    facts = "\0".join((record.url, record.title, record.date or "", record.summary))
+    return hashlib.sha256(facts.encode('utf-8')).hexdigest()
+
+
+def directory_title(rel_dir):
+    """
+    Make a title for a listed directory from its name.
+
+    Example:
+        directory_title("blog/tolkien-essays") -> "Tolkien essays"
+    """
+    name = rel_dir.rpartition("/")[2] or "home"
+    return name.replace("-", " ").replace("_", " ").capitalize()
+
+
+def listing_values(rel_dir, number, last, pages, basepath="/"):
+    """
+    Build the template variables of one listing page.
+
+    Content holds a ready-made list with links to the neighbouring pages,
+    so any page template can render a listing. Templates that want their
+    own markup can loop over "pages" (dicts with url, title, date and
+    summary) and use "newer" and "older", the URLs of the neighbouring
+    listing pages or None.
+
+    Args:
+        rel_dir: Listed directory relative to the content directory
+        number: Page number, from 1
+        last: Whether this is the last page of the listing
+        pages: PageRecord rows shown on this page
+        basepath: Base path for all URLs in the site (default: "/")
+
+    Returns:
+        Dict of template variables including Title, Content and basepath
+    """
+    title = directory_title(rel_dir)
+    if number > 1:
+        title += f", page {number}"
+
+    items = [{"url": record.url, "title": record.title, "date": record.date, "summary": record.summary}
+             for record in pages]
+    newer = page_url(listing_output(rel_dir, number - 1), basepath) if number > 1 else None
+    older = page_url(listing_output(rel_dir, number + 1), basepath) if not last else None
+
+    lines = ['<ul class="listing">']
+    for item in items:
+        line = f'<li><a href="{escape(item["url"])}">{escape(item["title"], quote=False)}</a>'
+        if item["date"]:
+            line += f' <time datetime="{escape(item["date"])}">{escape(item["date"][:10])}</time>'
+        if item["summary"]:
+            line += f'<p>{escape(item["summary"], quote=False)}</p>'
+        lines.append(line + "</li>")
+    lines.append("</ul>")
+    if newer or older:
+        links = []
+        if newer:
+            links.append(f'<a href="{escape(newer)}" rel="prev">Newer</a>')
+        if older:
+            links.append(f'<a href="{escape(older)}" rel="next">Older</a>')
+        lines.append(f'<nav class="pagination">{" ".join(links)}</nav>')
+
+    return {"Title": title, "Content": "\n".join(lines), "basepath": basepath,
+            "pages": items, "newer": newer, "older": older, "page_number": number}
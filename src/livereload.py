@@ -0,0 +1,175 @@
+import json
+import os
+import queue
+import threading
+from tree_diff import DiffOp, diff_trees
+from watcher import EVERYTHING
+
+
+# Path of the Server-Sent Events stream served by the dev server
+EVENTS_PATH = "/__sitegen/events"
+
+# Injected before </body> of every page the dev server renders. "patch"
+# events carry operations on the top-level blocks of the <article> content;
+# anything else reloads the page.
+CLIENT_SCRIPT = """<script>
+(function () {
+  var source = new EventSource("%s?page=" + encodeURIComponent(location.pathname));
+  source.addEventListener("reload", function () { location.reload(); });
+  source.addEventListener("patch", function (event) {
+    var article = document.querySelector("article");
+    var root = article && article.firstElementChild;
+    if (!root) { location.reload(); return; }
+    JSON.parse(event.data).forEach(function (op) {
+      var node = null;
+      if (op.html !== undefined) {
+        var holder = document.createElement("template");
+        holder.innerHTML = op.html;
+        node = holder.content.firstChild;
+      }
+      var current = root.children[op.index] || null;
+      if (!current && op.op !== "insert") { location.reload(); }
+      else if (op.op === "replace") { current.replaceWith(node); }
+      else if (op.op === "insert") { root.insertBefore(node, current); }
+      else if (op.op === "delete") { current.remove(); }
+    });
+  });
+})();
+</script>
+""" % EVENTS_PATH
+
+
+def inject_script(body):
+    """Add the live reload client to an HTML page (bytes)."""
+    script = CLIENT_SCRIPT.encode('utf-8')
+    index = body.rfind(b"</body>")
+    if index == -1:
+        return body + script
+    return body[:index] + script + body[index:]
+
+
+def block_patch(old_content, new_content):
+    """
+    Turn a tree diff of two content trees into operations on top-level blocks.
+
+    Changes deep inside a block replace that whole block, which keeps the
+    client simple while still sending only the blocks that changed.
+
+    Args:
+        old_content: Content HTMLNode (the <div> of blocks) last sent
+        new_content: Content HTMLNode from the current render
+
+    Returns:
+        List of dicts with "op", "index" and, for replace and insert, "html";
+        or None if the content root itself changed and the page must reload
+    """
+    patch = []
+    for op in diff_trees(old_content, new_content):
+        if not op.path:
+            return None
+        index = op.path[0]
+        if len(op.path) > 1 or op.op == DiffOp.REPLACE:
+            # Deeper changes come before any insert or delete at this level,
+            # so index still matches the new tree here
+            if patch and patch[-1]["op"] == DiffOp.REPLACE and patch[-1]["index"] == index:
+                continue
+            patch.append({"op": DiffOp.REPLACE, "index": index,
+                          "html": new_content.children[index].to_html()})
+        elif op.op == DiffOp.INSERT:
+            patch.append({"op": DiffOp.INSERT, "index": index, "html": op.node.to_html()})
+        else:
+            patch.append({"op": DiffOp.DELETE, "index": index})
+    return patch
+
+
+class LiveReload:
+    """
+    Pushes page updates to connected browsers over Server-Sent Events.
+
+    Each browser tab subscribes with the page it shows. When sources change,
+    every subscribed page is rendered again and compared with what its
+    clients last received: if only the article content differs, clients get
+    a "patch" event with the changed blocks, otherwise a "reload" event.
+
+    Args:
+        site: DevSite the pages are rendered from
+    """
+
+    def __init__(self, site):
+        self.site = site
+        # markdown path -> {"clients": set of queues, "body": bytes, "content": HTMLNode}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, markdown_path):
+        """Register a client showing a page; returns the queue of its events."""
+        events = queue.Queue()
+        with self._lock:
+            page = self._pages.get(markdown_path)
+            if page is None:
+                body, content = self.site.render_tree(markdown_path)
+                page = {"clients": set(), "body": body, "content": content}
+                self._pages[markdown_path] = page
+            page["clients"].add(events)
+        return events
+
+    def unsubscribe(self, markdown_path, events):
+        with self._lock:
+            page = self._pages.get(markdown_path)
+            if page is None:
+                return
+            page["clients"].discard(events)
+            if not page["clients"]:
+                del self._pages[markdown_path]
+
+    def notify(self, changed_paths):
+        """
+        Send updates for subscribed pages after sources changed.
+
+        Returns:
+            Dict mapping markdown paths to the event sent ("patch" or "reload")
+        """
+        static_prefix = os.path.join(self.site.static_dir, "")
+        # Lost changes may have included stylesheets and images
+        static_changed = EVERYTHING in changed_paths or any(
+            os.path.abspath(path).startswith(static_prefix) for path in changed_paths)
+        sent = {}
+        with self._lock:
+            for markdown_path, page in self._pages.items():
+                event = self._update(markdown_path, page, static_changed)
+                if event is None:
+                    continue
+                for events in page["clients"]:
+                    events.put(event)
+                sent[markdown_path] = event[0]
+        return sent
+
+    def _update(self, markdown_path, page, static_changed):
+        """Render a subscribed page again and work out the event to send."""
+        if static_changed:
+            # Stylesheets and images are not part of the page HTML
+            return ("reload", "")
+        try:
+            body, content = self.site.render_tree(markdown_path)
+        except (OSError, ValueError):
+            # Deleted or broken; the reload shows the error page
+            return ("reload", "")
+        if body == page["body"]:
+            return None
+
+        old_body, old_content = page["body"], page["content"]
+        page["body"], page["content"] = body, content
+
+        # Everything outside the article content must be unchanged to patch
+        if (page_shell(old_body, old_content.to_html().encode('utf-8')) !=
+                page_shell(body, content.to_html().encode('utf-8'))):
+            return ("reload", "")
+        patch = block_patch(old_content, content)
+        if patch is None:
+            return ("reload", "")
+        return ("patch", json.dumps(patch))
+
+
+def page_shell(body, content_html):
+    """Return a page with its content cut out, to compare page layouts."""
+    return body.replace(content_html, b"", 1)
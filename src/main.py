@@ -3,40 +3,438 @@ from htmlnode import HTMLNode, LeafNode, ParentNode
 from text_to_html import text_node_to_html_node
 from inline_markdown import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, text_to_textnodes
 from block_markdown import markdown_to_blocks, block_to_block_type, BlockType, markdown_to_html_node
-from copy_static import copy_files_recursive
-from generate_page import generate_page, generate_pages_recursive
+from generate_page import generate_page, generate_pages_recursive, find_pages
+from incremental import build_site, rebuild_changed, update_generated
+from devserver import DevServer, DevSite
+from build_cache import BuildCache, HTTPBackend, LocalDirBackend
+from watcher import EVERYTHING, PollingWatcher, create_watcher, wait_for_changes
+from manifest import BuildManifest
+from snapshot import SiteSnapshot
+from shard import BY_HASH, BY_SIZE, merge_shards, parse_shard
+from staging import DEFAULT_KEEP, build_staged, current_build, list_builds, rollback
+from depgraph import DependencyGraph, SOURCE, TEMPLATE, STATIC, ASSET, PAGE, split_key
+from template import set_asset_dir, set_template_cache_dir, template_watch_files
+from feed import FEED_SIZE, FeedSettings
+from search import SHARD_BUDGET, SearchSettings
+import argparse
 import os
 import sys
+import time
+
+
+# Local build cache used by --cache without a directory
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 ".sitegen", "cache")
+
+
+def shard_arg(spec):
+    """argparse type for --shard that reports parse_shard's message."""
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_feed_arguments(parser):
+    """Add the options that turn on the sitemap and RSS and Atom feeds to a command's parser."""
+    parser.add_argument("--site-url", metavar="URL",
+                        help="scheme and host the site is published at, such as https://example.com; "
+                             "sitemap.xml and feeds are written only with it")
+    parser.add_argument("--feed-content", choices=["summary", "full"], default="summary",
+                        help="put each page's summary or its full content in feeds (default: summary)")
+    parser.add_argument("--feed-size", type=int, default=FEED_SIZE,
+                        help=f"newest pages in each feed (default: {FEED_SIZE})")
+
+
+def feed_settings(parser, args):
+    """Return the FeedSettings for the parsed feed options, or None without --site-url."""
+    if not args.site_url:
+        return None
+    try:
+        return FeedSettings(args.site_url, args.feed_content == "full", args.feed_size)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def add_search_arguments(parser):
+    """Add the options that turn on the search index to a command's parser."""
+    parser.add_argument("--search", action="store_true",
+                        help="write a search index of every page into search/")
+    parser.add_argument("--search-shard-kb", type=int, default=SHARD_BUDGET // 1024,
+                        help=f"largest compressed search index shard in KB (default: {SHARD_BUDGET // 1024})")
+
+
+def search_settings(parser, args):
+    """Return the SearchSettings for the parsed search options, or None without --search."""
+    if not args.search:
+        return None
+    try:
+        return SearchSettings(args.search_shard_kb * 1024)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def parse_args(argv):
+    """Parse command line arguments for a site build."""
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help='base path for all URLs in the site (default: "/")')
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="number of worker processes for page generation; 0 uses every CPU")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="render changed pages with threads that overlap reading, rendering and "
+                             "writing, instead of --jobs processes")
+    parser.add_argument("--read-queue-depth", type=int, default=16,
+                        help="pages read ahead of rendering in --pipeline mode (default: 16)")
+    parser.add_argument("--write-queue-depth", type=int, default=16,
+                        help="rendered pages waiting to be written in --pipeline mode (default: 16)")
+    parser.add_argument("--share-nodes", action="store_true",
+                        help="share identical HTML nodes between pages while rendering, so each is "
+                             "serialized once")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the build manifest and rebuild everything from scratch")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, default=None, metavar="DIR",
+                        help=f"reuse rendered pages from a build cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--remote-cache", metavar="URL",
+                        help="shared HTTP build cache read through and written back to")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="size the local build cache is trimmed to after a build (default: 512)")
+    parser.add_argument("--shard", type=shard_arg, metavar="I/N",
+                        help="build only shard I of N, for example 2/4; combine shards with 'sitegen merge'")
+    parser.add_argument("--shard-by", choices=[BY_HASH, BY_SIZE], default=BY_HASH,
+                        help="assign pages to shards by path hash or balanced by file size (default: hash)")
+    parser.add_argument("--out", metavar="DIR",
+                        help="output directory (default: docs)")
+    parser.add_argument("--atomic", action="store_true",
+                        help="build into docs.builds/ and switch docs (a symlink) over when done")
+    parser.add_argument("--keep-builds", type=int, default=DEFAULT_KEEP,
+                        help=f"finished builds kept for rollback with --atomic (default: {DEFAULT_KEEP})")
+    parser.add_argument("--strict-links", action="store_true",
+                        help="fail the build when a link or image points at a missing page or file")
+    add_feed_arguments(parser)
+    add_search_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.strict_links and args.shard:
+        parser.error("--strict-links checks the whole site; it cannot be combined with --shard")
+    args.feeds = feed_settings(parser, args)
+    args.search_settings = search_settings(parser, args)
+    return args
+
+
+def why(argv, dest_docs):
+    """
+    Explain what a generated page was built from, or what depends on a key.
+
+    Usage:
+        sitegen why docs/blog/tom/index.html
+        sitegen why static:index.css
+    """
+    parser = argparse.ArgumentParser(prog="sitegen why",
+                                     description="Show the recorded dependencies of a page.")
+    parser.add_argument("target", help="output page path or dependency key such as template:template.html")
+    args = parser.parse_args(argv)
+
+    manifest = BuildManifest.load(dest_docs)
+    if manifest is None:
+        print(f"No build manifest in {dest_docs}; build the site first")
+        return 1
+
+    target = args.target
+    if split_key(target)[0] not in (SOURCE, TEMPLATE, STATIC, ASSET, PAGE):
+        # Accept output paths relative to the working directory or docs/
+        full_path = os.path.abspath(target)
+        if full_path.startswith(os.path.join(dest_docs, "")):
+            target = os.path.relpath(full_path, dest_docs)
+        target = target.replace(os.sep, "/")
+
+    for line in DependencyGraph(manifest.pages).why(target):
+        print(line)
+    return 0
+
+
+def build(args, static_dir, content_dir, template_path, dest_dir):
+    """
+    Build the site into dest_dir with the options parsed by parse_args.
+
+    Raises:
+        ValueError: If a page is malformed, or with --strict-links if a link
+            or image is broken
+    """
+    basepath = args.basepath
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    
+    # The pipeline only changes how stale pages are rendered; static files,
+    # the manifest and the page index are kept up to date the same way
+    pipeline = None
+    if args.pipeline:
+        pipeline = {"read_queue_depth": args.read_queue_depth, "write_queue_depth": args.write_queue_depth}
+
+    # Sync static files and regenerate only the pages whose inputs changed
+    print("\n--- Building site ---")
+    cache = None
+    if args.cache or args.remote_cache:
+        remote = HTTPBackend(args.remote_cache) if args.remote_cache else None
+        cache = BuildCache(LocalDirBackend(args.cache or DEFAULT_CACHE_DIR), remote)
+    if args.shard:
+        print(f"Building shard {args.shard[0]} of {args.shard[1]} (by {args.shard_by})")
+    result = build_site(static_dir, content_dir, template_path, dest_dir,
+                        basepath, jobs, full=args.full, cache=cache,
+                        shard=args.shard, shard_by=args.shard_by, feeds=args.feeds,
+                        site_url=args.site_url, search=args.search_settings, pipeline=pipeline,
+                        share_nodes=args.share_nodes)
+    if result.pipeline_stats is not None:
+        print(result.pipeline_stats.report())
+    if cache is not None:
+        cache.flush()
+        removed, freed = cache.local.collect_garbage(args.cache_max_mb << 20)
+        print(f"Build cache: {cache.hits} hits ({cache.remote_hits} remote), {cache.misses} misses, "
+              f"{removed} old entries removed ({freed} bytes)")
+    print(f"Pages: {len(result.rendered)} rendered, {result.unchanged} unchanged, "
+          f"{len(result.removed)} removed")
+    if result.generated or result.generated_unchanged or result.generated_removed:
+        print(f"Generated files: {len(result.generated)} written, {result.generated_unchanged} unchanged, "
+              f"{len(result.generated_removed)} removed")
+    print(f"Static files: {len(result.static_copied)} copied, "
+          f"{len(result.static_removed)} removed")
+    written, unchanged, deleted = result.file_counts()
+    print(f"Files: {written} written, {unchanged} unchanged, {deleted} deleted")
+    if result.broken_links:
+        print(f"Links: {len(result.broken_links)} broken")
+        if args.strict_links:
+            raise ValueError(f"{len(result.broken_links)} broken link(s) with --strict-links")
+
+
+def merge_command(argv, content_dir, template_path, dest_docs):
+    """
+    Combine the outputs of a sharded build into one site.
+
+    Listing pages, feeds, the sitemap and the search index span every
+    shard, so they are written here from the merged page index, with the
+    same options a single build takes.
+
+    Usage:
+        sitegen merge shards/1 shards/2 shards/3
+        sitegen merge shards/* --out docs --site-url https://example.com --search
+    """
+    parser = argparse.ArgumentParser(prog="sitegen merge",
+                                     description="Merge the outputs of --shard builds.")
+    parser.add_argument("shards", nargs="+", help="output directories of every shard")
+    parser.add_argument("--out", default=dest_docs, help=f"merged output directory (default: {dest_docs})")
+    add_feed_arguments(parser)
+    add_search_arguments(parser)
+    args = parser.parse_args(argv)
+    feeds = feed_settings(parser, args)
+    search = search_settings(parser, args)
+
+    def generate(index, basepath, pages, static, previous):
+        return update_generated(index, content_dir, template_path, args.out, basepath, pages, static,
+                                previous, feeds, args.site_url, search)
+
+    try:
+        written, unchanged, deleted = merge_shards(args.shards, args.out, generate)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Files: {written} written, {unchanged} unchanged, {deleted} deleted")
+    return 0
+
+
+def rollback_command(argv, dest_docs):
+    """
+    Switch docs back to an earlier build made with --atomic.
+
+    Usage:
+        sitegen rollback
+        sitegen rollback --steps 2
+    """
+    parser = argparse.ArgumentParser(prog="sitegen rollback",
+                                     description="Switch docs back to an earlier build.")
+    parser.add_argument("--steps", type=int, default=1, help="builds to go back (default: 1)")
+    parser.add_argument("--list", action="store_true", help="list the kept builds instead")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        current = current_build(dest_docs)
+        for name in list_builds(dest_docs):
+            print(f"{'*' if name == current else ' '} {name}")
+        return 0
+
+    try:
+        rollback(dest_docs, args.steps)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+def watch_command(argv, static_dir, content_dir, template_path, dest_dir):
+    """
+    Build the site, then rebuild what changed whenever an input file changes.
+
+    Usage:
+        sitegen watch
+        sitegen watch /static-site-gen/ --poll
+    """
+    parser = argparse.ArgumentParser(prog="sitegen watch",
+                                     description="Rebuild the site when its sources change.")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help='base path for all URLs in the site (default: "/")')
+    parser.add_argument("--poll", action="store_true",
+                        help="scan for changes instead of using inotify")
+    parser.add_argument("--interval", type=float, default=0.1,
+                        help="seconds between scans when polling (default: 0.1)")
+    add_feed_arguments(parser)
+    add_search_arguments(parser)
+    args = parser.parse_args(argv)
+    feeds = feed_settings(parser, args)
+    search = search_settings(parser, args)
+
+    # Kept up to date from the watcher's changes instead of listing the
+    # source trees again when a change needs a full build
+    snapshot = SiteSnapshot(static_dir, content_dir)
+    build_site(static_dir, content_dir, template_path, dest_dir, args.basepath, snapshot=snapshot,
+               feeds=feeds, site_url=args.site_url, search=search)
+    manifest = BuildManifest.load(dest_dir)
+
+    # The templates next to the default one and every partial they include,
+    # plus both source trees
+    template_files = template_watch_files(template_path)
+    dirs = [content_dir, static_dir]
+    if args.poll:
+        watcher = PollingWatcher(dirs, template_files, args.interval)
+    else:
+        watcher = create_watcher(dirs, template_files, args.interval)
+    print(f"\nWatching {content_dir}, {static_dir} and templates ({type(watcher).__name__}); "
+          f"press Ctrl+C to stop")
+
+    # Saving the manifest of a large site takes longer than rebuilding one
+    # page, so it is saved once edits pause instead of after every rebuild
+    unsaved = False
+    try:
+        while True:
+            changed = wait_for_changes(watcher, timeout=0.5 if unsaved else None)
+            if not changed:
+                manifest.save()
+                unsaved = False
+                continue
+            start = time.perf_counter()
+            if EVERYTHING in changed:
+                # Changes were lost, so nothing known about the trees holds
+                print("Lost track of changes; rebuilding everything")
+                snapshot = SiteSnapshot(static_dir, content_dir)
+                result = build_site(static_dir, content_dir, template_path, dest_dir, args.basepath,
+                                    snapshot=snapshot, feeds=feeds, site_url=args.site_url,
+                                    search=search)
+                manifest = BuildManifest.load(dest_dir)
+                unsaved = False
+            else:
+                result, manifest = rebuild_changed(changed, static_dir, content_dir, template_path,
+                                                   dest_dir, args.basepath, manifest, save=False,
+                                                   snapshot=snapshot, feeds=feeds, site_url=args.site_url,
+                                                   search=search)
+                unsaved = True
+            # An edit may have included a new partial
+            watcher.add_files(template_watch_files(template_path))
+            written, unchanged, deleted = result.file_counts()
+            print(f"{len(changed)} change(s): {written} written, {deleted} deleted "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        if unsaved:
+            manifest.save()
+        watcher.close()
+    return 0
+
+
+def serve_command(argv, static_dir, content_dir, template_path):
+    """
+    Serve the site from its sources, rendering pages when they are requested.
+
+    Usage:
+        sitegen serve
+        sitegen serve /static-site-gen/ --port 8000
+    """
+    parser = argparse.ArgumentParser(prog="sitegen serve",
+                                     description="Serve the site for development without building it.")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help='base path to serve the site under (default: "/")')
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8888, help="port to listen on (default: 8888)")
+    parser.add_argument("--cache-mb", type=int, default=64,
+                        help="memory for rendered pages, in MiB (default: 64)")
+    parser.add_argument("--no-reload", action="store_true",
+                        help="do not update open pages when sources change")
+    args = parser.parse_args(argv)
+
+    site = DevSite(content_dir, static_dir, template_path, args.basepath, args.cache_mb << 20)
+    server = DevServer((args.host, args.port), site, live_reload=not args.no_reload)
+    print(f"Serving {content_dir} at http://{args.host}:{server.server_address[1]}{args.basepath}; "
+          f"press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped serving")
+    finally:
+        server.server_close()
+    return 0
+
 
 def main():
+    # Get project paths
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(current_dir)
+    dest_docs = os.path.join(project_root, "docs")
+    
+    if sys.argv[1:2] == ["why"]:
+        return why(sys.argv[2:], dest_docs)
+    if sys.argv[1:2] == ["merge"]:
+        set_template_cache_dir(os.path.join(project_root, ".sitegen", "templates"))
+        set_asset_dir(os.path.join(current_dir, "static"))
+        return merge_command(sys.argv[2:], os.path.join(project_root, "content"),
+                             os.path.join(project_root, "template.html"), dest_docs)
+    if sys.argv[1:2] == ["rollback"]:
+        return rollback_command(sys.argv[2:], dest_docs)
+    if sys.argv[1:2] == ["watch"]:
+        set_template_cache_dir(os.path.join(project_root, ".sitegen", "templates"))
+        return watch_command(sys.argv[2:], os.path.join(current_dir, "static"),
+                             os.path.join(project_root, "content"),
+                             os.path.join(project_root, "template.html"), dest_docs)
+    if sys.argv[1:2] == ["serve"]:
+        set_template_cache_dir(os.path.join(project_root, ".sitegen", "templates"))
+        return serve_command(sys.argv[2:], os.path.join(current_dir, "static"),
+                             os.path.join(project_root, "content"),
+                             os.path.join(project_root, "template.html"))
+    
     print("="*60)
     print("STATIC SITE GENERATOR")
     print("="*60)
     
-    # Get basepath from CLI argument, default to "/"
-    basepath = "/"
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-    
-    print(f"Using basepath: {basepath}")
-    
-    # Get project paths
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(current_dir)
+    # Get basepath and build options from CLI arguments
+    args = parse_args(sys.argv[1:])
+    print(f"Using basepath: {args.basepath}")
     
     source_static = os.path.join(current_dir, "static")
-    dest_docs = os.path.join(project_root, "docs")
     
-    # Step 1: Copy static files to docs directory
-    print("\n--- Step 1: Copying static files ---")
-    copy_files_recursive(source_static, dest_docs)
+    # Compiled templates are cached here between builds
+    set_template_cache_dir(os.path.join(project_root, ".sitegen", "templates"))
     
-    # Step 2: Generate all pages from content directory
-    print("\n--- Step 2: Generating all pages ---")
     content_dir = os.path.join(project_root, "content")
     template_path = os.path.join(project_root, "template.html")
-    
-    generate_pages_recursive(content_dir, template_path, dest_docs, basepath)
+    if args.out:
+        dest_docs = os.path.abspath(args.out)
+    
+    try:
+        if args.atomic:
+            # Build into a staging directory and switch docs over when finished
+            build_staged(dest_docs,
+                         lambda staging_dir: build(args, source_static, content_dir, template_path, staging_dir),
+                         keep=args.keep_builds)
+        else:
+            build(args, source_static, content_dir, template_path, dest_docs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
     
     print("\n--- Static site generation complete! ---")
     print(f"Website generated in: {dest_docs}")
@@ -583,4 +981,4 @@ That's the end of my blog post!"""
     print(formatted_html)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
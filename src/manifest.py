@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from page_index import INDEX_FILENAME
+from template import asset_hash, load_template
+
+
+# Bump whenever a change to the generator alters the HTML it produces, or
+# the facts it records about each page, so every page built by an older
+# version is rebuilt
+GENERATOR_VERSION = "3"
+
+# The manifest is stored inside the output directory it describes
+MANIFEST_FILENAME = ".sitegen-manifest.json"
+
+
+class BuildManifest:
+    """
+    Record of what the previous build produced and from which inputs.
+
+    Attributes:
+        path: Location of the manifest file
+        pages: Dict mapping output paths (relative to the output directory,
+            with "/" separators) to a dict with the page's source, title,
+            basepath, generator and deps, a dict of dependency keys (see
+            depgraph.py) and their hashes
+        static: Dict mapping copied static files (relative paths) to
+            [size, mtime_ns] of the source file when it was copied
+        shard: [index, count] for the output of one shard of a sharded
+            build (see shard.py), or None for a whole site
+        generated: Dict of the settings the listings, feeds, sitemap and
+            search index were last written with, or None if they were not
+        broken_links: [source, line, kind, url] of every broken link the
+            last link check found
+    """
+
+    def __init__(self, path, pages=None, static=None, shard=None, generated=None, broken_links=None):
+        self.path = path
+        self.pages = pages if pages is not None else {}
+        self.static = static if static is not None else {}
+        self.shard = shard
+        self.generated = generated
+        self.broken_links = broken_links if broken_links is not None else []
+
+    @classmethod
+    def load(cls, dest_dir):
+        """
+        Load the manifest of an output directory.
+
+        Returns:
+            BuildManifest, or None if the directory has no readable manifest
+        """
+        path = os.path.join(dest_dir, MANIFEST_FILENAME)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict):
+            return None
+        shard = data.get("shard")
+        return cls(path, data.get("pages", {}), data.get("static", {}),
+                   tuple(shard) if shard is not None else None, data.get("generated"),
+                   data.get("broken_links", []))
+
+    def save(self):
+        """Write the manifest, replacing the old one in a single rename."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"version": GENERATOR_VERSION, "pages": self.pages, "static": self.static}
+        if self.shard is not None:
+            data["shard"] = list(self.shard)
+        if self.generated is not None:
+            data["generated"] = self.generated
+        if self.broken_links:
+            data["broken_links"] = self.broken_links
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Compact output keeps the C encoder in use for large sites
+            f.write(json.dumps(data, sort_keys=True, separators=(",", ":")))
+        os.replace(tmp_path, self.path)
+
+
+def is_build_state(rel_path):
+    """Check whether a file in an output directory is the manifest or page index."""
+    return rel_path == MANIFEST_FILENAME or rel_path.startswith(INDEX_FILENAME)
+
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def template_fingerprint(template_path, _seen=None):
+    """
+    Hash a template together with every partial it includes and the assets
+    whose fingerprints they write into pages.
+
+    Args:
+        template_path: Path to the HTML template file
+
+    Returns:
+        SHA-256 hex digest that changes when the template or any partial does
+    """
+    # Templates on the current include chain, to stop at cycles
+    abs_path = os.path.abspath(template_path)
+    _seen = (_seen or frozenset()) | {abs_path}
+
+    template = load_template(abs_path)
+    digest = hashlib.sha256(template.source.encode('utf-8'))
+    for path in template.assets:
+        digest.update(f"{path}:{asset_hash(path)}".encode('utf-8'))
+    for name in template.includes:
+        include_path = template.resolve_include(name)
+        digest.update(name.encode('utf-8'))
+        if include_path in _seen or not os.path.exists(include_path):
+            # Cycles and missing partials fail at render time instead
+            continue
+        digest.update(template_fingerprint(include_path, _seen).encode('utf-8'))
+    return digest.hexdigest()
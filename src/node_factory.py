@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from types import MappingProxyType
+from htmlnode import LeafNode, ParentNode
+
+
+# Nodes a NodeFactory keeps by default; with their cached HTML, typical page
+# nodes take about 1 KB each
+DEFAULT_MAX_NODES = 10_000
+
+
+class SharedLeafNode(LeafNode):
+    """
+    An immutable LeafNode handed out by NodeFactory.
+
+    Its props are a read-only mapping, since every page sharing the leaf
+    would see a change to them. The serialized HTML is computed on first
+    use and cached, so a leaf that is shared by many parents is only
+    serialized once.
+    """
+
+    def __init__(self, tag, value, props=None):
+        super().__init__(tag, value, props)
+        self._html = None
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False) and name != "_html":
+            raise AttributeError(f"Shared nodes are immutable, cannot set {name}")
+        super().__setattr__(name, value)
+
+    def to_html(self):
+        if self._html is None:
+            self._html = super().to_html()
+        return self._html
+
+
+class SharedParentNode(ParentNode):
+    """
+    An immutable ParentNode handed out by NodeFactory.
+
+    Children are stored as a tuple, props as a read-only mapping, and the
+    serialized HTML is cached like in SharedLeafNode.
+    """
+
+    def __init__(self, tag, children, props=None):
+        super().__init__(tag, tuple(children), props)
+        self._html = None
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False) and name != "_html":
+            raise AttributeError(f"Shared nodes are immutable, cannot set {name}")
+        super().__setattr__(name, value)
+
+    def to_html(self):
+        if self._html is None:
+            self._html = super().to_html()
+        return self._html
+
+
+class NodeFactory:
+    """
+    Hash-consing factory that returns one shared node per distinct structure.
+
+    Structurally equal leaves (same tag, value and props) map to the same
+    SharedLeafNode. Parents are keyed by the identity of their children, which
+    is enough because the children were interned by the same factory first.
+    Each cached parent keeps its children alive, so their ids stay unique.
+
+    A single factory can be reused across pages to share subtrees site-wide.
+    It keeps at most max_nodes nodes and forgets the least recently used
+    ones first, so memory stays bounded however large the site is; a node
+    that was forgotten is simply created again the next time it is needed.
+
+    Args:
+        max_nodes: Most nodes kept at once, or None for no limit
+    """
+
+    def __init__(self, max_nodes=DEFAULT_MAX_NODES):
+        self.max_nodes = max_nodes
+        self._nodes = OrderedDict()
+        self.requests = 0
+
+    def leaf(self, tag, value, props=None):
+        """Return the shared leaf node for the given tag, value and props."""
+        self.requests += 1
+        key = ("leaf", tag, value, _props_key(props))
+        node = self._lookup(key)
+        if node is None:
+            node = self._store(key, SharedLeafNode(tag, value, _frozen_props(props)))
+        return node
+
+    def parent(self, tag, children, props=None):
+        """Return the shared parent node for the given tag, children and props."""
+        self.requests += 1
+        key = ("parent", tag, tuple(id(child) for child in children), _props_key(props))
+        node = self._lookup(key)
+        if node is None:
+            node = self._store(key, SharedParentNode(tag, children, _frozen_props(props)))
+        return node
+
+    def _lookup(self, key):
+        node = self._nodes.get(key)
+        if node is not None:
+            self._nodes.move_to_end(key)
+        return node
+
+    def _store(self, key, node):
+        self._nodes[key] = node
+        if self.max_nodes is not None and len(self._nodes) > self.max_nodes:
+            self._nodes.popitem(last=False)
+        return node
+
+    def unique_nodes(self):
+        """Return the number of distinct nodes currently kept."""
+        return len(self._nodes)
+
+    def clear(self):
+        """Drop all cached nodes and reset the counters."""
+        self._nodes.clear()
+        self.requests = 0
+
+
+def _frozen_props(props):
+    """Copy props into a read-only mapping, so a shared node's attributes cannot change."""
+    if props is None:
+        return None
+    return MappingProxyType(dict(props))
+
+
+def _props_key(props):
+    """Turn a props dict into a hashable key that keeps attribute order."""
+    if props is None:
+        return None
+    return tuple(props.items())
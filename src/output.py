@@ -0,0 +1,163 @@
+import os
+import shutil
+import threading
+
+
+class OutputWriter:
+    """
+    Text file writer that leaves files with identical content untouched.
+
+    Written text is encoded and compared chunk by chunk with the bytes
+    already on disk. Nothing is written until the first difference, so an
+    unchanged page keeps its mtime and costs no write, while a changed page
+    is still streamed without building it in memory.
+
+    Changed content goes to a temporary file next to the destination, which
+    is renamed over it on close. Readers see either the old file or the new
+    one, never a partial write, and a hardlinked copy of the old file
+    elsewhere is left as it was.
+
+    Usage:
+        with OutputWriter("docs/index.html") as f:
+            template.write(f, values)
+        if f.changed:
+            ...
+
+    Attributes:
+        path: Destination file path
+        changed: True once the file has been created or modified
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.changed = False
+        self._offset = 0
+        self._out = None
+        self._tmp_path = None
+        try:
+            self._existing = open(path, 'rb')
+        except FileNotFoundError:
+            self._existing = None
+
+    def write(self, text):
+        data = text.encode(self.encoding)
+        if self._out is None:
+            if self._existing is not None and self._existing.read(len(data)) == data:
+                self._offset += len(data)
+                return len(text)
+            self._start_writing()
+        self._out.write(data)
+        return len(text)
+
+    def _start_writing(self):
+        """Switch from comparing to writing, keeping the matching prefix."""
+        self._tmp_path = temp_path(self.path)
+        self._out = open(self._tmp_path, 'wb')
+        if self._existing is not None:
+            self._existing.seek(0)
+            self._out.write(self._existing.read(self._offset))
+            self._existing.close()
+            self._existing = None
+        self.changed = True
+
+    def close(self):
+        if self._out is None:
+            # Every byte matched, but the old file may be longer, or missing
+            # entirely when nothing at all was written
+            if self._existing is None or self._existing.read(1):
+                self._start_writing()
+        if self._existing is not None:
+            self._existing.close()
+            self._existing = None
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard anything written so far and leave the old file in place."""
+        if self._existing is not None:
+            self._existing.close()
+            self._existing = None
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            os.remove(self._tmp_path)
+        self.changed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def temp_path(path):
+    """Return a temporary file name next to path, unique to this thread."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def copy_file(source_path, dest_path):
+    """Copy a file with its metadata, replacing dest_path in a single rename."""
+    tmp_path = temp_path(dest_path)
+    try:
+        shutil.copy2(source_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_if_changed(path, content):
+    """
+    Write text to a file unless the file already holds exactly that text.
+
+    Args:
+        path: Destination file path; parent directories are created
+        content: Text to write
+
+    Returns:
+        True if the file was written, False if it was already identical
+    """
+    dest_dir = os.path.dirname(path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    with OutputWriter(path) as f:
+        f.write(content)
+    return f.changed
+
+
+def write_bytes_if_changed(path, data):
+    """
+    Write bytes to a file unless the file already holds exactly those bytes.
+
+    Meant for small binary outputs such as compressed files, which are
+    compared whole; like OutputWriter, a changed file is replaced with a
+    single rename.
+
+    Args:
+        path: Destination file path; parent directories are created
+        data: Bytes to write
+
+    Returns:
+        True if the file was written, False if it was already identical
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        dest_dir = os.path.dirname(path)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+    tmp_path = temp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+import sqlite3
+import time
+from collections import namedtuple
+from output import temp_path
+
+
+# Stored next to the manifest, inside the output directory it describes
+INDEX_FILENAME = ".sitegen-index.sqlite"
+
+# Bump when the tables change; an index with another version is rebuilt
+SCHEMA_VERSION = 5
+
+_SCHEMA = """
+CREATE TABLE pages (
+    output TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT,
+    modified TEXT NOT NULL,
+    words INTEGER NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE TABLE links (
+    output TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE TABLE contents (
+    output TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE terms (
+    output TEXT PRIMARY KEY,
+    terms TEXT NOT NULL
+);
+CREATE INDEX links_by_output ON links (output);
+CREATE INDEX links_by_url ON links (url);
+"""
+
+# One row of the pages table
+PageRecord = namedtuple("PageRecord", ["output", "source", "url", "title", "date", "modified", "words",
+                                       "summary"])
+
+# Columns pages() can sort by
+ORDER_COLUMNS = ("output", "source", "url", "title", "date", "modified", "words")
+
+
+class PageIndex:
+    """
+    SQLite index of the facts about every page of a built site.
+
+    One row per page holds its output path, source, URL, title, date, last
+    modification, word count and summary, one row per outgoing link or
+    image, a hash of the rendered content HTML, so full feeds can tell
+    when a body changed without keeping every page's HTML, and the search
+    terms of the page. Rows are
+    written by the build from the same render pass that produces the HTML,
+    so listings, feeds, sitemaps and the search index can be made from the
+    index without reading any markdown.
+
+    The index is a cache of the build: a damaged index, or one from another
+    schema version, is started again empty, and the build fills it back in.
+
+    Usage:
+        with PageIndex.open("docs") as index:
+            for page in index.pages(prefix="blog/", order_by="date", descending=True):
+                print(page.url, page.title)
+
+    Args:
+        path: Location of the SQLite file; created when missing
+
+    Attributes:
+        changed: True once a page has been added, replaced or removed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.changed = False
+        # A staged build starts as hardlinks to the live site, and SQLite
+        # writes in place, so take a private copy first
+        if os.path.exists(path) and os.stat(path).st_nlink > 1:
+            tmp_path = temp_path(path)
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, path)
+        try:
+            self._db = self._connect()
+        except sqlite3.DatabaseError:
+            print(f"Warning: rebuilding damaged page index {path}")
+            os.remove(path)
+            self._db = self._connect()
+
+    @classmethod
+    def open(cls, dest_dir):
+        """Open the index of an output directory."""
+        os.makedirs(dest_dir, exist_ok=True)
+        return cls(os.path.join(dest_dir, INDEX_FILENAME))
+
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        try:
+            # Everything here can be rebuilt, so don't wait for the disk
+            db.execute("PRAGMA synchronous = OFF")
+            if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                db.executescript("DROP TABLE IF EXISTS pages; DROP TABLE IF EXISTS links;"
+                                 "DROP TABLE IF EXISTS contents; DROP TABLE IF EXISTS terms;" + _SCHEMA +
+                                 f"PRAGMA user_version = {SCHEMA_VERSION};")
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def put(self, output, source, url, title, words, links, modified_ns, date=None, summary="",
+            content_hash=None, terms=None):
+        """
+        Add or replace the row of a page.
+
+        Args:
+            output: Output path relative to the output directory
+            source: Markdown path relative to the content directory
+            url: URL the page is served at
+            title: Page title
+            words: Word count of the page text
+            links: List of (kind, url) pairs for its links and images
+            modified_ns: Modification time of the source, in nanoseconds
+            date: Optional publication date as an ISO 8601 string
+            summary: Short plain text description of the page
+            content_hash: Optional SHA-256 hex digest of the rendered
+                content HTML of the page, without the template around it
+            terms: Optional dict of the page's search terms and their
+                frequencies (see search.term_frequencies)
+        """
+        self.changed = True
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(modified_ns // 1_000_000_000))
+        self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (output, source, url, title, date, modified, words, summary))
+        self._db.execute("DELETE FROM links WHERE output = ?", (output,))
+        self._db.executemany("INSERT INTO links VALUES (?, ?, ?)",
+                             [(output, kind, link_url) for kind, link_url in links])
+        if content_hash is None:
+            self._db.execute("DELETE FROM contents WHERE output = ?", (output,))
+        else:
+            self._db.execute("INSERT OR REPLACE INTO contents VALUES (?, ?)", (output, content_hash))
+        if terms is None:
+            self._db.execute("DELETE FROM terms WHERE output = ?", (output,))
+        else:
+            self._db.execute("INSERT OR REPLACE INTO terms VALUES (?, ?)",
+                             (output, json.dumps(terms, separators=(",", ":"))))
+
+    def remove(self, output):
+        """Drop the rows of a page."""
+        self.changed = True
+        self._db.execute("DELETE FROM pages WHERE output = ?", (output,))
+        self._db.execute("DELETE FROM links WHERE output = ?", (output,))
+        self._db.execute("DELETE FROM contents WHERE output = ?", (output,))
+        self._db.execute("DELETE FROM terms WHERE output = ?", (output,))
+
+    def retain(self, outputs):
+        """Drop the rows of every page not in outputs; returns how many were dropped."""
+        stale = self.outputs() - set(outputs)
+        for output in stale:
+            self.remove(output)
+        return len(stale)
+
+    def outputs(self):
+        """Return the set of output paths in the index."""
+        return {row[0] for row in self._db.execute("SELECT output FROM pages")}
+
+    def page(self, output):
+        """Return the PageRecord of an output path, or None."""
+        row = self._db.execute("SELECT * FROM pages WHERE output = ?", (output,)).fetchone()
+        return PageRecord(*row) if row is not None else None
+
+    def content_hash(self, output):
+        """Return the hash of the content HTML stored for a page, or None."""
+        row = self._db.execute("SELECT hash FROM contents WHERE output = ?", (output,)).fetchone()
+        return row[0] if row is not None else None
+
+    def pages(self, prefix="", order_by="output", descending=False, limit=None, offset=0):
+        """
+        List pages.
+
+        Args:
+            prefix: Only pages whose output path starts with this, such as
+                "blog/"
+            order_by: Column to sort by, one of ORDER_COLUMNS; ties are
+                broken by output path
+            descending: Sort largest (or newest) first
+            limit: Most pages to return, or None for all
+            offset: Pages to skip first, for pagination
+
+        Returns:
+            List of PageRecord
+
+        Raises:
+            ValueError: If order_by is not a column
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Cannot sort pages by {order_by!r}; use one of {', '.join(ORDER_COLUMNS)}")
+        direction = "DESC" if descending else "ASC"
+        rows = self._db.execute(
+            f"SELECT * FROM pages WHERE substr(output, 1, ?) = ? "
+            f"ORDER BY {order_by} {direction}, output {direction} LIMIT ? OFFSET ?",
+            (len(prefix), prefix, -1 if limit is None else limit, offset))
+        return [PageRecord(*row) for row in rows]
+
+    def count(self, prefix=""):
+        """Return the number of pages whose output path starts with prefix."""
+        return self._db.execute("SELECT count(*) FROM pages WHERE substr(output, 1, ?) = ?",
+                                (len(prefix), prefix)).fetchone()[0]
+
+    def terms(self):
+        """Iterate over (PageRecord, terms dict) pairs of the pages with search terms, by output path."""
+        for row in self._db.execute("SELECT pages.*, terms.terms FROM pages JOIN terms USING (output) "
+                                    "ORDER BY output"):
+            yield PageRecord(*row[:-1]), json.loads(row[-1])
+
+    def modified_times(self):
+        """Iterate over the (output, modified) pairs of every page, sorted by output path."""
+        return self._db.execute("SELECT output, modified FROM pages ORDER BY output")
+
+    def links_from(self, output):
+        """Return the (kind, url) pairs of a page's links and images, in page order."""
+        return [tuple(row) for row in self._db.execute(
+            "SELECT kind, url FROM links WHERE output = ? ORDER BY rowid", (output,))]
+
+    def all_links(self):
+        """Iterate over the (output, kind, url) of every link and image, each page's in page order."""
+        # In rowid order, without sorting: the links of a page are inserted together
+        return self._db.execute("SELECT output, kind, url FROM links")
+
+    def links_to(self, url):
+        """Return the sorted output paths of pages that link to url."""
+        return [row[0] for row in self._db.execute(
+            "SELECT DISTINCT output FROM links WHERE url = ? ORDER BY output", (url,))]
+
+    def merge_from(self, other_path):
+        """Copy every row of another index file into this one."""
+        # ATTACH is not allowed inside a transaction
+        self._db.commit()
+        self._db.execute("ATTACH DATABASE ? AS other", (other_path,))
+        try:
+            self._db.execute("INSERT OR REPLACE INTO pages SELECT * FROM other.pages")
+            self._db.execute("DELETE FROM links WHERE output IN (SELECT output FROM other.pages)")
+            self._db.execute("INSERT INTO links SELECT * FROM other.links")
+            self._db.execute("INSERT OR REPLACE INTO contents SELECT * FROM other.contents")
+            self._db.execute("INSERT OR REPLACE INTO terms SELECT * FROM other.terms")
+            self._db.commit()
+        finally:
+            self._db.execute("DETACH DATABASE other")
+        self.changed = True
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        """Commit and close the index."""
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Keep the rows of the last commit rather than half an update
+            self._db.rollback()
+        self.close()
+
+    def __repr__(self):
+        return f"PageIndex({self.path}, {self.count()} pages)"
@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+from generate_page import render_page
+from output import write_if_changed
+
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+
+class StageStats:
+    """
+    Timing counters for one pipeline stage.
+
+    Attributes:
+        name: Stage name ("read", "render" or "write")
+        items: Number of pages the stage handled
+        busy: Seconds spent doing the stage's own work
+        waited_input: Seconds spent waiting for work from the previous stage
+        waited_output: Seconds spent blocked on a full queue to the next stage
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.waited_input = 0.0
+        self.waited_output = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy=0.0, waited_input=0.0, waited_output=0.0, items=0):
+        """Add timings from one thread of the stage."""
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.waited_input += waited_input
+            self.waited_output += waited_output
+
+    def __repr__(self):
+        return (f"StageStats({self.name}, items: {self.items}, busy: {self.busy:.3f}s, "
+                f"waited_input: {self.waited_input:.3f}s, waited_output: {self.waited_output:.3f}s)")
+
+
+class PipelineStats:
+    """Timing counters for a whole pipeline run."""
+
+    def __init__(self):
+        self.read = StageStats("read")
+        self.render = StageStats("render")
+        self.write = StageStats("write")
+        self.elapsed = 0.0
+
+    def stages(self):
+        """Return the stages in pipeline order."""
+        return [self.read, self.render, self.write]
+
+    def report(self):
+        """Return a human-readable summary, one line per stage."""
+        lines = [f"Pipeline finished in {self.elapsed:.3f}s"]
+        for stage in self.stages():
+            lines.append(
+                f"  {stage.name:<6} {stage.items:>6} pages  busy {stage.busy:.3f}s  "
+                f"waiting for input {stage.waited_input:.3f}s  "
+                f"blocked on output {stage.waited_output:.3f}s"
+            )
+        return "\n".join(lines)
+
+
+def run_pipeline(pages, basepath="/", readers=2, renderers=1, writers=2,
+                 read_queue_depth=16, write_queue_depth=16, infos=None, factory=None):
+    """
+    Generate pages with overlapped reading, rendering and writing.
+
+    Reader threads prefetch markdown files into a bounded queue, render
+    workers turn them into HTML, and writer threads save the results from a
+    second bounded queue. While one page is being rendered, others are being
+    read and written, so slow storage no longer leaves the CPU idle.
+
+    Pages are written like generate_page writes them: a file that already
+    holds the same bytes is left untouched, and a changed one is replaced
+    with a single rename, so readers never see a partial page.
+
+    Args:
+        pages: List of (markdown_path, template_path, dest_path) tuples, as
+            returned by find_pages
+        basepath: Base path for all URLs in the site (default: "/")
+        readers: Number of reader threads
+        renderers: Number of render threads
+        writers: Number of writer threads
+        read_queue_depth: Maximum pages read but not yet rendered
+        write_queue_depth: Maximum pages rendered but not yet written
+        infos: Optional list that receives, in the order of pages, the
+            facts gathered while rendering each page (see
+            generate_page.page_values) plus "written", like the list
+            generate_pages returns
+        factory: Optional NodeFactory that shares identical nodes between
+            pages; render threads may share it
+
+    Returns:
+        PipelineStats with per-stage timings
+
+    Raises:
+        The first exception raised by any stage, after all threads stopped
+    """
+    if readers < 1 or renderers < 1 or writers < 1:
+        raise ValueError("Every pipeline stage needs at least one thread")
+
+    stats = PipelineStats()
+    start = time.perf_counter()
+
+    jobs = queue.Queue()
+    for position, page in enumerate(pages):
+        jobs.put((position, page))
+    collected = [None] * len(pages)
+
+    read_queue = queue.Queue(maxsize=read_queue_depth)
+    write_queue = queue.Queue(maxsize=write_queue_depth)
+    errors = []
+    failed = threading.Event()
+
+    def put(target, item):
+        """Put an item on a bounded queue and return the time spent blocked."""
+        before = time.perf_counter()
+        target.put(item)
+        return time.perf_counter() - before
+
+    def reader():
+        busy = blocked = 0.0
+        count = 0
+        try:
+            while not failed.is_set():
+                try:
+                    position, page = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                before = time.perf_counter()
+                with open(page[0], 'r', encoding='utf-8') as f:
+                    markdown_content = f.read()
+                busy += time.perf_counter() - before
+                blocked += put(read_queue, (position, page, markdown_content))
+                count += 1
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            stats.read.add(busy=busy, waited_output=blocked, items=count)
+
+    # Consumers keep draining their queue after a failure (discarding the
+    # items) so that no producer stays blocked on a full queue
+    def renderer():
+        busy = idle = blocked = 0.0
+        count = 0
+        while True:
+            before = time.perf_counter()
+            item = read_queue.get()
+            idle += time.perf_counter() - before
+            if item is _DONE:
+                break
+            if failed.is_set():
+                continue
+            try:
+                position, page, markdown_content = item
+                before = time.perf_counter()
+                info = {}
+                html = render_page(markdown_content, page[1], basepath, info=info, path=page[0],
+                                   factory=factory)
+                # Only in-memory renderers need the tree
+                del info["content"]
+                collected[position] = info
+                busy += time.perf_counter() - before
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+                continue
+            blocked += put(write_queue, (position, page[2], html))
+            count += 1
+        stats.render.add(busy=busy, waited_input=idle, waited_output=blocked, items=count)
+
+    def writer():
+        busy = idle = 0.0
+        count = 0
+        while True:
+            before = time.perf_counter()
+            item = write_queue.get()
+            idle += time.perf_counter() - before
+            if item is _DONE:
+                break
+            if failed.is_set():
+                continue
+            try:
+                position, dest_path, html = item
+                before = time.perf_counter()
+                collected[position]["written"] = write_if_changed(dest_path, html)
+                busy += time.perf_counter() - before
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+                continue
+            count += 1
+        stats.write.add(busy=busy, waited_input=idle, items=count)
+
+    reader_threads = _start_threads(reader, readers, "reader")
+    render_threads = _start_threads(renderer, renderers, "renderer")
+    writer_threads = _start_threads(writer, writers, "writer")
+
+    # Shut the stages down in order, one end marker per consumer thread
+    for thread in reader_threads:
+        thread.join()
+    for _ in render_threads:
+        read_queue.put(_DONE)
+    for thread in render_threads:
+        thread.join()
+    for _ in writer_threads:
+        write_queue.put(_DONE)
+    for thread in writer_threads:
+        thread.join()
+
+    stats.elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+
+    if infos is not None:
+        infos.extend(collected)
+    return stats
+
+
+def _start_threads(target, count, name):
+    """Start count daemon threads running target."""
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(target=target, name=f"{name}-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
@@ -0,0 +1,358 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from output import write_bytes_if_changed
+
+
+# Written under this directory of the output directory
+SEARCH_DIR = "search"
+
+# Entry point a search script loads first: the shard of every term prefix
+SEARCH_INDEX_FILENAME = "index.json"
+
+# Page ids to URL and title, fetched once a query has results
+PAGES_FILENAME = "pages.json.gz"
+
+# Browser-side loader a page includes to query the index
+SEARCH_SCRIPT_FILENAME = "search.js"
+
+# Largest compressed shard, unless configured otherwise; a shard over the
+# budget is split by the next character of its terms
+SHARD_BUDGET = 32 * 1024
+
+# Longer runs of word characters are hashes or URLs, not words to search
+MAX_TERM_LENGTH = 40
+
+# Format of the files, for the search script
+SEARCH_INDEX_VERSION = 1
+
+# Postings of hashed page ids compress less than this; a shard whose JSON
+# is larger than the budget times this is split without compressing it
+_MAX_COMPRESSION = 4
+
+# zlib's default: level 9 takes four times as long for 1-2% smaller shards
+_COMPRESS_LEVEL = 6
+
+_TERM_RE = re.compile(r"\w+")
+
+# Defines SiteSearch.create(url of the search directory), whose search(query)
+# resolves to the [url, title] of the pages holding every query term, best
+# match first. Terms, prefixes and lengths are counted in code points as in
+# term_frequencies and shard_for. Shards are gunzipped here rather than by
+# the browser, unless the server already sent them with Content-Encoding.
+SEARCH_SCRIPT = r"""// Written by the site generator: loads search/index.json, then the shards of the query's terms
+(function (root) {
+  "use strict";
+
+  const MAX_TERM_LENGTH = %(max_term_length)d;
+  const VERSION = %(version)d;
+
+  function terms(text) {
+    const found = text.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+    return [...new Set(found)].filter((term) => Array.from(term).length <= MAX_TERM_LENGTH);
+  }
+
+  function shardFor(shards, term) {
+    const chars = Array.from(term);
+    for (let end = chars.length; end > 0; end--) {
+      const prefix = chars.slice(0, end).join("");
+      if (Object.prototype.hasOwnProperty.call(shards, prefix)) {
+        return shards[prefix];
+      }
+    }
+    return null;
+  }
+
+  async function fetchJSON(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+      throw new Error("Cannot load " + url + ": " + response.status);
+    }
+    let body = new Uint8Array(await response.arrayBuffer());
+    if (body[0] === 0x1f && body[1] === 0x8b) {
+      const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream("gzip"));
+      body = new Uint8Array(await new Response(stream).arrayBuffer());
+    }
+    return JSON.parse(new TextDecoder().decode(body));
+  }
+
+  function create(base) {
+    base = base.endsWith("/") ? base : base + "/";
+    let index = null;
+    let pages = null;
+    const shards = {};
+
+    function load(name) {
+      if (!(name in shards)) {
+        shards[name] = fetchJSON(base + name);
+      }
+      return shards[name];
+    }
+
+    async function search(query) {
+      const wanted = terms(query);
+      if (wanted.length === 0) {
+        return [];
+      }
+      index = index || fetchJSON(base + "%(index)s").then((loaded) => {
+        if (loaded.version !== VERSION) {
+          throw new Error("Search index version " + loaded.version + " is not " + VERSION);
+        }
+        return loaded;
+      });
+      const shardFiles = (await index).shards;
+      const postings = await Promise.all(wanted.map(async (term) => {
+        const file = shardFor(shardFiles, term);
+        return file === null ? [] : ((await load(file))[term] || []);
+      }));
+
+      // Pages holding every term, scored by how often they hold them
+      let scores = null;
+      for (const termPostings of postings) {
+        const next = new Map();
+        for (const [id, count] of termPostings) {
+          if (scores === null || scores.has(id)) {
+            next.set(id, (scores === null ? 0 : scores.get(id)) + count);
+          }
+        }
+        scores = next;
+      }
+      if (scores.size === 0) {
+        return [];
+      }
+      pages = pages || index.then((loaded) => fetchJSON(base + loaded.pages));
+      const listed = await pages;
+      return [...scores].sort((a, b) => b[1] - a[1] || (a[0] < b[0] ? -1 : 1))
+        .filter(([id]) => id in listed)
+        .map(([id]) => ({url: listed[id][0], title: listed[id][1]}));
+    }
+
+    return {search: search};
+  }
+
+  root.SiteSearch = {create: create, shardFor: shardFor, terms: terms};
+})(globalThis);
+""" % {"max_term_length": MAX_TERM_LENGTH, "version": SEARCH_INDEX_VERSION, "index": SEARCH_INDEX_FILENAME}
+
+
+class SearchSettings:
+    """
+    Whether and how a build writes a search index.
+
+    Args:
+        shard_budget: Largest size of a compressed shard, in bytes
+
+    Raises:
+        ValueError: If shard_budget is below 1
+    """
+
+    def __init__(self, shard_budget=SHARD_BUDGET):
+        if shard_budget < 1:
+            raise ValueError(f"Search shards need a budget of at least one byte, not {shard_budget}")
+        self.shard_budget = shard_budget
+
+    def __repr__(self):
+        return f"SearchSettings({self.shard_budget} bytes per shard)"
+
+
+def term_frequencies(text):
+    """
+    Count the search terms in page text.
+
+    Terms are runs of word characters, lowercased and not stemmed, so a
+    query matches exactly the words it contains.
+
+    Args:
+        text: Plain text, such as the inline nodes of a page joined with
+            spaces
+
+    Returns:
+        Dict mapping each term to the number of times it occurs
+    """
+    terms = Counter(_TERM_RE.findall(text.lower()))
+    return {term: count for term, count in terms.items() if len(term) <= MAX_TERM_LENGTH}
+
+
+def page_id(output):
+    """
+    Return the id postings use for a page.
+
+    Ids are a hash of the output path rather than a position in a list,
+    so adding a page leaves the postings of every other page, and the
+    bytes of shards it has no terms in, as they were.
+    """
+    return hashlib.sha256(output.encode('utf-8')).hexdigest()[:12]
+
+
+def shard_filename(prefix):
+    """
+    Return the file name of the shard holding the terms that start with prefix.
+
+    Example:
+        shard_filename("ca") -> "t-ca.json.gz"
+        shard_filename("é") -> "x-c3a9.json.gz"
+    """
+    if prefix.isascii() and prefix.isalnum():
+        return f"t-{prefix}.json.gz"
+    return f"x-{prefix.encode('utf-8').hex()}.json.gz"
+
+
+def shard_for(shards, term):
+    """
+    Return the shard file holding a term, as the search script looks it up.
+
+    A term is in the shard of the longest prefix it starts with; a term
+    with no such prefix is in no shard.
+
+    Args:
+        shards: Dict mapping prefixes to shard files, as in index.json
+        term: Search term
+
+    Returns:
+        File name of the shard, or None
+    """
+    for end in range(len(term), 0, -1):
+        if term[:end] in shards:
+            return shards[term[:end]]
+    return None
+
+
+def write_search_index(dest_dir, pages, shard_budget=SHARD_BUDGET):
+    """
+    Write the inverted index of a site as compressed JSON shards.
+
+    Terms are sharded by prefix: one shard per first character, and a
+    shard whose compressed size is over shard_budget is split by the next
+    character until it fits, so a query only fetches the shards of its
+    terms. Each shard maps its terms to postings, [page id, term frequency]
+    pairs. index.json maps every prefix to its shard file; a term is in the
+    shard of the longest prefix it starts with. pages.json.gz maps page ids
+    to [url, title]. search.js loads them in the browser.
+
+    Files holding the same bytes as before are left untouched; gzip
+    headers carry no timestamp, so unchanged shards compress identically.
+
+    Args:
+        dest_dir: Output directory; files go into its search/ directory
+        pages: Iterable of (PageRecord, terms) pairs, where terms maps each
+            term of the page to its frequency
+        shard_budget: Largest compressed size of a shard, in bytes; a
+            shard holding a single term may still be larger
+
+    Returns:
+        List of (path relative to dest_dir, changed) pairs for every file,
+        index first
+
+    Raises:
+        ValueError: If two pages get the same id
+    """
+    # Postings go straight to their JSON text: a large site has millions,
+    # too many to build as lists and encode afterwards
+    postings = {}
+    listed = {}
+    for record, terms in pages:
+        pid = page_id(record.output)
+        if pid in listed:
+            raise ValueError(f"Search ids of {record.url} and {listed[pid][0]} collide")
+        listed[pid] = [record.url, record.title]
+        start = '["' + pid + '",'
+        for term, count in terms.items():
+            posting = start + str(count) + "]"
+            term_postings = postings.get(term)
+            if term_postings is None:
+                postings[term] = [posting]
+            else:
+                term_postings.append(posting)
+
+    # Each term's part of a shard is encoded once, however often it is split
+    fragments = {term: _dumps(term) + ":[" + ",".join(term_postings) + "]"
+                 for term, term_postings in postings.items()}
+    groups = {}
+    for term in postings:
+        groups.setdefault(term[0], []).append(term)
+    search_dir = os.path.join(dest_dir, SEARCH_DIR)
+    shards = _Shards(search_dir, fragments, shard_budget)
+    for prefix, terms in sorted(groups.items()):
+        shards.add(prefix, sorted(terms))
+
+    files = {prefix: shard_filename(prefix) for prefix in shards.data}
+    index = {"version": SEARCH_INDEX_VERSION, "pages": PAGES_FILENAME, "shards": files}
+    written = []
+    for name, data in [(SEARCH_INDEX_FILENAME, _dumps(index).encode('utf-8') + b"\n"),
+                       (SEARCH_SCRIPT_FILENAME, SEARCH_SCRIPT.encode('utf-8')),
+                       (PAGES_FILENAME, _gzip(_dumps(listed)))]:
+        written.append((SEARCH_DIR + "/" + name, write_bytes_if_changed(os.path.join(search_dir, name), data)))
+    for prefix, data in shards.data.items():
+        changed = data is not None and write_bytes_if_changed(os.path.join(search_dir, files[prefix]), data)
+        written.append((SEARCH_DIR + "/" + files[prefix], changed))
+    return written
+
+
+class _Shards:
+    """
+    Splits terms into shards that fit the budget.
+
+    Compressing is most of the cost of writing an index, so a shard file
+    that already holds exactly the terms of a shard is kept without
+    compressing them again.
+
+    Attributes:
+        data: Dict mapping each shard prefix to its compressed bytes, or
+            None when its file is already up to date
+    """
+
+    def __init__(self, search_dir, fragments, shard_budget):
+        self.search_dir = search_dir
+        self.fragments = fragments
+        self.shard_budget = shard_budget
+        self.data = {}
+
+    def add(self, prefix, terms):
+        """Make the sorted terms under prefix one shard, or split them until they fit."""
+        single = all(term == prefix for term in terms)
+        if single or sum(len(self.fragments[term]) + 1 for term in terms) <= self.shard_budget * _MAX_COMPRESSION:
+            if self._store(prefix, terms, single):
+                return
+
+        # The term equal to the prefix itself, if any, keeps a shard of its own
+        groups = {}
+        for term in terms:
+            groups.setdefault(term[:len(prefix) + 1], []).append(term)
+        for next_prefix, group in groups.items():
+            if next_prefix == prefix:
+                self._store(prefix, group, True)
+            else:
+                self.add(next_prefix, group)
+
+    def _store(self, prefix, terms, single):
+        """Keep terms as the shard of prefix if they fit; returns whether they did."""
+        text = ("{" + ",".join(self.fragments[term] for term in terms) + "}").encode('utf-8')
+        try:
+            with open(os.path.join(self.search_dir, shard_filename(prefix)), 'rb') as f:
+                existing = f.read()
+        except FileNotFoundError:
+            existing = None
+        if existing is not None and (single or len(existing) <= self.shard_budget):
+            try:
+                if gzip.decompress(existing) == text:
+                    self.data[prefix] = None
+                    return True
+            except (OSError, EOFError):
+                pass
+
+        data = gzip.compress(text, compresslevel=_COMPRESS_LEVEL, mtime=0)
+        if single or len(data) <= self.shard_budget:
+            self.data[prefix] = data
+            return True
+        return False
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def _gzip(text):
+    return gzip.compress(text.encode('utf-8'), compresslevel=_COMPRESS_LEVEL, mtime=0)
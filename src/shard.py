@@ -0,0 +1,262 @@
+import filecmp
+import hashlib
+import os
+from copy_static import remove_empty_dirs
+from manifest import BuildManifest, MANIFEST_FILENAME, is_build_state
+from page_index import INDEX_FILENAME, PageIndex
+from output import copy_file
+
+
+# Ways of assigning pages to shards
+BY_HASH = "hash"
+BY_SIZE = "size"
+
+
+def parse_shard(spec):
+    """
+    Parse a shard given on the command line as "i/N".
+
+    Shards are numbered from 1, so "2/4" is the second of four.
+
+    Returns:
+        Tuple of (index, count)
+
+    Raises:
+        ValueError: If spec is not of the form i/N with 1 <= i <= N
+    """
+    index, sep, count = spec.partition("/")
+    if not sep or not index.isdigit() or not count.isdigit():
+        raise ValueError(f"Shard must look like 2/4, not {spec!r}")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index} does not exist in {count} shard(s)")
+    return index, count
+
+
+def shard_of(source, count):
+    """
+    Return the shard (1 to count) a page belongs to by hashing its source.
+
+    The hash is of the source path relative to the content directory, so
+    every machine assigns every page the same way, whatever its checkout
+    location or Python hash seed.
+    """
+    digest = hashlib.sha256(source.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def assign_shards(sources, count, sizes=None):
+    """
+    Assign pages to shards.
+
+    Args:
+        sources: Source paths relative to the content directory, with "/"
+            separators
+        count: Number of shards
+        sizes: Optional dict mapping sources to their file size; pages are
+            then handed out largest first to the least loaded shard, so
+            every shard renders about the same number of bytes
+
+    Returns:
+        Dict mapping each source to its shard (1 to count)
+    """
+    if sizes is None:
+        return {source: shard_of(source, count) for source in sources}
+
+    loads = [0] * count
+    assigned = {}
+    # Ties are broken by path and shard number, so the result is the same
+    # on every machine with the same sources
+    for source in sorted(sources, key=lambda source: (-sizes[source], source)):
+        lightest = min(range(count), key=lambda shard: (loads[shard], shard))
+        loads[lightest] += sizes[source]
+        assigned[source] = lightest + 1
+    return assigned
+
+
+def select_shard(pages, content_dir, shard, by=BY_HASH, snapshot=None):
+    """
+    Keep the pages of one shard.
+
+    Args:
+        pages: List of (markdown_path, template_path, dest_path) tuples, as
+            returned by find_pages
+        content_dir: Content directory the markdown paths are below
+        shard: Tuple of (index, count) from parse_shard
+        by: BY_HASH to assign by path, or BY_SIZE to balance by file size
+        snapshot: Optional TreeSnapshot of content_dir to take sizes from
+
+    Returns:
+        The pages assigned to the shard, in their original order
+    """
+    index, count = shard
+    prefix = len(os.path.join(content_dir, ""))
+    sources = [page[0][prefix:].replace(os.sep, "/") for page in pages]
+    sizes = None
+    if by == BY_SIZE:
+        sizes = {}
+        for source, page in zip(sources, pages):
+            entry = snapshot.get(source) if snapshot is not None else None
+            sizes[source] = entry.size if entry is not None else os.path.getsize(page[0])
+    elif by != BY_HASH:
+        raise ValueError(f"Unknown shard assignment: {by}")
+
+    assigned = assign_shards(sources, count, sizes)
+    return [page for page, source in zip(pages, sources) if assigned[source] == index]
+
+
+def merge_shards(shard_dirs, dest_dir, generate=None):
+    """
+    Combine the partial output trees of a sharded build into one site.
+
+    Every shard directory must hold the manifest of one shard of the same
+    build, and together they must cover every shard. Nothing is written
+    until all of them have been checked: a page claimed by two shards, a
+    file two shards produced with different bytes, or pages built with a
+    different basepath or generator are conflicts.
+
+    Files are copied into dest_dir only when their bytes differ from what
+    is there, files no shard produced are removed, and a manifest and page
+    index covering the whole site are written, so later builds of dest_dir
+    are incremental.
+
+    Listing pages, feeds, the sitemap and the search index cover pages of
+    every shard, so shards leave them out and generate writes them from the
+    merged page index.
+
+    Args:
+        shard_dirs: Output directories of the shards
+        dest_dir: Output directory of the merged site
+        generate: Optional function called as
+            generate(index, basepath, pages, static, previous) with the
+            merged PageIndex, manifest entries and static record, and the
+            manifest entries of the last merge; it writes the generated
+            files, adds their entries to pages and returns their
+            BuildResult (see incremental.update_generated)
+
+    Returns:
+        Tuple of (written, unchanged, deleted) file counts
+
+    Raises:
+        ValueError: If a shard is missing or the shards conflict
+    """
+    manifests = _load_shards(shard_dirs)
+
+    conflicts = []
+    pages = {}
+    static = {}
+    # rel_path -> shard directory whose copy is used
+    files = {}
+    owners = {}
+    for shard_dir, manifest in manifests:
+        for rel_dest, entry in manifest.pages.items():
+            if rel_dest in owners:
+                conflicts.append(f"{rel_dest} was generated by both {owners[rel_dest]} and {shard_dir}")
+                continue
+            owners[rel_dest] = shard_dir
+            pages[rel_dest] = entry
+        for rel_path, record in manifest.static.items():
+            # Shards built on other checkouts stat the same file differently;
+            # a record no mtime can match makes the next build compare bytes
+            if static.setdefault(rel_path, record) != record:
+                static[rel_path] = [record[0], None]
+
+        for rel_path in _list_files(shard_dir):
+            other = files.get(rel_path)
+            if other is None:
+                files[rel_path] = shard_dir
+            elif not _same_file(os.path.join(other, rel_path), os.path.join(shard_dir, rel_path)):
+                conflicts.append(f"{rel_path} differs between {other} and {shard_dir}")
+
+    for setting in ("basepath", "generator"):
+        values = {entry.get(setting) for entry in pages.values()}
+        if len(values) > 1:
+            conflicts.append(f"Shards were built with different {setting}s: "
+                             f"{', '.join(sorted(str(value) for value in values))}")
+
+    if conflicts:
+        raise ValueError("Cannot merge shards:\n  " + "\n  ".join(conflicts))
+
+    written = 0
+    unchanged = 0
+    for rel_path in sorted(files):
+        source_path = os.path.join(files[rel_path], rel_path)
+        dest_path = os.path.join(dest_dir, rel_path)
+        if os.path.exists(dest_path) and _same_file(source_path, dest_path):
+            unchanged += 1
+            continue
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        copy_file(source_path, dest_path)
+        written += 1
+
+    previous = BuildManifest.load(dest_dir)
+    index = PageIndex.open(dest_dir)
+    for shard_dir, _ in manifests:
+        if os.path.exists(os.path.join(shard_dir, INDEX_FILENAME)):
+            index.merge_from(os.path.join(shard_dir, INDEX_FILENAME))
+    index.retain(pages)
+
+    keep = set(files)
+    if generate is not None:
+        basepath = next(iter(pages.values()))["basepath"] if pages else "/"
+        outputs = set(pages)
+        result = generate(index, basepath, pages, static, previous.pages if previous is not None else {})
+        generated_written, generated_unchanged, _ = result.file_counts()
+        written += generated_written
+        unchanged += generated_unchanged
+        keep.update(set(pages) - outputs)
+    index.close()
+
+    deleted = 0
+    for rel_path in sorted(set(_list_files(dest_dir)) - keep):
+        path = os.path.join(dest_dir, rel_path)
+        print(f"Removing file no shard produced: {path}")
+        os.remove(path)
+        remove_empty_dirs(os.path.dirname(path), dest_dir)
+        deleted += 1
+
+    BuildManifest(os.path.join(dest_dir, MANIFEST_FILENAME), pages, static).save()
+    print(f"Merged {len(manifests)} shard(s) into {dest_dir}: {len(pages)} pages")
+    return written, unchanged, deleted
+
+
+def _load_shards(shard_dirs):
+    """Load the manifests of the shard directories and check they form one build."""
+    manifests = []
+    seen = {}
+    for shard_dir in shard_dirs:
+        manifest = BuildManifest.load(shard_dir)
+        if manifest is None:
+            raise ValueError(f"No build manifest in {shard_dir}")
+        if manifest.shard is None:
+            raise ValueError(f"{shard_dir} is not the output of a --shard build")
+        index, count = manifest.shard
+        if index in seen:
+            raise ValueError(f"{seen[index]} and {shard_dir} are both shard {index}/{count}")
+        seen[index] = shard_dir
+        manifests.append((shard_dir, manifest))
+
+    counts = {manifest.shard[1] for _, manifest in manifests}
+    if len(counts) > 1:
+        raise ValueError(f"Shards come from builds split {sorted(counts)} ways")
+    count = counts.pop() if counts else 0
+    missing = [str(index) for index in range(1, count + 1) if index not in seen]
+    if not manifests or missing:
+        raise ValueError(f"Missing shard(s) {', '.join(missing) or '1'} of {count or 1}")
+    return manifests
+
+
+def _list_files(directory):
+    """Return "/"-separated paths of the files below directory, except the build state."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            rel_path = os.path.relpath(os.path.join(root, file), directory).replace(os.sep, "/")
+            if not is_build_state(rel_path):
+                found.append(rel_path)
+    return found
+
+
+def _same_file(path, other):
+    """Check whether two files hold the same bytes."""
+    return os.path.getsize(path) == os.path.getsize(other) and filecmp.cmp(path, other, shallow=False)
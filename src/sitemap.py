@@ -0,0 +1,167 @@
+import os
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+from output import OutputWriter
+
+
+# Written at the root of the output directory: the only sitemap of a small
+# site, or the sitemap index pointing at the parts of a large one
+SITEMAP_FILENAME = "sitemap.xml"
+
+# Limits of one sitemap file in the sitemaps.org protocol
+MAX_URLS = 50_000
+MAX_BYTES = 50 * 1024 * 1024
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+_HEADER = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">\n'
+_FOOTER = "</urlset>\n"
+_INDEX_HEADER = f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n'
+_INDEX_FOOTER = "</sitemapindex>\n"
+
+
+def page_url(rel_dest, basepath="/", site_url=""):
+    """
+    Return the public URL of a generated page.
+
+    Pages named index.html are addressed by their directory.
+
+    Args:
+        rel_dest: Output path relative to the output directory, with "/"
+            separators
+        basepath: Base path the site is served under
+        site_url: Scheme and host to prefix, such as "https://example.com"
+
+    Returns:
+        URL such as "https://example.com/blog/tom/"
+    """
+    if rel_dest == "index.html" or rel_dest.endswith("/index.html"):
+        rel_dest = rel_dest[:-len("index.html")]
+    return site_url.rstrip("/") + basepath.rstrip("/") + "/" + rel_dest
+
+
+def sitemap_part(number):
+    """Return the file name of one part of a split sitemap, from 1."""
+    return f"sitemap-{number}.xml"
+
+
+def sitemap_pages(outputs, modified_times, dest_dir):
+    """
+    Pair the outputs of a site with their last modification times.
+
+    Pages with a source take the mtime the page index recorded for it;
+    pages without one, such as listings, take the mtime of their output
+    file, which a build only changes when the bytes do.
+
+    Args:
+        outputs: Sorted output paths of the pages to list
+        modified_times: (output, modified) pairs sorted by output, such as
+            PageIndex.modified_times()
+        dest_dir: Output directory, for pages missing from modified_times
+
+    Yields:
+        Tuple of (output path, lastmod as an ISO 8601 UTC time)
+    """
+    modified_times = iter(modified_times)
+    current = next(modified_times, None)
+    for rel_dest in outputs:
+        # Both are sorted, so walk them side by side
+        while current is not None and current[0] < rel_dest:
+            current = next(modified_times, None)
+        if current is not None and current[0] == rel_dest:
+            yield rel_dest, current[1]
+            continue
+        try:
+            mtime = os.stat(os.path.join(dest_dir, rel_dest)).st_mtime
+        except FileNotFoundError:
+            yield rel_dest, None
+            continue
+        yield rel_dest, datetime.fromtimestamp(mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def write_sitemaps(dest_dir, pages, basepath="/", site_url="", max_urls=MAX_URLS, max_bytes=MAX_BYTES):
+    """
+    Write the sitemap of a site, split into parts and an index when large.
+
+    A site within the limits of one sitemap file gets a single sitemap.xml.
+    Past them, the URLs go into sitemap-1.xml, sitemap-2.xml and so on, and
+    sitemap.xml becomes a sitemap index listing the parts.
+
+    URLs are streamed to disk one at a time, so memory use does not grow
+    with the site. That takes two passes over pages: one to find where the
+    parts split, and one to write them.
+
+    Args:
+        dest_dir: Output directory the sitemap files are written to
+        pages: Function returning a new iterator of (output path, lastmod)
+            pairs in sitemap order, such as sitemap_pages(...); lastmod may
+            be None
+        basepath: Base path the site is served under
+        site_url: Scheme and host, such as "https://example.com"; sitemaps
+            need absolute URLs
+        max_urls: Most URLs in one sitemap file
+        max_bytes: Largest size of one sitemap file
+
+    Returns:
+        List of (file name, changed) pairs for every sitemap file, index
+        first, where changed is False if the file already held the same bytes
+    """
+    # Pass 1: the number of URLs and the newest lastmod of every part
+    parts = []
+    count = size = 0
+    newest = None
+    for rel_dest, lastmod in pages():
+        line_size = len(_url_line(page_url(rel_dest, basepath, site_url), lastmod).encode('utf-8'))
+        if count and (count == max_urls or size + line_size + len(_FOOTER) > max_bytes):
+            parts.append((count, newest))
+            count = 0
+            newest = None
+        if not count:
+            size = len(_HEADER)
+        count += 1
+        size += line_size
+        if lastmod is not None and (newest is None or lastmod > newest):
+            newest = lastmod
+    parts.append((count, newest))
+
+    # Pass 2: stream the URLs into their files
+    urls = ((page_url(rel_dest, basepath, site_url), lastmod) for rel_dest, lastmod in pages())
+    if len(parts) == 1:
+        return [(SITEMAP_FILENAME, _write_urlset(os.path.join(dest_dir, SITEMAP_FILENAME), urls, parts[0][0]))]
+
+    written = []
+    for number, (part_count, _) in enumerate(parts, 1):
+        written.append((sitemap_part(number),
+                        _write_urlset(os.path.join(dest_dir, sitemap_part(number)), urls, part_count)))
+    print(f"Sitemap split into {len(parts)} parts")
+    with OutputWriter(os.path.join(dest_dir, SITEMAP_FILENAME)) as out:
+        out.write(_INDEX_HEADER)
+        for number, (_, newest) in enumerate(parts, 1):
+            out.write("  <sitemap>" + _loc_lastmod(page_url(sitemap_part(number), basepath, site_url), newest)
+                      + "</sitemap>\n")
+        out.write(_INDEX_FOOTER)
+    return [(SITEMAP_FILENAME, out.changed)] + written
+
+
+def _write_urlset(path, urls, count):
+    """Write the next count URLs to one sitemap file; returns whether it changed."""
+    dest_dir = os.path.dirname(path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    with OutputWriter(path) as out:
+        out.write(_HEADER)
+        for _ in range(count):
+            out.write(_url_line(*next(urls)))
+        out.write(_FOOTER)
+    return out.changed
+
+
+def _url_line(url, lastmod):
+    return "  <url>" + _loc_lastmod(url, lastmod) + "</url>\n"
+
+
+def _loc_lastmod(url, lastmod):
+    text = f"<loc>{escape(url)}</loc>"
+    if lastmod:
+        text += f"<lastmod>{escape(lastmod)}</lastmod>"
+    return text
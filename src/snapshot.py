@@ -0,0 +1,224 @@
+import os
+
+
+class FileEntry:
+    """
+    A file found by a TreeSnapshot.
+
+    Wraps the os.DirEntry from the directory read, which already knows the
+    name, path and inode. Size and mtime need a stat, made the first time
+    either is asked for and then kept, so listing files costs no stat.
+
+    Args:
+        entry: os.DirEntry of the file
+        prefix: Relative path of its directory plus "/", or "" at the root
+    """
+
+    __slots__ = ("_entry", "_prefix")
+
+    def __init__(self, entry, prefix):
+        self._entry = entry
+        self._prefix = prefix
+
+    @property
+    def rel_path(self):
+        """Path relative to the snapshot root, with "/" separators."""
+        return self._prefix + self._entry.name
+
+    @property
+    def name(self):
+        return self._entry.name
+
+    @property
+    def path(self):
+        """Path of the file: the snapshot root joined with rel_path."""
+        return self._entry.path
+
+    @property
+    def inode(self):
+        return self._entry.inode()
+
+    def stat(self):
+        """Return the os.stat_result of the file, statting it only once."""
+        return self._entry.stat()
+
+    @property
+    def size(self):
+        return self._entry.stat().st_size
+
+    @property
+    def mtime_ns(self):
+        return self._entry.stat().st_mtime_ns
+
+    def record(self):
+        """Return [size, mtime_ns], as kept in the manifest for static files."""
+        stat = self._entry.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def __repr__(self):
+        return f"FileEntry({self.rel_path})"
+
+
+class TreeSnapshot:
+    """
+    Listing of every file below a directory, read with os.scandir.
+
+    The tree is read once, one os.scandir per directory; whether an entry
+    is a file or a directory comes from the directory read, so no file is
+    statted until its size or mtime is needed. update() re-reads only the
+    directories that changed, so a snapshot kept between watch iterations
+    stays current at the cost of the change, not the tree.
+
+    Args:
+        root: Directory to list; a missing directory gives an empty snapshot
+    """
+
+    def __init__(self, root):
+        self.root = root.rstrip(os.sep) or os.sep
+        # Directory reads made so far
+        self.reads = 0
+        # rel_dir ("" for the root) -> (sorted subdirectory names,
+        # {name: FileEntry} in name order)
+        self._dirs = {}
+        self._read_tree("")
+
+    @property
+    def exists(self):
+        """True if the root directory existed when last read."""
+        return "" in self._dirs
+
+    def walk(self):
+        """
+        Yield the tree top-down in sorted order, like a sorted os.walk.
+
+        Yields:
+            Tuples of (rel_dir, subdirectory names, FileEntry objects sorted
+            by name), with rel_dir "" for the root and "/"-separated below it
+        """
+        stack = [""] if self.exists else []
+        while stack:
+            rel_dir = stack.pop()
+            listing = self._dirs.get(rel_dir)
+            if listing is None:
+                continue
+            subdirs, files = listing
+            yield rel_dir, subdirs, files.values()
+            stack.extend(_join(rel_dir, name) for name in reversed(subdirs))
+
+    def files(self):
+        """Yield every FileEntry in walk order."""
+        for _, _, files in self.walk():
+            yield from files
+
+    def get(self, rel_path):
+        """Return the FileEntry for a "/"-separated relative path, or None."""
+        rel_dir, _, name = rel_path.rpartition("/")
+        listing = self._dirs.get(rel_dir)
+        return listing[1].get(name) if listing is not None else None
+
+    def update(self, changed_paths):
+        """
+        Re-read the directories holding changed, created or deleted paths.
+
+        Paths outside the root are ignored. New directories are read in
+        full and deleted ones dropped.
+        """
+        refresh = set()
+        for path in changed_paths:
+            path = os.path.abspath(path)
+            root = os.path.abspath(self.root)
+            if path != root and not path.startswith(os.path.join(root, "")):
+                continue
+            rel_dir = os.path.relpath(os.path.dirname(path), root).replace(os.sep, "/")
+            rel_dir = "" if path == root or rel_dir == "." else rel_dir
+            # A file in a new directory is listed from the closest directory
+            # the snapshot already knows
+            while rel_dir and rel_dir not in self._dirs:
+                rel_dir = rel_dir.rpartition("/")[0]
+            refresh.add(rel_dir)
+
+        for rel_dir in sorted(refresh):
+            if rel_dir in self._dirs or rel_dir == "":
+                self._refresh(rel_dir)
+
+    def _refresh(self, rel_dir):
+        old_subdirs = self._dirs[rel_dir][0] if rel_dir in self._dirs else []
+        new_subdirs = self._read_dir(rel_dir)
+        if new_subdirs is None:
+            self._drop(rel_dir)
+            return
+        for name in set(old_subdirs) - set(new_subdirs):
+            self._drop(_join(rel_dir, name))
+        for name in new_subdirs:
+            if _join(rel_dir, name) not in self._dirs:
+                self._read_tree(_join(rel_dir, name))
+
+    def _read_tree(self, rel_dir):
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            for name in self._read_dir(current) or ():
+                stack.append(_join(current, name))
+
+    def _read_dir(self, rel_dir):
+        """List one directory; returns its subdirectory names or None if it is gone."""
+        path = os.path.join(self.root, *rel_dir.split("/")) if rel_dir else self.root
+        prefix = rel_dir + "/" if rel_dir else ""
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append((entry.name, FileEntry(entry, prefix)))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        self.reads += 1
+        subdirs.sort()
+        # Names are unique, so the entries themselves are never compared
+        files.sort()
+        self._dirs[rel_dir] = (subdirs, dict(files))
+        return subdirs
+
+    def _drop(self, rel_dir):
+        if rel_dir == "":
+            self._dirs.clear()
+            return
+        prefix = rel_dir + "/"
+        for key in [key for key in self._dirs if key == rel_dir or key.startswith(prefix)]:
+            del self._dirs[key]
+
+    def __repr__(self):
+        return f"TreeSnapshot({self.root}, {len(self._dirs)} directories)"
+
+
+class SiteSnapshot:
+    """
+    Snapshots of the two source trees of a build, static files and content.
+
+    One SiteSnapshot is shared by the static copy and page generation steps
+    of a build, and can be kept between the iterations of watch mode.
+
+    Args:
+        static_dir: Path to the static files directory
+        content_dir: Path to the content directory containing markdown files
+    """
+
+    def __init__(self, static_dir, content_dir):
+        self.static = TreeSnapshot(static_dir)
+        self.content = TreeSnapshot(content_dir)
+
+    def update(self, changed_paths):
+        """Bring both snapshots up to date after files changed."""
+        changed_paths = list(changed_paths)
+        self.static.update(changed_paths)
+        self.content.update(changed_paths)
+
+    def __repr__(self):
+        return f"SiteSnapshot({self.static}, {self.content})"
+
+
+def _join(rel_dir, name):
+    return f"{rel_dir}/{name}" if rel_dir else name
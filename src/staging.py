@@ -0,0 +1,171 @@
+import os
+import shutil
+import time
+
+
+# Finished builds live next to the output directory, in "<dest>.builds"
+BUILDS_SUFFIX = ".builds"
+
+# Number of published builds kept for rollback, including the live one
+DEFAULT_KEEP = 3
+
+
+def builds_dir(dest_dir):
+    """Return the directory that holds the builds of dest_dir."""
+    return os.path.abspath(dest_dir).rstrip(os.sep) + BUILDS_SUFFIX
+
+
+def list_builds(dest_dir):
+    """Return the names of the finished builds of dest_dir, oldest first."""
+    path = builds_dir(dest_dir)
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path)
+                  if not name.startswith(".") and os.path.isdir(os.path.join(path, name)))
+
+
+def current_build(dest_dir):
+    """Return the name of the build dest_dir points at, or None."""
+    if not os.path.islink(dest_dir):
+        return None
+    target = os.path.realpath(dest_dir)
+    if os.path.dirname(target) != os.path.realpath(builds_dir(dest_dir)):
+        return None
+    return os.path.basename(target)
+
+
+def stage_build(dest_dir, seed=True):
+    """
+    Create a staging directory for the next build of dest_dir.
+
+    With seed=True the staging directory starts as a copy of the live site
+    made of hardlinks, so an incremental build only rewrites what changed.
+    Files are always replaced by rename (see output.OutputWriter), never
+    written in place, so the live site is not affected through the links.
+
+    Returns:
+        Path of the staging directory
+    """
+    builds = builds_dir(dest_dir)
+    os.makedirs(builds, exist_ok=True)
+
+    # A dot prefix hides unfinished builds
+    staging_path = os.path.join(builds, f".staging-{_build_name()}")
+
+    if seed and os.path.isdir(dest_dir):
+        print(f"Seeding {staging_path} from {dest_dir}")
+        shutil.copytree(os.path.realpath(dest_dir), staging_path, copy_function=os.link, symlinks=True)
+    else:
+        os.mkdir(staging_path)
+    return staging_path
+
+
+def publish_build(dest_dir, staging_path, keep=DEFAULT_KEEP):
+    """
+    Make a finished staging directory the live site.
+
+    dest_dir becomes a symlink to the build, switched with a single rename,
+    so the web server sees either the old site or the new one. A dest_dir
+    that is still a plain directory is moved into the builds directory and
+    kept as the build before this one. A rename cannot replace a directory,
+    so the symlink is made first and renamed into place right after the
+    move, leaving dest_dir missing only between the two renames. Builds
+    beyond the newest `keep` are deleted.
+
+    Returns:
+        Name of the published build
+    """
+    builds = builds_dir(dest_dir)
+    name = os.path.basename(staging_path)[len(".staging-"):]
+    initial = None
+    if os.path.isdir(dest_dir) and not os.path.islink(dest_dir):
+        # Named after the staging directory, which no other build shares,
+        # while the build itself is named now so it sorts after it
+        initial = name + "-initial"
+        name = _build_name()
+        while name <= initial:
+            name = _build_name()
+    os.rename(staging_path, os.path.join(builds, name))
+
+    link_path = _make_link(dest_dir, name)
+    if initial is not None:
+        print(f"Moving existing {dest_dir} into {builds} as build {initial}")
+        os.rename(dest_dir, os.path.join(builds, initial))
+    os.replace(link_path, dest_dir)
+    print(f"Published build {name} at {dest_dir}")
+
+    for old in list_builds(dest_dir)[:-keep] if keep > 0 else []:
+        print(f"Removing old build: {old}")
+        shutil.rmtree(os.path.join(builds, old))
+    return name
+
+
+def rollback(dest_dir, steps=1):
+    """
+    Point dest_dir back at an earlier build.
+
+    Args:
+        dest_dir: Live output directory (a symlink made by publish_build)
+        steps: How many builds to go back from the live one
+
+    Returns:
+        Name of the build that is now live
+
+    Raises:
+        ValueError: If dest_dir is not a published build or there is no
+            build that far back
+    """
+    current = current_build(dest_dir)
+    if current is None:
+        raise ValueError(f"{dest_dir} is not a published build")
+
+    builds = list_builds(dest_dir)
+    index = builds.index(current) - steps
+    if index < 0:
+        raise ValueError(f"Only {builds.index(current)} earlier build(s) of {dest_dir} are kept")
+
+    _point_at(dest_dir, builds[index])
+    print(f"Rolled back {dest_dir} to build {builds[index]}")
+    return builds[index]
+
+
+def build_staged(dest_dir, build, seed=True, keep=DEFAULT_KEEP):
+    """
+    Run build(staging_path) and publish the result only if it succeeds.
+
+    On failure the staging directory is deleted and the live site is left
+    exactly as it was.
+
+    Returns:
+        Whatever build returned
+    """
+    staging_path = stage_build(dest_dir, seed)
+    try:
+        result = build(staging_path)
+    except BaseException:
+        print(f"Build failed, discarding {staging_path}")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+    publish_build(dest_dir, staging_path, keep)
+    return result
+
+
+def _build_name():
+    """Return a name for a new build; names sort by creation time."""
+    now = time.time_ns()
+    return time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 1_000_000_000)) + f"-{now % 1_000_000_000:09d}"
+
+
+def _point_at(dest_dir, name):
+    """Atomically replace the dest_dir symlink with one to build `name`."""
+    os.replace(_make_link(dest_dir, name), dest_dir)
+
+
+def _make_link(dest_dir, name):
+    """Create a symlink to build `name` next to dest_dir, and return its path."""
+    target = os.path.join(os.path.basename(builds_dir(dest_dir)), name)
+    link_path = os.path.abspath(dest_dir).rstrip(os.sep) + ".link-tmp"
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    os.symlink(target, link_path)
+    return link_path
@@ -0,0 +1,573 @@
+import hashlib
+import marshal
+import os
+import re
+import sys
+import threading
+
+
+# Bump whenever the generated code changes shape, so disk caches are ignored
+ENGINE_VERSION = "3"
+
+# Splits template source into {{ expressions }}, {% statements %} and text
+TOKEN_PATTERN = re.compile(r"\{\{(.*?)\}\}|\{%(.*?)%\}", re.DOTALL)
+
+# Matches the leading slash of root-relative href/src attributes in literal
+# text (but not protocol-relative "//")
+URL_PATTERN = re.compile(r'(?:href|src)="(/)(?!/)')
+
+# Dotted variable names such as Title or post.url
+NAME_PATTERN = re.compile(r"^[A-Za-z_]\w*(?:\.\w+)*$")
+
+# Variable that receives the site basepath in place of a root-relative "/"
+BASEPATH_SLOT = "basepath"
+
+# Query that marks a root-relative URL for fingerprinting, as in
+# href="/index.css?fingerprint"; it is replaced by "?v=<content hash>"
+FINGERPRINT_QUERY = "fingerprint"
+
+# Hex digits of the content hash written into fingerprinted URLs
+FINGERPRINT_LENGTH = 12
+
+# Name of the per-directory template override inside the content tree
+TEMPLATE_FILENAME = "template.html"
+
+# Maximum nesting of includes, to catch templates that include themselves
+MAX_INCLUDE_DEPTH = 20
+
+# Compiled templates keyed by absolute path: (mtime_ns, size, CompiledTemplate)
+_template_cache = {}
+
+# Directory for marshalled code objects, or None to keep them in memory only
+_disk_cache_dir = None
+
+# Directory fingerprinted URLs are resolved against, or None to leave them bare
+_asset_dir = None
+
+# Asset hashes keyed by absolute path: (mtime_ns, size, sha256 hex digest)
+_asset_hashes = {}
+
+
+class TemplateSyntaxError(ValueError):
+    """Raised when a template cannot be parsed."""
+
+
+class CompiledTemplate:
+    """
+    A template compiled into a Python code object.
+
+    Supported syntax:
+        {{ name }} / {{ post.title }}         variable lookup
+        {% if name %} ... {% elif not other %} ... {% else %} ... {% endif %}
+        {% for post in pages %} ... {% endfor %}
+        {% include "partials/nav.html" %}     relative to this template
+
+    Variables are inserted as-is, without HTML escaping, because Content is
+    already rendered HTML. A top-level variable missing from the context is
+    left in the output as its original placeholder text. The leading "/" of
+    every root-relative href or src in literal text is replaced by the
+    "basepath" variable (default "/"), and a "?fingerprint" query on such a
+    URL is replaced by "?v=" and the start of the asset's content hash, so
+    browsers can cache static files until they change.
+
+    Attributes:
+        source: The template text
+        path: Path of the template file, or None for templates built from text
+        code: Code object defining render(_ctx, _write, _include) along with
+            the VARIABLES, INCLUDES, URLS and ASSETS lists
+        variables: Names of top-level variables referenced by the template
+        includes: Include names in the order they appear
+        urls: Root-relative URLs written literally in the template, such as
+            "/index.css"
+        assets: Static paths of the fingerprinted URLs, such as "index.css"
+    """
+
+    def __init__(self, source, path=None, code=None):
+        self.source = source
+        self.path = path
+
+        # A code object loaded from the disk cache skips parsing entirely
+        if code is None:
+            code = compile(_generate(source), path or "<template>", "exec")
+        self.code = code
+
+        namespace = {
+            "_value": _value,
+            "_truthy": _truthy,
+            "_iterable": _iterable,
+            "_fingerprint": _fingerprint,
+        }
+        exec(self.code, namespace)
+        self._render = namespace["render"]
+        self.variables = namespace["VARIABLES"]
+        self.includes = namespace["INCLUDES"]
+        self.urls = namespace["URLS"]
+        self.assets = namespace["ASSETS"]
+
+    def slots(self):
+        """Return the names of all variables in template order."""
+        return list(self.variables)
+
+    def render(self, values):
+        """Return the whole page as a single string."""
+        parts = []
+        self._render(values, parts.append, self._make_include(0))
+        return "".join(parts)
+
+    def write(self, file, values):
+        """Write the page to an open text file piece by piece."""
+        self._render(values, file.write, self._make_include(0))
+
+    def _make_include(self, depth):
+        """Build the callback the generated code uses for {% include %}."""
+        def include(name, context, write):
+            if depth >= MAX_INCLUDE_DEPTH:
+                raise TemplateSyntaxError(f"Includes nested too deeply at {name!r}")
+            partial = load_template(self.resolve_include(name))
+            partial._render(context, write, partial._make_include(depth + 1))
+        return include
+
+    def resolve_include(self, name):
+        """Return the file path an include name refers to."""
+        base_dir = os.path.dirname(self.path) if self.path else os.getcwd()
+        return os.path.normpath(os.path.join(base_dir, name))
+
+
+def _value(context, parts, raw):
+    """Look up a dotted variable for {{ }} output."""
+    if parts[0] not in context:
+        return raw
+    value = _resolve(context, parts)
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _truthy(context, parts):
+    """Evaluate a dotted variable for {% if %}."""
+    if parts[0] not in context:
+        return False
+    return bool(_resolve(context, parts))
+
+
+def _iterable(context, parts):
+    """Evaluate a dotted variable for {% for %}."""
+    if parts[0] not in context:
+        return ()
+    value = _resolve(context, parts)
+    return value if value is not None else ()
+
+
+def _resolve(context, parts):
+    """Walk a dotted name through dicts and object attributes."""
+    value = context[parts[0]]
+    for part in parts[1:]:
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+        if value is None:
+            return None
+    return value
+
+
+def _parse_name(expression, line):
+    """Validate a dotted variable name and split it into parts."""
+    expression = expression.strip()
+    if not NAME_PATTERN.match(expression):
+        raise TemplateSyntaxError(f"Invalid variable {expression!r} on line {line}")
+    return tuple(expression.split("."))
+
+
+def _parse_condition(expression, line):
+    """Parse 'name' or 'not name' into (negated, parts)."""
+    words = expression.split()
+    if len(words) == 2 and words[0] == "not":
+        return True, _parse_name(words[1], line)
+    if len(words) == 1:
+        return False, _parse_name(words[0], line)
+    raise TemplateSyntaxError(f"Invalid condition {expression!r} on line {line}")
+
+
+def _generate(source):
+    """
+    Translate template source into Python source for a render function.
+
+    The generated module also defines VARIABLES, INCLUDES, URLS and ASSETS, so a cached
+    code object carries everything needed without looking at the source.
+
+    Returns:
+        Python source code as a string
+    """
+    lines = ["def render(_ctx0, _write, _include):"]
+    variables = []
+    includes = []
+    urls = []
+    assets = []
+
+    # Each open block is (keyword, line); the context variable name changes
+    # inside for loops so loop variables do not leak out of the loop
+    blocks = []
+    contexts = ["_ctx0"]
+    loop_count = 0
+    # Whether the current indentation level already has a statement
+    has_body = [False]
+
+    def emit(code):
+        lines.append("    " * len(contexts) + code)
+        has_body[-1] = True
+
+    def emit_text(text):
+        position = 0
+        for match in URL_PATTERN.finditer(text):
+            start = match.start(1)
+            if start > position:
+                emit(f"_write({text[position:start]!r})")
+            emit(f"_write(_value({contexts[-1]}, ({BASEPATH_SLOT!r},), '/'))")
+            if BASEPATH_SLOT not in variables:
+                variables.append(BASEPATH_SLOT)
+            position = match.end()
+            end = text.find('"', start)
+            if end == -1:
+                continue
+            url = text[start:end]
+            path, _, query = url.partition("?")
+            if query == FINGERPRINT_QUERY:
+                url = path
+                emit(f"_write({path[1:]!r})")
+                emit(f"_write(_fingerprint({path[1:]!r}))")
+                if path[1:] not in assets:
+                    assets.append(path[1:])
+                position = end
+            if url not in urls:
+                urls.append(url)
+        if position < len(text):
+            emit(f"_write({text[position:]!r})")
+
+    def open_block(keyword, line):
+        blocks.append((keyword, line))
+        has_body.append(False)
+
+    def close_body():
+        if not has_body[-1]:
+            emit("pass")
+        has_body.pop()
+
+    position = 0
+    for match in TOKEN_PATTERN.finditer(source):
+        line = source.count("\n", 0, match.start()) + 1
+        emit_text(source[position:match.start()])
+        position = match.end()
+
+        if match.group(1) is not None:
+            parts = _parse_name(match.group(1), line)
+            if parts[0] not in variables:
+                variables.append(parts[0])
+            emit(f"_write(_value({contexts[-1]}, {parts!r}, {match.group(0)!r}))")
+            continue
+
+        statement = match.group(2).strip()
+        keyword, _, rest = statement.partition(" ")
+        rest = rest.strip()
+
+        if keyword == "if":
+            negated, parts = _parse_condition(rest, line)
+            condition = f"_truthy({contexts[-1]}, {parts!r})"
+            emit(f"if {'not ' if negated else ''}{condition}:")
+            open_block("if", line)
+            contexts.append(contexts[-1])
+        elif keyword in ("elif", "else"):
+            if not blocks or blocks[-1][0] not in ("if", "elif"):
+                raise TemplateSyntaxError(f"Unexpected {keyword} on line {line}")
+            close_body()
+            blocks.pop()
+            contexts.pop()
+            if keyword == "elif":
+                negated, parts = _parse_condition(rest, line)
+                condition = f"_truthy({contexts[-1]}, {parts!r})"
+                emit(f"elif {'not ' if negated else ''}{condition}:")
+                open_block("elif", line)
+            else:
+                emit("else:")
+                open_block("else", line)
+            contexts.append(contexts[-1])
+        elif keyword == "endif":
+            if not blocks or blocks[-1][0] not in ("if", "elif", "else"):
+                raise TemplateSyntaxError(f"Unexpected endif on line {line}")
+            close_body()
+            blocks.pop()
+            contexts.pop()
+        elif keyword == "for":
+            words = rest.split()
+            if len(words) != 3 or words[1] != "in":
+                raise TemplateSyntaxError(f"Invalid for loop {statement!r} on line {line}")
+            target = _parse_name(words[0], line)
+            if len(target) != 1:
+                raise TemplateSyntaxError(f"Invalid loop variable {words[0]!r} on line {line}")
+            parts = _parse_name(words[2], line)
+            loop_count += 1
+            outer = contexts[-1]
+            inner = f"_ctx{loop_count}"
+            emit(f"{inner} = dict({outer})")
+            emit(f"for _item{loop_count} in _iterable({outer}, {parts!r}):")
+            open_block("for", line)
+            contexts.append(inner)
+            emit(f"{inner}[{target[0]!r}] = _item{loop_count}")
+        elif keyword == "endfor":
+            if not blocks or blocks[-1][0] != "for":
+                raise TemplateSyntaxError(f"Unexpected endfor on line {line}")
+            close_body()
+            blocks.pop()
+            contexts.pop()
+        elif keyword == "include":
+            if len(rest) < 2 or rest[0] not in "'\"" or rest[-1] != rest[0]:
+                raise TemplateSyntaxError(f"Include needs a quoted path on line {line}")
+            name = rest[1:-1]
+            includes.append(name)
+            emit(f"_include({name!r}, {contexts[-1]}, _write)")
+        else:
+            raise TemplateSyntaxError(f"Unknown statement {keyword!r} on line {line}")
+
+    emit_text(source[position:])
+
+    if blocks:
+        keyword, line = blocks[-1]
+        raise TemplateSyntaxError(f"Unclosed {keyword} opened on line {line}")
+
+    if not has_body[0]:
+        emit("pass")
+
+    lines.append(f"VARIABLES = {variables!r}")
+    lines.append(f"INCLUDES = {includes!r}")
+    lines.append(f"URLS = {urls!r}")
+    lines.append(f"ASSETS = {assets!r}")
+    return "\n".join(lines) + "\n"
+
+
+def compile_template(source, path=None):
+    """
+    Compile template text into a CompiledTemplate.
+
+    When a disk cache directory is configured, the code object is stored
+    there keyed by a hash of the source, so other processes and later builds
+    skip code generation and Python compilation entirely.
+    """
+    if _disk_cache_dir is None:
+        return CompiledTemplate(source, path)
+
+    key = template_hash(source)
+    cache_path = os.path.join(_disk_cache_dir, f"{key}.marshal")
+
+    code = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                code = marshal.load(f)
+        except (EOFError, ValueError, TypeError):
+            code = None
+
+    template = CompiledTemplate(source, path, code)
+
+    if code is None:
+        os.makedirs(_disk_cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump(template.code, f)
+        os.replace(tmp_path, cache_path)
+
+    return template
+
+
+def template_hash(source):
+    """Return the cache key for template source under this engine and Python."""
+    digest = hashlib.sha256()
+    digest.update(f"{ENGINE_VERSION}:{sys.implementation.cache_tag}:".encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def set_template_cache_dir(path):
+    """
+    Set the directory used to cache compiled templates on disk.
+
+    Args:
+        path: Directory path, or None to disable the disk cache
+    """
+    global _disk_cache_dir
+    _disk_cache_dir = path
+
+
+def get_template_cache_dir():
+    """Return the directory used to cache compiled templates, or None."""
+    return _disk_cache_dir
+
+
+def load_template(template_path):
+    """
+    Load and compile a template file, reusing the cached copy when possible.
+
+    The cache is keyed by absolute path and invalidated when the file's mtime
+    or size changes, so several templates can be cached side by side.
+
+    Args:
+        template_path: Path to the HTML template file
+
+    Returns:
+        CompiledTemplate for the file
+    """
+    abs_path = os.path.abspath(template_path)
+    stat = os.stat(abs_path)
+
+    cached = _template_cache.get(abs_path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(abs_path, 'r', encoding='utf-8') as f:
+        compiled = compile_template(f.read(), abs_path)
+
+    _template_cache[abs_path] = (stat.st_mtime_ns, stat.st_size, compiled)
+    return compiled
+
+
+def template_files(template_path, files=None):
+    """
+    Collect the absolute paths of a template and every partial it includes.
+
+    Args:
+        template_path: Path to the HTML template file
+        files: Optional set to add the paths to
+
+    Returns:
+        Set of paths; templates that do not exist are left out
+    """
+    if files is None:
+        files = set()
+    abs_path = os.path.abspath(template_path)
+    if abs_path in files or not os.path.exists(abs_path):
+        return files
+    files.add(abs_path)
+    template = load_template(abs_path)
+    for name in template.includes:
+        template_files(template.resolve_include(name), files)
+    return files
+
+
+def template_watch_files(template_path):
+    """
+    Return the template files to watch for changes while serving or rebuilding a site.
+
+    That is every .html file next to the default template, since front
+    matter can pick any of them, and every partial they include, wherever
+    it is. A file that does not compile is still watched, so fixing it is
+    noticed; only its includes are unknown until then.
+    """
+    template_dir = os.path.dirname(os.path.abspath(template_path))
+    files = set()
+    for name in os.listdir(template_dir):
+        path = os.path.join(template_dir, name)
+        if name.endswith(".html") and os.path.isfile(path):
+            try:
+                template_files(path, files)
+            except TemplateSyntaxError:
+                files.add(path)
+    return files
+
+
+def set_asset_dir(path):
+    """
+    Set the directory fingerprinted URLs are resolved against.
+
+    Args:
+        path: Static files directory, or None to write fingerprinted URLs
+            without a hash
+    """
+    global _asset_dir
+    _asset_dir = path
+
+
+def get_asset_dir():
+    """Return the directory fingerprinted URLs are resolved against, or None."""
+    return _asset_dir
+
+
+def asset_hash(path):
+    """
+    Return the sha256 hex digest of a file in the asset directory.
+
+    Args:
+        path: Path relative to the asset directory, such as "index.css"
+
+    Returns:
+        The digest, or None when no asset directory is set or the file is missing
+    """
+    if _asset_dir is None:
+        return None
+    abs_path = os.path.abspath(os.path.join(_asset_dir, path))
+    try:
+        stat = os.stat(abs_path)
+    except OSError:
+        return None
+
+    cached = _asset_hashes.get(abs_path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(abs_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    _asset_hashes[abs_path] = (stat.st_mtime_ns, stat.st_size, value)
+    return value
+
+
+def _fingerprint(path):
+    """Return the query written in place of "?fingerprint" for an asset."""
+    value = asset_hash(path)
+    return f"?v={value[:FINGERPRINT_LENGTH]}" if value else ""
+
+
+def clear_template_cache():
+    """Forget every compiled template held in memory."""
+    _template_cache.clear()
+
+
+def find_template(page_dir, content_dir, default_template_path, cache=None):
+    """
+    Find the template that applies to pages in a content directory.
+
+    A template.html inside the content tree overrides the default for its
+    directory and everything below it; the closest one wins.
+
+    Args:
+        page_dir: Directory containing the markdown file
+        content_dir: Root of the content tree
+        default_template_path: Template used when no override exists
+        cache: Optional dict reused across calls within one build; it maps
+            directories to their template so parents are only checked once
+
+    Returns:
+        Path to the template file to use
+    """
+    content_dir = os.path.abspath(content_dir)
+    current = os.path.abspath(page_dir)
+    visited = []
+    result = default_template_path
+
+    while True:
+        if cache is not None and current in cache:
+            result = cache[current]
+            break
+        visited.append(current)
+        candidate = os.path.join(current, TEMPLATE_FILENAME)
+        if os.path.isfile(candidate):
+            result = candidate
+            break
+        if current == content_dir or os.path.dirname(current) == current:
+            break
+        current = os.path.dirname(current)
+
+    if cache is not None:
+        for directory in visited:
+            cache[directory] = result
+    return result
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from async_build import BuildEvent, build
+
+
+class TestAsyncBuild(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Create a content tree and a template."""
+        self.test_dir = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+
+        with open(self.template_path, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+
+        for i in range(6):
+            page_dir = os.path.join(self.content_dir, f"dir{i % 2}")
+            os.makedirs(page_dir, exist_ok=True)
+            with open(os.path.join(page_dir, f"page{i}.md"), "w") as f:
+                f.write(f"# Page {i}\n\nBody [link](/dir0/page0)")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    async def test_build_yields_progress_and_writes_pages(self):
+        events = [event async for event in build(self.content_dir, self.template_path, self.dest_dir, "/s/")]
+
+        self.assertEqual(events[0], BuildEvent(BuildEvent.DISCOVERED, None, 0, 6))
+        self.assertEqual(events[-1], BuildEvent(BuildEvent.FINISHED, None, 6, 6))
+        page_events = [event for event in events if event.kind == BuildEvent.PAGE]
+        self.assertEqual([event.done for event in page_events], [1, 2, 3, 4, 5, 6])
+
+        with open(os.path.join(self.dest_dir, "dir1", "page3.html")) as f:
+            self.assertEqual(f.read(), '<title>Page 3</title><div><h1>Page 3</h1><p>Body <a href="/s/dir0/page0">link</a></p></div>')
+
+    async def test_build_does_not_block_event_loop(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker_task = asyncio.ensure_future(ticker())
+        try:
+            async for event in build(self.content_dir, self.template_path, self.dest_dir, concurrency=1):
+                pass
+        finally:
+            ticker_task.cancel()
+        self.assertGreater(ticks, 6)
+
+    async def test_leaving_the_loop_early_stops_the_build(self):
+        stream = build(self.content_dir, self.template_path, self.dest_dir, concurrency=1)
+        async for event in stream:
+            if event.kind == BuildEvent.PAGE:
+                break
+        await stream.aclose()
+
+        written = sum(len(files) for _, _, files in os.walk(self.dest_dir))
+        self.assertLess(written, 6)
+
+    async def test_cancelling_the_consumer(self):
+        async def consume():
+            async for event in build(self.content_dir, self.template_path, self.dest_dir, concurrency=1):
+                await asyncio.sleep(0.05)
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_render_errors_propagate(self):
+        with open(os.path.join(self.content_dir, "broken.md"), "w") as f:
+            f.write("no title")
+        with self.assertRaises(Exception) as context:
+            async for event in build(self.content_dir, self.template_path, self.dest_dir):
+                pass
+        self.assertIn("No h1 header found", str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from build_cache import (BuildCache, HTTPBackend, LocalDirBackend, cache_key, decode_entry,
+                         encode_entry)
+from incremental import build_site
+
+
+class StoreHandler(BaseHTTPRequestHandler):
+    """Stand-in for a shared cache server, keeping entries in a dict."""
+
+    def do_GET(self):
+        data = self.server.store.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        self.server.store[self.path] = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_DELETE(self):
+        self.server.store.pop(self.path, None)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestEntries(unittest.TestCase):
+
+    def test_cache_key_covers_every_input(self):
+        key = cache_key("md", "tpl", "/", "1")
+        self.assertEqual(key, cache_key("md", "tpl", "/", "1"))
+        self.assertNotEqual(key, cache_key("md2", "tpl", "/", "1"))
+        self.assertNotEqual(key, cache_key("md", "tpl2", "/", "1"))
+        self.assertNotEqual(key, cache_key("md", "tpl", "/site/", "1"))
+        self.assertNotEqual(key, cache_key("md", "tpl", "/", "2"))
+
+    def test_entry_roundtrip(self):
+        info = {"title": "Tom", "links": [("image", "/tom.png")], "words": 1}
+        html, decoded = decode_entry(encode_entry(b"<h1>Tom</h1>", dict(info, written=True)))
+        self.assertEqual(html, b"<h1>Tom</h1>")
+        self.assertEqual(decoded, info)
+
+    def test_damaged_entry_is_rejected(self):
+        data = encode_entry(b"<h1>Tom</h1>", {"title": "Tom", "links": []})
+        with self.assertRaises(ValueError):
+            decode_entry(data[:-1] + b"!")
+        with self.assertRaises(ValueError):
+            decode_entry(b"garbage")
+
+
+class TestLocalDirBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.backend = LocalDirBackend(os.path.join(self.test_dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_put_get_delete(self):
+        self.assertIsNone(self.backend.get("ab12"))
+        self.backend.put("ab12", b"data")
+        self.assertEqual(self.backend.get("ab12"), b"data")
+        self.backend.delete("ab12")
+        self.assertIsNone(self.backend.get("ab12"))
+
+    def test_collect_garbage_removes_least_recently_used(self):
+        for index, key in enumerate(["aa01", "bb02", "cc03"]):
+            self.backend.put(key, b"x" * 100)
+            path = os.path.join(self.backend.path, key[:2], key)
+            os.utime(path, ns=(index * 1_000_000_000, index * 1_000_000_000))
+        self.backend.get("aa01")
+
+        self.assertEqual(self.backend.collect_garbage(200), (1, 100))
+        self.assertIsNone(self.backend.get("bb02"))
+        self.assertEqual(sorted(key for key, _, _ in self.backend.entries()), ["aa01", "cc03"])
+
+
+class TestBuildCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StoreHandler)
+        self.server.store = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.remote = HTTPBackend(f"http://127.0.0.1:{self.server.server_address[1]}/cache")
+
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\n![logo](/logo.png)")
+        self.write(os.path.join(self.content_dir, "blog", "index.md"), "# Blog")
+        self.write(os.path.join(self.static_dir, "logo.png"), "png")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def make_cache(self, name, remote=True):
+        return BuildCache(LocalDirBackend(os.path.join(self.test_dir, name)),
+                          self.remote if remote else None)
+
+    def build(self, cache, dest="docs"):
+        dest_dir = os.path.join(self.test_dir, dest)
+        with redirect_stdout(io.StringIO()):
+            result = build_site(self.static_dir, self.content_dir, self.template_path,
+                                dest_dir, cache=cache)
+        cache.flush()
+        return result
+
+    def test_read_through_and_write_back(self):
+        first = self.make_cache("laptop")
+        self.build(first)
+        self.assertEqual((first.hits, first.misses), (0, 2))
+        self.assertEqual(len(self.server.store), 2)
+
+        # Another machine with an empty local cache gets every page remotely
+        second = self.make_cache("ci")
+        self.build(second, "docs-ci")
+        self.assertEqual((second.hits, second.remote_hits, second.misses), (2, 2, 0))
+        self.assertEqual(len(second.local.entries()), 2)
+
+        for rel_path in ["index.html", "blog/index.html"]:
+            with open(os.path.join(self.test_dir, "docs", rel_path)) as a, \
+                    open(os.path.join(self.test_dir, "docs-ci", rel_path)) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_cached_pages_keep_dependencies(self):
+        self.build(self.make_cache("one", remote=False))
+        cache = self.make_cache("one", remote=False)
+        self.build(cache, "docs2")
+        self.assertEqual(cache.hits, 2)
+        with redirect_stdout(io.StringIO()):
+            # Pages depend on the static files they link to existing
+            os.remove(os.path.join(self.static_dir, "logo.png"))
+            result = build_site(self.static_dir, self.content_dir, self.template_path,
+                                os.path.join(self.test_dir, "docs2"))
+        self.assertEqual(result.rendered, ["index.html"])
+
+    def test_changed_input_misses(self):
+        self.build(self.make_cache("one", remote=False))
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home again")
+        cache = self.make_cache("one", remote=False)
+        self.build(cache, "docs2")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_damaged_remote_entry_is_a_miss(self):
+        self.build(self.make_cache("laptop"))
+        for path in self.server.store:
+            self.server.store[path] = self.server.store[path][:-3]
+
+        cache = self.make_cache("ci")
+        with redirect_stdout(io.StringIO()):
+            self.build(cache, "docs-ci")
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_unreachable_remote_does_not_break_the_build(self):
+        cache = BuildCache(LocalDirBackend(os.path.join(self.test_dir, "local")),
+                           HTTPBackend("http://127.0.0.1:9/cache", timeout=0.5))
+        result = self.build(cache)
+        self.assertEqual(len(result.rendered), 2)
+        self.assertEqual(cache.misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import os
 import tempfile
 import shutil
-from copy_static import copy_files_recursive
+from copy_static import copy_files_recursive, sync_files_recursive
 
 
 class TestCopyStatic(unittest.TestCase):
@@ -80,6 +80,41 @@ class TestCopyStatic(unittest.TestCase):
         dest_file = os.path.join(self.dest_dir, "test.txt")
         self.assertTrue(os.path.exists(dest_file))
 
+    
+    def test_sync_files_recursive_copies_only_changes(self):
+        """Test that a second sync copies nothing and keeps other files."""
+        record, copied, removed = sync_files_recursive(self.source_dir, self.dest_dir)
+        self.assertEqual(sorted(copied), ["subdir/nested.txt", "test.txt"])
+        
+        other_file = os.path.join(self.dest_dir, "page.html")
+        with open(other_file, "w") as f:
+            f.write("generated")
+        
+        record, copied, removed = sync_files_recursive(self.source_dir, self.dest_dir, record)
+        self.assertEqual(copied, [])
+        self.assertTrue(os.path.exists(other_file))
+    
+    def test_sync_files_recursive_skips_identical_touched_files(self):
+        """Test that a touched file with the same bytes is not copied again."""
+        record, copied, removed = sync_files_recursive(self.source_dir, self.dest_dir)
+        source_file = os.path.join(self.source_dir, "test.txt")
+        stat = os.stat(source_file)
+        os.utime(source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        
+        record, copied, removed = sync_files_recursive(self.source_dir, self.dest_dir, record)
+        self.assertEqual(copied, [])
+        self.assertEqual(record["test.txt"][1], stat.st_mtime_ns + 1_000_000)
+    
+    def test_sync_files_recursive_removes_deleted_files(self):
+        """Test that files deleted from the source are deleted from the destination."""
+        record, copied, removed = sync_files_recursive(self.source_dir, self.dest_dir)
+        shutil.rmtree(os.path.join(self.source_dir, "subdir"))
+        
+        record, copied, removed = sync_files_recursive(self.source_dir, self.dest_dir, record)
+        self.assertEqual(removed, ["subdir/nested.txt"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "subdir")))
+        self.assertEqual(list(record), ["test.txt"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from depgraph import STATIC_PRESENT, DependencyGraph, DependencyResolver, dep_key, split_key, static_path
+
+
+class TestDependencyKeys(unittest.TestCase):
+
+    def test_dep_key_roundtrip(self):
+        key = dep_key("static", "images/tom.png")
+        self.assertEqual(key, "static:images/tom.png")
+        self.assertEqual(split_key(key), ("static", "images/tom.png"))
+
+    def test_static_path(self):
+        self.assertEqual(static_path("/images/tom.png?v=2#top"), "images/tom.png")
+        self.assertIsNone(static_path("https://example.com/a.png"))
+        self.assertIsNone(static_path("//cdn.example.com/a.png"))
+        self.assertIsNone(static_path("/"))
+
+
+class TestDependencyResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.write("template.html", '{% include "nav.html" %}<link href="/index.css">{{ Content }}')
+        self.write("nav.html", '<a href="/">Home</a><img src="/logo.png">')
+        self.write("content/index.md", "# Home")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.test_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_template_dependencies_include_partials(self):
+        resolver = DependencyResolver(os.path.join(self.test_dir, "content"), self.test_dir,
+                                      {"index.css": [7, 1], "logo.png": [3, 2]})
+        deps, urls = resolver.template_dependencies(os.path.join(self.test_dir, "template.html"))
+        self.assertEqual(sorted(deps), ["template:nav.html", "template:template.html"])
+        self.assertEqual(sorted(urls), ["/", "/index.css", "/logo.png"])
+
+        static = resolver.static_dependencies(urls)
+        # Only whether they exist, so edits and new mtimes change nothing
+        self.assertEqual(static, {"static:index.css": STATIC_PRESENT, "static:logo.png": STATIC_PRESENT})
+
+    def test_current_hash_of_missing_input_is_none(self):
+        resolver = DependencyResolver(os.path.join(self.test_dir, "content"), self.test_dir, {})
+        self.assertIsNotNone(resolver.current_hash("source:index.md"))
+        self.assertIsNone(resolver.current_hash("source:gone.md"))
+        self.assertIsNone(resolver.current_hash("static:gone.png"))
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = DependencyGraph({
+            "index.html": {"deps": {"source:index.md": "a", "template:template.html": "t",
+                                    "static:index.css": "c"}},
+            "blog/tom/index.html": {"deps": {"source:blog/tom/index.md": "b",
+                                             "template:template.html": "t",
+                                             "static:images/tom.png": "p"}},
+        })
+
+    def test_dependencies(self):
+        self.assertEqual(sorted(self.graph.dependencies("blog/tom/index.html")),
+                         ["source:blog/tom/index.md", "static:images/tom.png",
+                          "template:template.html"])
+        self.assertEqual(self.graph.dependencies("missing.html"), {})
+
+    def test_dependents_and_affected(self):
+        self.assertEqual(self.graph.dependents("template:template.html"),
+                         ["blog/tom/index.html", "index.html"])
+        self.assertEqual(self.graph.affected(["static:images/tom.png", "source:index.md"]),
+                         ["blog/tom/index.html", "index.html"])
+        self.assertEqual(self.graph.affected(["static:unused.png"]), [])
+
+    def test_why(self):
+        lines = self.graph.why("blog/tom/index.html")
+        self.assertEqual(lines[0], "blog/tom/index.html was built from:")
+        self.assertIn("  static:images/tom.png  (p)", lines)
+        self.assertEqual(self.graph.why("static:index.css"),
+                         ["Outputs that depend on static:index.css:", "  index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from devserver import DevServer, DevSite, PageCache
+from watcher import EVERYTHING
+
+
+class TestPageCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = PageCache(10)
+        cache.put("a", b"aaaa", ["a.md"])
+        cache.put("b", b"bbbb", ["b.md"])
+        cache.get("a")
+        cache.put("c", b"cccc", ["c.md"])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"aaaa")
+        self.assertEqual(cache.size, 8)
+
+    def test_oversized_page_is_not_cached(self):
+        cache = PageCache(3)
+        cache.put("a", b"aaaa", ["a.md"])
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_by_file(self):
+        cache = PageCache(100)
+        cache.put("a", b"a", ["a.md", "template.html"])
+        cache.put("b", b"b", ["b.md", "template.html"])
+        self.assertEqual(cache.invalidate(["a.md"]), ["a"])
+        self.assertEqual(cache.invalidate(["template.html"]), ["b"])
+        self.assertEqual(cache.size, 0)
+
+
+class DevSiteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(self.template_path, '<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+        self.write(os.path.join(self.content_dir, "blog", "tom", "index.md"), "# Tom")
+        self.write(os.path.join(self.static_dir, "index.css"), "body {}")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+class TestDevSite(DevSiteTestCase):
+
+    def test_lookup(self):
+        site = DevSite(self.content_dir, self.static_dir, self.template_path, "/site/")
+        tom = os.path.join(self.content_dir, "blog", "tom", "index.md")
+        self.assertEqual(site.lookup("/site/blog/tom/"), ("page", tom))
+        self.assertEqual(site.lookup("/site/blog/tom/index.html?x=1"), ("page", tom))
+        self.assertEqual(site.lookup("/site/blog/tom"), ("redirect", "/site/blog/tom/"))
+        self.assertEqual(site.lookup("/site/index.css"),
+                         ("static", os.path.join(self.static_dir, "index.css")))
+        self.assertEqual(site.lookup("/site/../template.html"), ("missing", None))
+        self.assertEqual(site.lookup("/blog/tom/"), ("missing", None))
+
+    def test_render_uses_cache_until_source_changes(self):
+        site = DevSite(self.content_dir, self.static_dir, self.template_path, "/site/")
+        path = os.path.join(self.content_dir, "index.md")
+        body = site.render(path)
+        self.assertIn(b'<link href="/site/index.css">', body)
+        self.assertIs(site.render(path), body)
+
+        self.write(path, "# Home again")
+        self.assertEqual(site.invalidate([path]), [path])
+        self.assertIn(b"Home again", site.render(path))
+
+    def test_template_change_drops_every_page(self):
+        site = DevSite(self.content_dir, self.static_dir, self.template_path)
+        site.render(os.path.join(self.content_dir, "index.md"))
+        site.render(os.path.join(self.content_dir, "blog", "tom", "index.md"))
+        self.assertEqual(len(site.invalidate([self.template_path])), 2)
+
+    def test_lost_changes_drop_every_page(self):
+        site = DevSite(self.content_dir, self.static_dir, self.template_path)
+        site.render(os.path.join(self.content_dir, "index.md"))
+        self.assertEqual(len(site.invalidate({EVERYTHING})), 1)
+
+
+class TestDevServer(DevSiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        site = DevSite(self.content_dir, self.static_dir, self.template_path)
+        self.server = DevServer(("127.0.0.1", 0), site, watch=False)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def get(self, path):
+        with urllib.request.urlopen(self.base_url + path) as response:
+            return response.headers["Content-Type"], response.read()
+
+    def test_serves_rendered_pages_and_static_files(self):
+        content_type, body = self.get("/blog/tom/")
+        self.assertEqual(content_type, "text/html; charset=utf-8")
+        self.assertIn(b"<title>Tom</title>", body)
+        self.assertEqual(self.get("/index.css"), ("text/css", b"body {}"))
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "docs")))
+
+    def test_missing_page_is_404(self):
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self.get("/nope/")
+        self.assertEqual(cm.exception.code, 404)
+
+    def test_change_is_served_after_invalidation(self):
+        self.get("/")
+        path = os.path.join(self.content_dir, "index.md")
+        self.write(path, "# Changed")
+        self.server.on_change([path])
+        self.assertIn(b"<title>Changed</title>", self.get("/")[1])
+
+
+    def test_pages_include_live_reload_client(self):
+        self.assertIn(b"new EventSource", self.get("/")[1])
+
+    def test_event_stream_sends_patch(self):
+        with urllib.request.urlopen(self.base_url + "/__sitegen/events?page=/") as response:
+            self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+            path = os.path.join(self.content_dir, "index.md")
+            self.write(path, "# Home\n\nMore")
+            self.server.on_change([path])
+            self.assertEqual(response.readline(), b"event: patch\n")
+            self.assertTrue(response.readline().startswith(b'data: [{"op": "insert"'))
+
+
+class FlakyWatcher:
+    """Watcher whose first poll fails, then reports one change."""
+
+    def __init__(self, path):
+        self.results = [RuntimeError("boom"), {path}]
+        self.closed = False
+
+    def poll(self, timeout=None):
+        if self.closed:
+            raise ValueError("watcher closed")
+        if not self.results:
+            threading.Event().wait(timeout or 0)
+            return set()
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def add_files(self, paths):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class TestDevServerWatcher(DevSiteTestCase):
+
+    def test_watcher_survives_errors_and_stops_on_close(self):
+        site = DevSite(self.content_dir, self.static_dir, self.template_path)
+        server = DevServer(("127.0.0.1", 0), site, watch=False, live_reload=False)
+        path = os.path.join(self.content_dir, "index.md")
+        server._watcher = FlakyWatcher(path)
+        seen = threading.Event()
+        server.on_change = lambda changed: seen.set() if changed == {path} else None
+
+        thread = threading.Thread(target=server._watch, daemon=True)
+        thread.start()
+        self.assertTrue(seen.wait(5))
+        server.server_close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from contextlib import redirect_stdout
+from feed import ATOM, ATOM_NAMESPACE, RSS, FeedSettings, absolute_urls, entry_hash, feed_output, write_feed
+from incremental import build_site, rebuild_changed
+from manifest import BuildManifest
+from page_index import PageRecord
+
+
+def record(output, title, date=None, summary=""):
+    return PageRecord(output, output[:-len(".html")] + ".md", "/" + output, title, date,
+                      "2024-01-01T00:00:00Z", 10, summary)
+
+
+class TestFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.entries = [
+            (record("blog/b.html", "B & co", "2024-05-02T10:30:00+02:00", "Second"),
+             '<a href="/blog/a.html">A</a>'),
+            (record("blog/a.html", "A", None, "First"), None),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, kind):
+        path = os.path.join(self.test_dir, feed_output("blog", kind))
+        written = write_feed(path, kind, "Blog", "https://example.com/blog/",
+                             "https://example.com/" + feed_output("blog", kind), self.entries,
+                             "https://example.com")
+        return written, ET.parse(path).getroot()
+
+    def test_settings(self):
+        settings = FeedSettings("https://example.com/", full=True, size=5)
+        self.assertEqual(settings.site_url, "https://example.com")
+        self.assertEqual(repr(settings), "FeedSettings(https://example.com, full, 5 entries)")
+        with self.assertRaises(ValueError):
+            FeedSettings("example.com")
+        with self.assertRaises(ValueError):
+            FeedSettings("https://example.com", size=0)
+
+    def test_feed_output(self):
+        self.assertEqual(feed_output("blog", RSS), "blog/feed.xml")
+        self.assertEqual(feed_output("", ATOM), "atom.xml")
+
+    def test_absolute_urls(self):
+        html = '<a href="/blog/">x</a><img src="/a.png"><a href="//cdn.example/">y</a><a href="rel/">z</a>'
+        self.assertEqual(absolute_urls(html, "https://example.com"),
+                         '<a href="https://example.com/blog/">x</a><img src="https://example.com/a.png">'
+                         '<a href="//cdn.example/">y</a><a href="rel/">z</a>')
+
+    def test_rss(self):
+        written, rss = self.write(RSS)
+        self.assertTrue(written)
+        self.assertEqual(rss.get("version"), "2.0")
+        channel = rss.find("channel")
+        self.assertEqual(channel.findtext("title"), "Blog")
+        self.assertEqual(channel.findtext("lastBuildDate"), "Thu, 02 May 2024 08:30:00 GMT")
+        self.assertEqual(channel.find(f"{{{ATOM_NAMESPACE}}}link").get("href"),
+                         "https://example.com/blog/feed.xml")
+        first, second = channel.findall("item")
+        self.assertEqual(first.findtext("title"), "B & co")
+        self.assertEqual(first.findtext("link"), "https://example.com/blog/b.html")
+        self.assertEqual(first.findtext("pubDate"), "Thu, 02 May 2024 08:30:00 GMT")
+        self.assertEqual(first.findtext("description"), '<a href="https://example.com/blog/a.html">A</a>')
+        self.assertIsNone(second.find("pubDate"))
+        self.assertEqual(second.findtext("description"), "First")
+        self.assertFalse(self.write(RSS)[0])
+
+    def test_atom(self):
+        _, feed = self.write(ATOM)
+        ns = {"a": ATOM_NAMESPACE}
+        self.assertEqual(feed.findtext("a:id", namespaces=ns), "https://example.com/blog/")
+        self.assertEqual(feed.findtext("a:updated", namespaces=ns), "2024-05-02T08:30:00Z")
+        first, second = feed.findall("a:entry", ns)
+        self.assertEqual(first.findtext("a:published", namespaces=ns), "2024-05-02T08:30:00Z")
+        self.assertEqual(first.find("a:content", ns).get("type"), "html")
+        self.assertIsNone(second.find("a:published", ns))
+        self.assertEqual(second.findtext("a:updated", namespaces=ns), "2024-01-01T00:00:00Z")
+        self.assertEqual(second.findtext("a:summary", namespaces=ns), "First")
+
+    def test_entry_hash(self):
+        page = record("blog/a.html", "A", "2024-05-01", "Hi")
+        self.assertEqual(entry_hash(page), entry_hash(page._replace(words=99)))
+        self.assertNotEqual(entry_hash(page), entry_hash(page, "1a2b3c"))
+        self.assertNotEqual(entry_hash(page), entry_hash(page._replace(title="B")))
+
+
+class TestFeedBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+        for number in range(5):
+            self.write(self.post(number),
+                       f"---\ndate: 2024-01-{number + 1:02}\n---\n# Post {number}\n\nAbout {number}.")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def post(self, number):
+        return os.path.join(self.content_dir, "blog", f"post-{number}.md")
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, feeds):
+        with redirect_stdout(io.StringIO()):
+            return build_site(self.static_dir, self.content_dir, self.template_path, self.dest_dir,
+                              "/site/", feeds=feeds)
+
+    def feeds_in(self, result):
+        return [output for output in result.generated if output.endswith(".xml")]
+
+    def test_feeds_need_settings(self):
+        self.build(None)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog", "feed.xml")))
+
+    def test_feed_holds_the_newest_pages(self):
+        result = self.build(FeedSettings("https://example.com", size=3))
+        self.assertEqual(self.feeds_in(result), ["blog/feed.xml", "blog/atom.xml"])
+        channel = ET.parse(os.path.join(self.dest_dir, "blog", "feed.xml")).getroot().find("channel")
+        self.assertEqual(channel.findtext("link"), "https://example.com/site/blog/")
+        self.assertEqual([item.findtext("link") for item in channel.findall("item")],
+                         ["https://example.com/site/blog/post-4.html", "https://example.com/site/blog/post-3.html",
+                          "https://example.com/site/blog/post-2.html"])
+        self.assertEqual(channel.find("item").findtext("description"), "About 4.")
+        entry = BuildManifest.load(self.dest_dir).pages["blog/feed.xml"]
+        self.assertEqual(sorted(entry["deps"]), ["page:blog/post-2.html", "page:blog/post-3.html",
+                                                 "page:blog/post-4.html"])
+
+    def test_summary_feeds_ignore_body_changes(self):
+        feeds = FeedSettings("https://example.com", size=3)
+        self.build(feeds)
+        self.write(self.post(4), "---\ndate: 2024-01-05\n---\n# Post 4\n\nAbout 4.\n\nMore text.")
+        self.assertEqual(self.build(feeds).rendered, ["blog/post-4.html"])
+
+        # Older than every entry in the feed
+        self.write(self.post(0), "---\ndate: 2024-01-01\n---\n# Post zero\n\nAbout 0.")
+        self.assertEqual(self.feeds_in(self.build(feeds)), [])
+
+        self.write(self.post(4), "---\ndate: 2024-01-05\n---\n# Post four\n\nAbout 4.")
+        with redirect_stdout(io.StringIO()):
+            result, _ = rebuild_changed([self.post(4)], self.static_dir, self.content_dir,
+                                        self.template_path, self.dest_dir, "/site/", feeds=feeds)
+        self.assertEqual(self.feeds_in(result), ["blog/feed.xml", "blog/atom.xml"])
+
+    def test_full_feeds_follow_body_changes(self):
+        feeds = FeedSettings("https://example.com", full=True)
+        self.build(feeds)
+        self.write(self.post(4), "---\ndate: 2024-01-05\n---\n# Post 4\n\nSee [home](/).")
+        self.assertEqual(self.feeds_in(self.build(feeds)), ["blog/feed.xml", "blog/atom.xml"])
+        atom = ET.parse(os.path.join(self.dest_dir, "blog", "atom.xml")).getroot()
+        content = atom.find(f"{{{ATOM_NAMESPACE}}}entry/{{{ATOM_NAMESPACE}}}content").text
+        self.assertIn('<a href="https://example.com/site/">home</a>', content)
+
+    def test_feeds_are_removed_without_settings(self):
+        self.build(FeedSettings("https://example.com"))
+        result = self.build(None)
+        self.assertEqual(sorted(result.generated_removed), ["blog/atom.xml", "blog/feed.xml"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog", "feed.xml")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "blog", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from front_matter import MAX_FRONT_MATTER_BYTES, page_template, read_front_matter, split_front_matter
+
+
+class TestFrontMatter(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "post.md")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, content):
+        with open(self.path, "w") as f:
+            f.write(content)
+
+    def test_split(self):
+        meta, body, lines = split_front_matter(
+            "---\n"
+            "date: 2024-05-01\n"
+            "tags: [tolkien, elves]\n"
+            "draft: false\n"
+            "# A comment\n"
+            "template: 'post.html'\n"
+            "---\n"
+            "# Title\n")
+        self.assertEqual(meta, {"date": "2024-05-01", "tags": ["tolkien", "elves"], "draft": False,
+                                "template": "post.html"})
+        self.assertEqual(body, "# Title\n")
+        self.assertEqual(lines, 7)
+
+    def test_without_front_matter(self):
+        self.assertEqual(split_front_matter("# Title\n---\n"), ({}, "# Title\n---\n", 0))
+        self.assertEqual(split_front_matter("----\n# Title"), ({}, "----\n# Title", 0))
+
+    def test_list_items_and_comma_separated_tags(self):
+        meta = split_front_matter("---\ntags:\n  - a\n  - b c\n...\n")[0]
+        self.assertEqual(meta["tags"], ["a", "b c"])
+        self.assertEqual(split_front_matter("---\ntags: a, b\n---\n")[0]["tags"], ["a", "b"])
+
+    def test_malformed_front_matter(self):
+        for text in ("---\ntitle: open\n# Title",
+                     "---\nno colon here\n---\n",
+                     "---\n- item\n---\n",
+                     "---\ndate: yesterday\n---\n",
+                     "---\ndraft: maybe\n---\n"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                split_front_matter(text, "post.md")
+
+    def test_error_names_file_and_line(self):
+        with self.assertRaisesRegex(ValueError, "post.md:3"):
+            split_front_matter("---\ndate: 2024-05-01\nbroken\n---\n", "post.md")
+
+    def test_read_matches_split(self):
+        text = "---\r\ndate: 2024-05-01T10:00:00Z\r\ndraft: yes\r\n---\r\n# Title\r\n"
+        with open(self.path, "w", newline="") as f:
+            f.write(text)
+        self.assertEqual(read_front_matter(self.path), {"date": "2024-05-01T10:00:00Z", "draft": True})
+
+    def test_read_stops_at_the_header(self):
+        # The body is not valid UTF-8, so reading it would fail
+        with open(self.path, "wb") as f:
+            f.write(b"---\ndraft: true\n---\n" + b"# Title\n" * 1024 + b"\xff\xfe" * 8192)
+        self.assertEqual(read_front_matter(self.path), {"draft": True})
+
+    def test_read_without_front_matter(self):
+        self.write("# Title\n")
+        self.assertEqual(read_front_matter(self.path), {})
+
+    def test_read_unclosed_front_matter(self):
+        self.write("---\n" + "key: value\n" * (MAX_FRONT_MATTER_BYTES // 10))
+        with self.assertRaises(ValueError):
+            read_front_matter(self.path)
+
+    def test_page_template(self):
+        default = os.path.join(self.test_dir, "template.html")
+        blog = os.path.join(self.test_dir, "content", "blog", "template.html")
+        self.assertEqual(page_template({}, blog, default), blog)
+        self.assertEqual(page_template({"template": "layouts/post.html"}, blog, default),
+                         os.path.join(self.test_dir, "layouts", "post.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
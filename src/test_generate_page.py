@@ -2,7 +2,11 @@ import unittest
 import os
 import tempfile
 import shutil
-from generate_page import generate_page, generate_pages_recursive
+import io
+from contextlib import redirect_stdout
+from generate_page import (generate_page, generate_pages, generate_pages_recursive, find_pages, page_output_path,
+                           page_values)
+from node_factory import NodeFactory
 from extract_title import extract_title
 
 
@@ -88,6 +92,64 @@ code block
         self.assertIn("<pre><code>", content)
         self.assertNotIn("{{ Content }}", content)
     
+    def test_generate_page_applies_basepath_to_urls_only(self):
+        """Test that basepath rewrites real URLs but not code samples."""
+        with open(self.markdown_path, 'w') as f:
+            f.write('# Links\n\nSee [home](/home).\n\n```\n<a href="/raw">\n```')
+        with open(self.template_path, 'w') as f:
+            f.write('<link href="/index.css"><title>{{ Title }}</title>{{ Content }}')
+        
+        generate_page(self.markdown_path, self.template_path, self.output_path, "/site/")
+        
+        with open(self.output_path, 'r') as f:
+            content = f.read()
+        
+        self.assertIn('<link href="/site/index.css">', content)
+        self.assertIn('<a href="/site/home">home</a>', content)
+        self.assertIn('<a href="/raw">', content)
+    
+    def test_generate_page_passes_extra_context(self):
+        """Test that extra context variables reach the template."""
+        with open(self.template_path, 'w') as f:
+            f.write('{{ Title }}{% for link in nav %}<a href="/{{ link.url }}">{{ link.label }}</a>{% endfor %}')
+        
+        nav = [{"url": "contact", "label": "Contact"}]
+        generate_page(self.markdown_path, self.template_path, self.output_path, "/", {"nav": nav})
+        
+        with open(self.output_path, 'r') as f:
+            self.assertEqual(f.read(), 'Test Page<a href="/contact">Contact</a>')
+    
+    def test_page_values_collects_title_and_links(self):
+        info = {}
+        page_values("# Tom\n\n[home](/) and ![tom](/images/tom.png)", "/site/", info=info)
+        self.assertEqual(info["title"], "Tom")
+        self.assertEqual(info["links"], [("link", "/"), ("image", "/images/tom.png")])
+        self.assertEqual(info["words"], 3)
+    
+    def test_page_values_counts_words_outside_code_blocks(self):
+        info = {}
+        page_values("# Tom Bombadil\n\nHey **dol**, merry `dol`!\n\n```\nnot counted here\n```", info=info)
+        self.assertEqual(info["words"], 6)
+        self.assertEqual(info["terms"], {"tom": 1, "bombadil": 1, "hey": 1, "dol": 2, "merry": 1})
+
+    def test_page_values_strips_front_matter(self):
+        info = {}
+        values = page_values("---\ndate: 2024-05-01\ntags: [hobbits]\n---\n# Tom\n\nHi.", info=info)
+        self.assertEqual(values["Content"], "<div><h1>Tom</h1><p>Hi.</p></div>")
+        self.assertEqual((info["title"], info["date"], info["tags"], info["words"]),
+                         ("Tom", "2024-05-01", ["hobbits"], 2))
+
+    def test_page_values_summary(self):
+        info = {}
+        page_values("# Tom\n\n[< Back](/)\n\n```\ncode\n```\n\nOld **Tom** ![x](/x.png)\nBombadil.\n\nMore.",
+                    info=info)
+        self.assertEqual(info["summary"], "Old Tom Bombadil.")
+        page_values("# Tom\n\n" + "word " * 100, info=info)
+        self.assertEqual(len(info["summary"]), 200)
+        self.assertTrue(info["summary"].endswith("word\u2026"))
+        page_values("---\nsummary: Short\n---\n# Tom\n\nLong.", info=info)
+        self.assertEqual(info["summary"], "Short")
+
     def test_generate_page_creates_directories(self):
         """Test that generate_page creates necessary directories."""
         nested_output = os.path.join(self.test_dir, "nested", "dir", "output.html")
@@ -165,6 +227,127 @@ code block
         html_file = os.path.join(dest_dir, "readme.html")
         self.assertFalse(os.path.exists(html_file))
 
+    def _write_site(self, content_dir, count):
+        """Create a small content tree with nested pages."""
+        for i in range(count):
+            page_dir = os.path.join(content_dir, f"section{i % 3}")
+            os.makedirs(page_dir, exist_ok=True)
+            with open(os.path.join(page_dir, f"page{i}.md"), 'w') as f:
+                f.write(f"# Page {i}\n\nBody of page {i} with a [link](/section0/page0).")
+    
+    def _read_tree(self, root):
+        """Return {relative path: contents} for every file under root."""
+        result = {}
+        for dirpath, dirs, files in os.walk(root):
+            for file in files:
+                path = os.path.join(dirpath, file)
+                with open(path, 'r') as f:
+                    result[os.path.relpath(path, root)] = f.read()
+        return result
+    
+    def test_find_pages_is_sorted(self):
+        """Test that page discovery order is deterministic."""
+        content_dir = os.path.join(self.test_dir, "content")
+        self._write_site(content_dir, 7)
+        
+        pages = find_pages(content_dir, self.template_path, "out")
+        markdown_paths = [page[0] for page in pages]
+        self.assertEqual(len(pages), 7)
+        self.assertEqual(markdown_paths, sorted(markdown_paths))
+    
+    def test_page_output_path_changes_only_the_extension(self):
+        """Test that ".md" inside directory names is left alone."""
+        self.assertEqual(page_output_path("blog/index.md"), "blog/index.html")
+        self.assertEqual(page_output_path("notes.md/intro.md"), "notes.md/intro.html")
+        self.assertEqual(page_output_path("a.mdx.md"), "a.mdx.html")
+    
+    def test_find_pages_keeps_directory_names(self):
+        """Test that a directory named like a markdown file maps to itself."""
+        content_dir = os.path.join(self.test_dir, "content")
+        os.makedirs(os.path.join(content_dir, "notes.md"))
+        with open(os.path.join(content_dir, "notes.md", "intro.md"), 'w') as f:
+            f.write("# Intro")
+        
+        pages = find_pages(content_dir, self.template_path, "out")
+        self.assertEqual(pages, [(os.path.join(content_dir, "notes.md", "intro.md"), self.template_path,
+                                  os.path.join("out", "notes.md", "intro.html"))])
+    
+    def test_find_pages_reads_front_matter(self):
+        """Test that drafts are skipped and a front matter template wins."""
+        content_dir = os.path.join(self.test_dir, "content")
+        os.makedirs(content_dir)
+        with open(os.path.join(content_dir, "draft.md"), 'w') as f:
+            f.write("---\ndraft: true\n---\n# Draft")
+        with open(os.path.join(content_dir, "post.md"), 'w') as f:
+            f.write("---\ntemplate: post.html\n---\n# Post")
+        
+        pages = find_pages(content_dir, self.template_path, "out")
+        self.assertEqual(pages, [(os.path.join(content_dir, "post.md"),
+                                  os.path.join(self.test_dir, "post.html"),
+                                  os.path.join("out", "post.html"))])
+        self.assertEqual(len(find_pages(content_dir, self.template_path, "out", drafts=True)), 2)
+    
+    def test_generate_pages_recursive_parallel_matches_serial(self):
+        """Test that a process pool produces the same files and log."""
+        content_dir = os.path.join(self.test_dir, "content")
+        self._write_site(content_dir, 9)
+        
+        logs = {}
+        trees = {}
+        for jobs in (1, 3):
+            dest_dir = os.path.join(self.test_dir, f"public{jobs}")
+            out = io.StringIO()
+            with redirect_stdout(out):
+                generate_pages_recursive(content_dir, self.template_path, dest_dir, "/site/", jobs=jobs)
+            logs[jobs] = out.getvalue().replace(dest_dir, "DEST")
+            trees[jobs] = self._read_tree(dest_dir)
+        
+        self.assertEqual(len(trees[1]), 9)
+        self.assertEqual(trees[1], trees[3])
+        self.assertEqual(logs[1], logs[3])
+        self.assertIn('href="/site/section0/page0"', trees[3][os.path.join("section1", "page1.html")])
+    
+    def test_generate_pages_with_factory_matches_plain_rendering(self):
+        """Test that sharing nodes between pages leaves the output unchanged."""
+        content_dir = os.path.join(self.test_dir, "content")
+        self._write_site(content_dir, 9)
+
+        trees = {}
+        for name, jobs, factory in (("plain", 1, None), ("shared", 1, NodeFactory()), ("pool", 3, NodeFactory())):
+            dest_dir = os.path.join(self.test_dir, name)
+            pages = find_pages(content_dir, self.template_path, dest_dir)
+            with redirect_stdout(io.StringIO()):
+                infos = generate_pages(pages, "/site/", jobs, factory)
+            self.assertEqual(len(infos), 9)
+            trees[name] = self._read_tree(dest_dir)
+            if name == "shared":
+                # Every page links to the same page
+                self.assertLess(factory.unique_nodes(), factory.requests)
+
+        self.assertEqual(trees["plain"], trees["shared"])
+        self.assertEqual(trees["plain"], trees["pool"])
+
+    def test_generate_pages_recursive_uses_directory_template(self):
+        """Test that a template.html in the content tree overrides the default."""
+        content_dir = os.path.join(self.test_dir, "content")
+        blog_dir = os.path.join(content_dir, "blog")
+        os.makedirs(blog_dir)
+        
+        with open(os.path.join(content_dir, "index.md"), 'w') as f:
+            f.write("# Home")
+        with open(os.path.join(blog_dir, "post.md"), 'w') as f:
+            f.write("# Post")
+        with open(os.path.join(blog_dir, "template.html"), 'w') as f:
+            f.write("<main class=\"blog\">{{ Title }}</main>")
+        
+        dest_dir = os.path.join(self.test_dir, "public")
+        generate_pages_recursive(content_dir, self.template_path, dest_dir)
+        
+        with open(os.path.join(dest_dir, "blog", "post.html"), 'r') as f:
+            self.assertEqual(f.read(), '<main class="blog">Post</main>')
+        with open(os.path.join(dest_dir, "index.html"), 'r') as f:
+            self.assertIn("<title>Home</title>", f.read())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,355 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from incremental import build_site, rebuild_changed
+from snapshot import SiteSnapshot
+from manifest import BuildManifest, MANIFEST_FILENAME, file_hash, template_fingerprint
+
+
+class IncrementalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """Create static files, content and a template."""
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+
+        os.makedirs(os.path.join(self.static_dir, "css"))
+        self.write(os.path.join(self.static_dir, "css", "site.css"), "body {}")
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+        self.write(os.path.join(self.content_dir, "blog", "tom", "index.md"), "# Tom")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, **kwargs):
+        return build_site(self.static_dir, self.content_dir, self.template_path,
+                          self.dest_dir, **kwargs)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.dest_dir, rel_path)) as f:
+            return f.read()
+
+
+class TestIncrementalBuild(IncrementalTestCase):
+
+    def test_first_build_renders_everything(self):
+        result = self.build()
+        # blog/ has no index.md, so it gets a generated listing
+        self.assertEqual(sorted(result.rendered), ["blog/tom/index.html", "index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+        self.assertEqual(result.static_copied, ["css/site.css"])
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, MANIFEST_FILENAME)))
+
+    def test_first_build_cleans_stale_output(self):
+        self.write(os.path.join(self.dest_dir, "old.html"), "stale")
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "old.html")))
+
+    def test_noop_rebuild_skips_everything(self):
+        self.build()
+        result = self.build()
+        self.assertEqual(result.rendered, [])
+        self.assertEqual(result.unchanged, 2)
+        self.assertEqual(result.generated_unchanged, 1)
+        self.assertEqual(result.static_copied, [])
+
+    def test_noop_rebuild_skips_generated_files(self):
+        self.build()
+        with mock.patch("incremental._update_generated", side_effect=AssertionError("not a no-op")):
+            result = self.build()
+        self.assertEqual(result.rendered, [])
+        self.assertEqual(BuildManifest.load(self.dest_dir).pages["blog/index.html"]["listing"], "blog")
+
+    def test_generated_files_follow_their_own_inputs(self):
+        self.write(os.path.join(self.content_dir, "blog", "tom", "template.html"), "<tom>{{ Content }}</tom>")
+        self.write(os.path.join(self.content_dir, "blog", "template.html"), "<blog>{{ Content }}</blog>")
+        self.build()
+
+        # Only the listing uses the blog template
+        self.write(os.path.join(self.content_dir, "blog", "template.html"), "<posts>{{ Content }}</posts>")
+        self.assertEqual(self.build().generated, ["blog/index.html"])
+        self.assertIn("<posts>", self.read("blog/index.html"))
+
+        os.remove(os.path.join(self.dest_dir, "blog", "index.html"))
+        self.assertEqual(self.build().generated, ["blog/index.html"])
+
+    def test_changed_source_rebuilds_only_that_page(self):
+        self.build()
+        self.write(os.path.join(self.content_dir, "blog", "tom", "index.md"), "# Tom Bombadil")
+        result = self.build()
+        # The new title shows in the blog listing too
+        self.assertEqual(result.rendered, ["blog/tom/index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+        with open(os.path.join(self.dest_dir, "blog", "tom", "index.html")) as f:
+            self.assertIn("Tom Bombadil", f.read())
+
+    def test_changed_template_or_basepath_rebuilds_everything(self):
+        self.build()
+        self.assertEqual(len(self.build(basepath="/site/").rendered), 2)
+
+        self.write(self.template_path, "<h1>{{ Title }}</h1>{{ Content }}")
+        stat = os.stat(self.template_path)
+        os.utime(self.template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(len(self.build(basepath="/site/").rendered), 2)
+
+    def test_static_file_rebuilds_linking_pages_only_when_deleted(self):
+        self.write(os.path.join(self.static_dir, "tom.png"), "png")
+        self.write(os.path.join(self.content_dir, "blog", "tom", "index.md"),
+                   "# Tom\n\n![Tom](/tom.png)")
+        self.build()
+
+        # The page holds a link to the image, not its bytes
+        self.write(os.path.join(self.static_dir, "tom.png"), "new png")
+        result = self.build()
+        self.assertEqual(result.static_copied, ["tom.png"])
+        self.assertEqual(result.rendered, [])
+
+        os.remove(os.path.join(self.static_dir, "tom.png"))
+        result = self.build()
+        self.assertEqual(result.static_removed, ["tom.png"])
+        self.assertEqual(result.rendered, ["blog/tom/index.html"])
+
+    def test_fingerprinted_static_file_rebuilds_pages_using_it(self):
+        self.write(os.path.join(self.content_dir, "blog", "tom", "template.html"),
+                   '<link href="/css/site.css?fingerprint">{{ Content }}')
+        self.build()
+        first = self.read("blog/tom/index.html")
+        self.assertRegex(first, r'href="/css/site.css\?v=[0-9a-f]{12}"')
+
+        self.write(os.path.join(self.static_dir, "css", "site.css"), "body { color: red }")
+        result = self.build()
+        self.assertEqual(result.rendered, ["blog/tom/index.html"])
+        self.assertNotEqual(self.read("blog/tom/index.html"), first)
+
+    def test_manifest_records_dependencies(self):
+        self.write(self.template_path, '<link href="/css/site.css">{{ Content }}')
+        self.build()
+        deps = BuildManifest.load(self.dest_dir).pages["blog/tom/index.html"]["deps"]
+        self.assertEqual(sorted(deps), ["source:blog/tom/index.md", "static:css/site.css",
+                                        "template:template.html"])
+
+    def test_missing_output_is_rebuilt(self):
+        self.build()
+        os.remove(os.path.join(self.dest_dir, "index.html"))
+        self.assertEqual(self.build().rendered, ["index.html"])
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        shutil.rmtree(os.path.join(self.content_dir, "blog"))
+        result = self.build()
+        self.assertEqual(result.removed, ["blog/tom/index.html"])
+        self.assertEqual(result.generated_removed, ["blog/index.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog")))
+
+        manifest = BuildManifest.load(self.dest_dir)
+        self.assertEqual(list(manifest.pages), ["index.html"])
+
+    def test_deleted_static_file_is_removed(self):
+        self.build()
+        os.remove(os.path.join(self.static_dir, "css", "site.css"))
+        result = self.build()
+        self.assertEqual(result.static_removed, ["css/site.css"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "css")))
+
+    def test_full_build_ignores_manifest(self):
+        self.build()
+        self.assertEqual(len(self.build(full=True).rendered), 2)
+
+    def test_full_build_does_not_rewrite_identical_files(self):
+        self.build()
+        index_path = os.path.join(self.dest_dir, "index.html")
+        os.utime(index_path, ns=(1_000_000_000, 1_000_000_000))
+        self.write(os.path.join(self.dest_dir, "old.html"), "stale")
+
+        result = self.build(full=True)
+        self.assertEqual(sorted(result.identical), ["blog/index.html", "blog/tom/index.html", "index.html"])
+        self.assertEqual(result.pruned, ["old.html"])
+        self.assertEqual(result.file_counts(), (0, 4, 1))
+        self.assertEqual(os.stat(index_path).st_mtime_ns, 1_000_000_000)
+
+    def test_shared_nodes_render_the_same_bytes(self):
+        self.write(os.path.join(self.content_dir, "blog", "ann", "index.md"), "# Ann\n\n- [Home](/)\n- [Home](/)")
+        self.build(share_nodes=True)
+        for kwargs in ({}, {"share_nodes": True, "pipeline": {}}):
+            result = self.build(full=True, **kwargs)
+            self.assertEqual(sorted(result.identical), sorted(result.rendered + result.generated))
+
+    def test_file_counts(self):
+        result = self.build()
+        self.assertEqual(result.file_counts(), (4, 0, 0))
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home again")
+        os.remove(os.path.join(self.static_dir, "css", "site.css"))
+        self.assertEqual(self.build().file_counts(), (1, 2, 1))
+
+
+class TestRebuildChanged(IncrementalTestCase):
+
+    def rebuild(self, *paths):
+        result, manifest = rebuild_changed(paths, self.static_dir, self.content_dir,
+                                           self.template_path, self.dest_dir)
+        self.assertEqual(manifest.pages, BuildManifest.load(self.dest_dir).pages)
+        return result
+
+    def test_changed_source(self):
+        self.build()
+        path = os.path.join(self.content_dir, "blog", "tom", "index.md")
+        self.write(path, "# Tom Bombadil")
+        result = self.rebuild(path)
+        self.assertEqual(result.rendered, ["blog/tom/index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+        self.assertIn("Tom Bombadil", self.read("blog/tom/index.html"))
+
+    def test_added_and_deleted_sources(self):
+        self.build()
+        added = os.path.join(self.content_dir, "contact", "index.md")
+        self.write(added, "# Contact")
+        deleted = os.path.join(self.content_dir, "blog", "tom", "index.md")
+        os.remove(deleted)
+
+        result = self.rebuild(added, deleted)
+        self.assertEqual(result.rendered, ["contact/index.html"])
+        self.assertEqual(result.removed, ["blog/tom/index.html"])
+        self.assertEqual(result.generated_removed, ["blog/index.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog")))
+
+    def test_changed_template_rebuilds_dependents(self):
+        self.build()
+        self.write(self.template_path, "<main>{{ Content }}</main>")
+        result = self.rebuild(self.template_path)
+        self.assertEqual(sorted(result.rendered), ["blog/tom/index.html", "index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+        self.assertIn("<main>", self.read("index.html"))
+
+    def test_changed_static_file(self):
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\n![logo](/css/site.css)")
+        self.build()
+        path = os.path.join(self.static_dir, "css", "site.css")
+        self.write(path, "body { color: red }")
+        result = self.rebuild(path)
+        self.assertEqual(result.static_copied, ["css/site.css"])
+        self.assertEqual(result.rendered, [])
+        self.assertEqual(self.read("css/site.css"), "body { color: red }")
+
+        os.remove(path)
+        result = self.rebuild(path)
+        self.assertEqual(result.static_removed, ["css/site.css"])
+        self.assertEqual(result.rendered, ["index.html"])
+
+    def test_changed_fingerprinted_static_file(self):
+        self.write(self.template_path, '<link href="/css/site.css?fingerprint">{{ Content }}')
+        self.build()
+        path = os.path.join(self.static_dir, "css", "site.css")
+        self.write(path, "body { color: red }")
+        result = self.rebuild(path)
+        self.assertEqual(sorted(result.rendered), ["blog/tom/index.html", "index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+
+    def test_new_directory_template_falls_back_to_full_build(self):
+        self.build()
+        path = os.path.join(self.content_dir, "blog", "template.html")
+        self.write(path, "<blog>{{ Content }}</blog>")
+        result = self.rebuild(path)
+        self.assertEqual(result.rendered, ["blog/tom/index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+        self.assertIn("<blog>", self.read("blog/tom/index.html"))
+
+    def test_deleted_directory_falls_back_to_full_build(self):
+        self.build()
+        shutil.rmtree(os.path.join(self.content_dir, "blog"))
+        result = self.rebuild(os.path.join(self.content_dir, "blog"))
+        self.assertEqual(result.removed, ["blog/tom/index.html"])
+        self.assertEqual(result.generated_removed, ["blog/index.html"])
+
+    def test_kept_snapshot_is_updated_before_full_build(self):
+        snapshot = SiteSnapshot(self.static_dir, self.content_dir)
+        self.build(snapshot=snapshot)
+        self.write(os.path.join(self.content_dir, "about", "template.html"), "<about>{{ Content }}</about>")
+        added = os.path.join(self.content_dir, "about", "index.md")
+        self.write(added, "# About")
+
+        result, _ = rebuild_changed([os.path.join(self.content_dir, "about", "template.html"), added],
+                                    self.static_dir, self.content_dir, self.template_path,
+                                    self.dest_dir, snapshot=snapshot)
+        self.assertEqual(result.rendered, ["about/index.html"])
+        self.assertEqual(self.read("about/index.html"), "<about><div><h1>About</h1></div></about>")
+
+    def test_front_matter_draft_and_template(self):
+        self.build()
+        tom = os.path.join(self.content_dir, "blog", "tom", "index.md")
+        self.write(tom, "---\ndraft: true\n---\n# Tom")
+        result, _ = rebuild_changed([tom], self.static_dir, self.content_dir, self.template_path,
+                                    self.dest_dir)
+        self.assertEqual(result.removed, ["blog/tom/index.html"])
+        self.assertEqual(result.generated_removed, ["blog/index.html"])
+
+        self.write(os.path.join(self.test_dir, "post.html"), "<article>{{ Title }}</article>")
+        self.write(tom, "---\ntemplate: post.html\n---\n# Tom")
+        result, _ = rebuild_changed([tom], self.static_dir, self.content_dir, self.template_path,
+                                    self.dest_dir)
+        self.assertEqual(result.rendered, ["blog/tom/index.html"])
+        self.assertEqual(result.generated, ["blog/index.html"])
+        with open(os.path.join(self.dest_dir, "blog", "tom", "index.html")) as f:
+            self.assertEqual(f.read(), "<article>Tom</article>")
+        self.assertEqual(self.build().rendered, [])
+
+    def test_unrelated_file_does_nothing(self):
+        self.build()
+        result = self.rebuild(os.path.join(self.test_dir, "notes.txt"))
+        self.assertEqual(result.rendered, [])
+        self.assertEqual(result.unchanged, 2)
+        self.assertEqual(result.generated_unchanged, 1)
+
+
+class TestManifestHelpers(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_manifest_roundtrip(self):
+        manifest = BuildManifest(os.path.join(self.test_dir, MANIFEST_FILENAME))
+        manifest.pages["index.html"] = {"source": "index.md"}
+        manifest.save()
+        loaded = BuildManifest.load(self.test_dir)
+        self.assertEqual(loaded.pages, manifest.pages)
+
+    def test_corrupt_manifest_is_ignored(self):
+        with open(os.path.join(self.test_dir, MANIFEST_FILENAME), "w") as f:
+            f.write("{not json")
+        self.assertIsNone(BuildManifest.load(self.test_dir))
+
+    def test_file_hash(self):
+        path = os.path.join(self.test_dir, "a.md")
+        with open(path, "w") as f:
+            f.write("abc")
+        self.assertEqual(file_hash(path), "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad")
+
+    def test_template_fingerprint_covers_partials(self):
+        template_path = os.path.join(self.test_dir, "template.html")
+        partial_path = os.path.join(self.test_dir, "nav.html")
+        with open(template_path, "w") as f:
+            f.write('{% include "nav.html" %}{{ Content }}')
+        with open(partial_path, "w") as f:
+            f.write("<nav>one</nav>")
+        before = template_fingerprint(template_path)
+
+        with open(partial_path, "w") as f:
+            f.write("<nav>two!</nav>")
+        self.assertNotEqual(template_fingerprint(template_path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
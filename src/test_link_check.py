@@ -0,0 +1,104 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+from incremental import build_site
+from link_check import BrokenLink, check_links, find_broken_links, link_target
+
+
+class TestLinkCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_link_target(self):
+        self.assertEqual(link_target("/images/tom.png?v=2#top", "index.html"), "images/tom.png")
+        self.assertEqual(link_target("ann.html", "blog/tom.html"), "blog/ann.html")
+        self.assertEqual(link_target("../images/a%20b.png", "blog/tom.html"), "images/a b.png")
+        self.assertEqual(link_target("../../x.png", "blog/tom.html"), "x.png")
+        self.assertEqual(link_target("/", "blog/tom.html"), "index.html")
+        self.assertEqual(link_target("./", "blog/tom.html"), "blog/index.html")
+        self.assertEqual(link_target("/blog/", "index.html"), "blog/index.html")
+        self.assertEqual(link_target("ann/", "blog/tom.html"), "blog/ann/index.html")
+        self.assertEqual(link_target("/blog//./tom.html", "index.html"), "blog/tom.html")
+        for url in ("https://example.com/x.png", "//cdn.example.com/x.js", "mailto:tom@example.com", "#top"):
+            self.assertIsNone(link_target(url, "index.html"))
+
+    def test_find_broken_links(self):
+        links = [("index.html", "link", "/blog/tom"),
+                 ("index.html", "link", "/blog"),
+                 ("index.html", "image", "/images/missing.png"),
+                 ("blog/tom.html", "link", "ann.html"),
+                 ("blog/tom.html", "link", "https://example.com/missing"),
+                 ("tom.html", "link", "ann.html")]
+        targets = {"index.html", "blog/index.html", "blog/tom.html", "blog/ann.html"}
+        self.assertEqual(list(find_broken_links(links, targets)),
+                         [("index.html", "image", "/images/missing.png"), ("tom.html", "link", "ann.html")])
+
+    def test_check_links_finds_lines(self):
+        with open(os.path.join(self.test_dir, "tom.md"), "w") as f:
+            f.write("---\ntitle: Tom\n---\n# Tom\n\n[Ann](/ann) and ![x](/x.png)\n\n[Ann again](/ann)\n")
+        links = [("tom.html", "link", "/ann"), ("tom.html", "image", "/x.png"), ("tom.html", "link", "/ann"),
+                 ("gone.html", "link", "/gone")]
+        self.assertEqual(check_links(links, {"tom.html", "x.png"}, lambda output: output[:-len(".html")] + ".md",
+                                     self.test_dir),
+                         [BrokenLink("gone.md", None, "link", "/gone"), BrokenLink("tom.md", 6, "link", "/ann"),
+                          BrokenLink("tom.md", 8, "link", "/ann")])
+
+
+class TestLinkCheckBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("static/images/tom.png", "png")
+        self.write("content/index.md", "# Home\n\n[Tom](/blog/tom) and [the blog](/blog/)")
+        self.write("content/blog/tom.md", "# Tom\n\n![Tom](/images/tom.png)\n\n![Ann](/images/ann.png)")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.test_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            result = build_site(self.static_dir, self.content_dir, self.template_path, self.dest_dir, "/site/")
+        return result, output.getvalue()
+
+    def test_build_reports_broken_links(self):
+        result, output = self.build()
+        self.assertEqual(result.broken_links, [BrokenLink("blog/tom.md", 5, "image", "/images/ann.png")])
+        self.assertIn(f"Warning: broken image in {os.path.join(self.content_dir, 'blog', 'tom.md')}:5: "
+                      f"/images/ann.png", output)
+
+        # A build that changes nothing reports what the last check found
+        with mock.patch("incremental.check_links", side_effect=AssertionError("not a no-op")):
+            again, output = self.build()
+        self.assertEqual(again.broken_links, result.broken_links)
+        self.assertIn("Warning: broken image", output)
+
+        # Pages are checked again against what the site holds now, even
+        # when nothing is rendered
+        self.write("static/images/ann.png", "png")
+        result, _ = self.build()
+        self.assertEqual(result.rendered, [])
+        self.assertEqual(result.broken_links, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
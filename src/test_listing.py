@@ -0,0 +1,151 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from incremental import build_site, rebuild_changed
+from listing import PAGE_SIZE, find_listings, listing_output, listing_values, paginate, record_hash
+from manifest import BuildManifest
+from page_index import PageRecord
+
+
+def record(source, title, date=None, summary=""):
+    output = source[:-len(".md")] + ".html"
+    return PageRecord(output, source, "/" + output, title, date, "2024-01-01T00:00:00Z", 10, summary)
+
+
+class TestListing(unittest.TestCase):
+
+    def test_find_listings(self):
+        listings = find_listings([
+            record("index.md", "Home"),
+            record("blog/tom/index.md", "Tom", "2023-05-01"),
+            record("blog/ann/index.md", "Ann", "2023-06-01"),
+            record("blog/undated.md", "Undated"),
+            record("blog/tom/notes.md", "Notes"),
+            record("docs/index.md", "Docs"),
+            record("docs/setup.md", "Setup"),
+        ])
+        # The root and docs/ have their own index.md
+        self.assertEqual(list(listings), ["blog"])
+        self.assertEqual([page.title for page in listings["blog"]], ["Ann", "Tom", "Undated"])
+
+    def test_listing_output(self):
+        self.assertEqual(listing_output("blog", 1), "blog/index.html")
+        self.assertEqual(listing_output("blog", 3), "blog/page/3/index.html")
+        self.assertEqual(listing_output("", 2), "page/2/index.html")
+
+    def test_paginate(self):
+        self.assertEqual(paginate(list(range(5)), 2), [[0, 1], [2, 3], [4]])
+        self.assertEqual(paginate([], 2), [])
+
+    def test_listing_values(self):
+        pages = [record("blog/a.md", "A <b>", "2024-05-01T10:00:00Z", "Hi & bye")]
+        values = listing_values("blog-posts", 2, False, pages, "/site/")
+        self.assertEqual(values["Title"], "Blog posts, page 2")
+        self.assertEqual(values["newer"], "/site/blog-posts/")
+        self.assertEqual(values["older"], "/site/blog-posts/page/3/")
+        self.assertIn('<li><a href="/blog/a.html">A &lt;b&gt;</a> '
+                      '<time datetime="2024-05-01T10:00:00Z">2024-05-01</time><p>Hi &amp; bye</p></li>',
+                      values["Content"])
+        self.assertIn('<nav class="pagination"><a href="/site/blog-posts/" rel="prev">Newer</a> '
+                      '<a href="/site/blog-posts/page/3/" rel="next">Older</a></nav>', values["Content"])
+        self.assertNotIn("<nav", listing_values("blog", 1, True, pages)["Content"])
+
+    def test_record_hash_covers_listed_facts_only(self):
+        page = record("blog/a.md", "A", "2024-05-01", "Hi")
+        self.assertEqual(record_hash(page), record_hash(page._replace(words=99, modified="later")))
+        self.assertNotEqual(record_hash(page), record_hash(page._replace(title="B")))
+        self.assertNotEqual(record_hash(page), record_hash(page._replace(summary="Bye")))
+
+
+class TestListingBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+        # Post 24 is the newest, so it is first on the first listing page
+        for number in range(PAGE_SIZE * 2 + 5):
+            self.write(self.post(number),
+                       f"---\ndate: 2024-01-{number + 1:02}\n---\n# Post {number}\n\nAbout {number}.")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def post(self, number):
+        return os.path.join(self.content_dir, "blog", f"post-{number}.md")
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.dest_dir, rel_path)) as f:
+            return f.read()
+
+    def build(self):
+        with redirect_stdout(io.StringIO()):
+            return build_site(self.static_dir, self.content_dir, self.template_path, self.dest_dir)
+
+    def test_listing_pages(self):
+        result = self.build()
+        self.assertEqual(result.generated, ["blog/index.html", "blog/page/2/index.html", "blog/page/3/index.html"])
+        first = self.read("blog/index.html")
+        self.assertTrue(first.startswith("<title>Blog</title>"))
+        self.assertLess(first.index("Post 24"), first.index("Post 15"))
+        self.assertNotIn("Post 14<", first)
+        self.assertIn("<p>About 24.</p>", first)
+        self.assertIn('<a href="/blog/page/2/" rel="next">Older</a>', first)
+        self.assertIn("Post 0<", self.read("blog/page/3/index.html"))
+
+        deps = BuildManifest.load(self.dest_dir).pages["blog/page/3/index.html"]["deps"]
+        self.assertEqual(sorted(deps), ["page:blog/post-0.html", "page:blog/post-1.html",
+                                        "page:blog/post-2.html", "page:blog/post-3.html",
+                                        "page:blog/post-4.html", "template:template.html"])
+
+    def test_only_listing_pages_showing_a_change_are_rebuilt(self):
+        self.build()
+        self.write(self.post(3), "---\ndate: 2024-01-04\n---\n# Post 3\n\nAbout 3.\n\nMore text.")
+        result = self.build()
+        self.assertEqual((result.rendered, result.generated), (["blog/post-3.html"], []))
+
+        self.write(self.post(3), "---\ndate: 2024-01-04\n---\n# Post three\n\nAbout 3.")
+        result = self.build()
+        self.assertEqual((result.rendered, result.generated), (["blog/post-3.html"], ["blog/page/3/index.html"]))
+        self.assertIn("Post three", self.read("blog/page/3/index.html"))
+
+        self.write(self.post(20), "---\ndate: 2024-01-21\n---\n# Post twenty\n\nAbout 20.")
+        with redirect_stdout(io.StringIO()):
+            result, _ = rebuild_changed([self.post(20)], self.static_dir, self.content_dir,
+                                        self.template_path, self.dest_dir)
+        self.assertEqual((result.rendered, result.generated), (["blog/post-20.html"], ["blog/index.html"]))
+
+    def test_deleted_posts_shrink_the_listing(self):
+        self.build()
+        for number in range(PAGE_SIZE + 5):
+            os.remove(self.post(number))
+        result = self.build()
+        self.assertIn("blog/page/2/index.html", result.generated_removed)
+        self.assertIn("blog/page/3/index.html", result.generated_removed)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog", "page")))
+        self.assertNotIn("rel=\"next\"", self.read("blog/index.html"))
+
+    def test_index_md_replaces_the_listing(self):
+        self.build()
+        self.write(os.path.join(self.content_dir, "blog", "index.md"), "# My blog")
+        result = self.build()
+        self.assertIn("blog/index.html", result.rendered)
+        self.assertEqual(self.read("blog/index.html"), "<title>My blog</title><div><h1>My blog</h1></div>")
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog", "page")))
+        self.assertEqual(self.build().rendered, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from block_markdown import markdown_to_html_node
+from devserver import DevSite
+from livereload import LiveReload, block_patch, inject_script
+from watcher import EVERYTHING
+
+
+def apply_patch(blocks, patch):
+    """Apply a patch the way the browser client does, to a list of block HTML."""
+    blocks = list(blocks)
+    for op in patch:
+        if op["op"] == "replace":
+            blocks[op["index"]] = op["html"]
+        elif op["op"] == "insert":
+            blocks.insert(op["index"], op["html"])
+        else:
+            del blocks[op["index"]]
+    return blocks
+
+
+class TestBlockPatch(unittest.TestCase):
+
+    def check(self, old_markdown, new_markdown):
+        old = markdown_to_html_node(old_markdown)
+        new = markdown_to_html_node(new_markdown)
+        patch = block_patch(old, new)
+        self.assertEqual(apply_patch([child.to_html() for child in old.children], patch),
+                         [child.to_html() for child in new.children])
+        return patch
+
+    def test_identical_content_has_empty_patch(self):
+        self.assertEqual(self.check("# Title\n\nText", "# Title\n\nText"), [])
+
+    def test_changed_inline_text_replaces_only_its_block(self):
+        patch = self.check("# Title\n\nOne **bold**\n\nTwo", "# Title\n\nOne **bolder**\n\nTwo")
+        self.assertEqual(patch, [{"op": "replace", "index": 1, "html": "<p>One <b>bolder</b></p>"}])
+
+    def test_inserted_and_deleted_blocks(self):
+        self.check("# Title\n\nOne\n\nTwo", "# Title\n\nOne\n\nNew\n\nTwo")
+        self.check("# Title\n\nOne\n\nTwo\n\nThree", "# Title\n\nThree")
+        self.check("# Title\n\n- a\n- b\n\nEnd", "# Title\n\n- a\n- c\n- d\n\nMiddle\n\nEnd")
+
+    def test_inject_script(self):
+        body = inject_script(b"<html><body><p>x</p></body></html>")
+        self.assertTrue(body.startswith(b"<html><body><p>x</p><script>"))
+        self.assertTrue(body.endswith(b"</script>\n</body></html>"))
+
+
+class TestLiveReload(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.page_path = os.path.join(self.content_dir, "index.md")
+        self.write(self.template_path, "<title>{{ Title }}</title><article>{{ Content }}</article>")
+        self.write(self.page_path, "# Home\n\nFirst\n\nSecond")
+        self.site = DevSite(self.content_dir, self.static_dir, self.template_path)
+        self.live = LiveReload(self.site)
+        self.events = self.live.subscribe(self.page_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def change(self, path, content):
+        self.write(path, content)
+        self.site.invalidate([path])
+        return self.live.notify([path])
+
+    def test_content_change_sends_patch(self):
+        self.assertEqual(self.change(self.page_path, "# Home\n\nFirst\n\nSecond _edit_"),
+                         {self.page_path: "patch"})
+        name, data = self.events.get_nowait()
+        self.assertEqual(name, "patch")
+        self.assertEqual(json.loads(data), [{"op": "replace", "index": 2,
+                                             "html": "<p>Second <i>edit</i></p>"}])
+
+    def test_title_or_template_change_sends_reload(self):
+        self.assertEqual(self.change(self.page_path, "# New home\n\nFirst\n\nSecond"),
+                         {self.page_path: "reload"})
+        self.assertEqual(self.change(self.template_path, "<main>{{ Content }}</main>"),
+                         {self.page_path: "reload"})
+
+    def test_static_change_sends_reload(self):
+        path = os.path.join(self.static_dir, "index.css")
+        self.assertEqual(self.change(path, "body {}"), {self.page_path: "reload"})
+
+    def test_lost_changes_send_reload(self):
+        self.assertEqual(self.live.notify({EVERYTHING}), {self.page_path: "reload"})
+
+    def test_unrelated_change_sends_nothing(self):
+        other = os.path.join(self.content_dir, "other.md")
+        self.assertEqual(self.change(other, "# Other"), {})
+
+    def test_unsubscribed_pages_are_forgotten(self):
+        self.live.unsubscribe(self.page_path, self.events)
+        self.assertEqual(self.change(self.page_path, "# Home\n\nChanged"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
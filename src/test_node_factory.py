@@ -0,0 +1,104 @@
+import unittest
+from textnode import TextNode, TextType
+from text_to_html import text_node_to_html_node
+from block_markdown import markdown_to_html_node
+from node_factory import NodeFactory, SharedLeafNode, SharedParentNode
+
+
+class TestNodeFactory(unittest.TestCase):
+
+    def test_equal_leaves_are_shared(self):
+        factory = NodeFactory()
+        a = factory.leaf("code", "x = 1")
+        b = factory.leaf("code", "x = 1")
+        self.assertIs(a, b)
+        self.assertIsInstance(a, SharedLeafNode)
+        self.assertEqual(factory.requests, 2)
+        self.assertEqual(factory.unique_nodes(), 1)
+
+    def test_props_distinguish_leaves(self):
+        factory = NodeFactory()
+        a = factory.leaf("a", "link", {"href": "/one"})
+        b = factory.leaf("a", "link", {"href": "/two"})
+        self.assertIsNot(a, b)
+
+    def test_equal_parents_are_shared(self):
+        factory = NodeFactory()
+        a = factory.parent("li", [factory.leaf(None, "item")])
+        b = factory.parent("li", [factory.leaf(None, "item")])
+        self.assertIs(a, b)
+        self.assertIsInstance(a, SharedParentNode)
+
+    def test_shared_nodes_are_immutable(self):
+        factory = NodeFactory()
+        node = factory.leaf("b", "bold")
+        with self.assertRaises(AttributeError):
+            node.value = "changed"
+
+    def test_shared_props_are_read_only(self):
+        factory = NodeFactory()
+        props = {"href": "/a"}
+        node = factory.leaf("a", "link", props)
+        props["href"] = "/b"
+        self.assertEqual(node.to_html(), '<a href="/a">link</a>')
+        with self.assertRaises(TypeError):
+            node.props["href"] = "/c"
+        self.assertIs(factory.leaf("a", "link", {"href": "/a"}), node)
+
+    def test_shared_nodes_cache_html(self):
+        factory = NodeFactory()
+        node = factory.parent("p", [factory.leaf(None, "Hello, "), factory.leaf("b", "world")])
+        self.assertEqual(node.to_html(), "<p>Hello, <b>world</b></p>")
+        self.assertEqual(node._html, "<p>Hello, <b>world</b></p>")
+
+    def test_text_node_to_html_node_uses_factory(self):
+        factory = NodeFactory()
+        text_node = TextNode("alt", TextType.IMAGE, "/img.png")
+        a = text_node_to_html_node(text_node, factory)
+        b = text_node_to_html_node(TextNode("alt", TextType.IMAGE, "/img.png"), factory)
+        self.assertIs(a, b)
+        self.assertEqual(a.to_html(), '<img src="/img.png" alt="alt"></img>')
+
+    def test_markdown_output_is_unchanged_with_factory(self):
+        md = "# Title\n\n- same\n- same\n- other\n\n```\ncode\n```\n\n> quote with `code`"
+        factory = NodeFactory()
+        shared = markdown_to_html_node(md, factory)
+        self.assertEqual(shared.to_html(), markdown_to_html_node(md).to_html())
+        ul = shared.children[1]
+        self.assertIs(ul.children[0], ul.children[1])
+
+    def test_factory_shares_across_documents(self):
+        factory = NodeFactory()
+        first = markdown_to_html_node("Shared paragraph\n\nOne", factory)
+        second = markdown_to_html_node("Shared paragraph\n\nTwo", factory)
+        self.assertIs(first.children[0], second.children[0])
+
+    def test_least_recently_used_nodes_are_forgotten(self):
+        factory = NodeFactory(max_nodes=2)
+        first = factory.leaf("i", "a")
+        factory.leaf("i", "b")
+        self.assertIs(factory.leaf("i", "a"), first)
+        factory.leaf("i", "c")
+        self.assertEqual(factory.unique_nodes(), 2)
+        self.assertIs(factory.leaf("i", "a"), first)
+        self.assertEqual(factory.leaf("i", "b").to_html(), "<i>b</i>")
+
+    def test_parent_of_forgotten_child_is_not_reused(self):
+        factory = NodeFactory(max_nodes=2)
+        child = factory.leaf("b", "x")
+        parent = factory.parent("p", [child])
+        factory.leaf("i", "y")
+        other = factory.parent("p", [factory.leaf("b", "x")])
+        self.assertIsNot(other, parent)
+        self.assertEqual(other.to_html(), parent.to_html())
+
+    def test_clear_resets_factory(self):
+        factory = NodeFactory()
+        factory.leaf("i", "x")
+        factory.clear()
+        self.assertEqual(factory.unique_nodes(), 0)
+        self.assertEqual(factory.requests, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
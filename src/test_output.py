@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+from output import OutputWriter, write_bytes_if_changed, write_if_changed
+
+
+class TestOutputWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "page.html")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def write_chunks(self, *chunks):
+        with OutputWriter(self.path) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return f.changed
+
+    def test_creates_missing_file(self):
+        self.assertTrue(self.write_chunks("<p>", "hi", "</p>"))
+        self.assertEqual(self.read(), "<p>hi</p>")
+
+    def test_creates_missing_empty_file(self):
+        self.assertTrue(self.write_chunks())
+        self.assertEqual(self.read(), "")
+
+    def test_identical_content_is_not_rewritten(self):
+        self.write_chunks("<p>hi</p>")
+        os.utime(self.path, ns=(1_000_000_000, 1_000_000_000))
+
+        self.assertFalse(self.write_chunks("<p>", "hi", "</p>"))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 1_000_000_000)
+
+    def test_changed_suffix_is_rewritten(self):
+        self.write_chunks("<p>hello world</p>")
+        self.assertTrue(self.write_chunks("<p>hello", " there</p>"))
+        self.assertEqual(self.read(), "<p>hello there</p>")
+
+    def test_shorter_content_truncates(self):
+        self.write_chunks("<p>hello world</p>")
+        self.assertTrue(self.write_chunks("<p>hello"))
+        self.assertEqual(self.read(), "<p>hello")
+
+    def test_longer_content_appends(self):
+        self.write_chunks("<p>hello")
+        self.assertTrue(self.write_chunks("<p>hello", " world</p>"))
+        self.assertEqual(self.read(), "<p>hello world</p>")
+
+    def test_changed_file_replaces_hardlink_instead_of_writing_through(self):
+        self.write_chunks("old")
+        link_path = os.path.join(self.test_dir, "link.html")
+        os.link(self.path, link_path)
+
+        self.write_chunks("new")
+        self.assertEqual(self.read(), "new")
+        with open(link_path) as f:
+            self.assertEqual(f.read(), "old")
+
+    def test_error_keeps_old_file_and_removes_temp_file(self):
+        self.write_chunks("old")
+        with self.assertRaises(RuntimeError):
+            with OutputWriter(self.path) as f:
+                f.write("new")
+                raise RuntimeError("render failed")
+        self.assertEqual(self.read(), "old")
+        self.assertEqual(os.listdir(self.test_dir), ["page.html"])
+
+    def test_write_if_changed(self):
+        path = os.path.join(self.test_dir, "a", "b.html")
+        self.assertTrue(write_if_changed(path, "é"))
+        self.assertFalse(write_if_changed(path, "é"))
+        self.assertTrue(write_if_changed(path, "e"))
+
+    def test_write_bytes_if_changed(self):
+        path = os.path.join(self.test_dir, "a", "b.gz")
+        self.assertTrue(write_bytes_if_changed(path, b"\x1f\x8b"))
+        self.assertFalse(write_bytes_if_changed(path, b"\x1f\x8b"))
+        self.assertTrue(write_bytes_if_changed(path, b"\x1f"))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b"\x1f")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from incremental import build_site, rebuild_changed
+from page_index import INDEX_FILENAME, PageIndex
+
+
+class TestPageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, INDEX_FILENAME)
+        self.index = PageIndex(self.path)
+        # 2024-01-01, 2024-01-02 and 2024-01-03 at midnight UTC
+        day = 86400 * 1_000_000_000
+        self.index.put("index.html", "index.md", "/", "Home", 10, [("link", "/blog/tom/")], 19723 * day)
+        self.index.put("blog/tom/index.html", "blog/tom/index.md", "/blog/tom/", "Tom", 300,
+                       [("image", "/images/tom.png"), ("link", "/")], 19724 * day, "2023-05-01")
+        self.index.put("blog/ann/index.html", "blog/ann/index.md", "/blog/ann/", "Ann", 120,
+                       [("link", "/")], 19725 * day, "2023-06-01")
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.test_dir)
+
+    def outputs(self, records):
+        return [record.output for record in records]
+
+    def test_page(self):
+        record = self.index.page("blog/tom/index.html")
+        self.assertEqual(record.title, "Tom")
+        self.assertEqual(record.url, "/blog/tom/")
+        self.assertEqual(record.date, "2023-05-01")
+        self.assertEqual(record.modified, "2024-01-02T00:00:00Z")
+        self.assertEqual(record.words, 300)
+        self.assertIsNone(self.index.page("missing.html"))
+
+    def test_pages_sorting_and_paging(self):
+        self.assertEqual(self.outputs(self.index.pages()),
+                         ["blog/ann/index.html", "blog/tom/index.html", "index.html"])
+        self.assertEqual(self.outputs(self.index.pages(prefix="blog/", order_by="date", descending=True)),
+                         ["blog/ann/index.html", "blog/tom/index.html"])
+        self.assertEqual(self.outputs(self.index.pages(order_by="words", limit=1, offset=1)),
+                         ["blog/ann/index.html"])
+        self.assertEqual(self.index.count("blog/"), 2)
+        with self.assertRaises(ValueError):
+            self.index.pages(order_by="title; DROP TABLE pages")
+
+    def test_links(self):
+        self.assertEqual(self.index.links_from("blog/tom/index.html"),
+                         [("image", "/images/tom.png"), ("link", "/")])
+        self.assertEqual(self.index.links_to("/"), ["blog/ann/index.html", "blog/tom/index.html"])
+        self.assertEqual(sorted(self.index.all_links()),
+                         [("blog/ann/index.html", "link", "/"), ("blog/tom/index.html", "image", "/images/tom.png"),
+                          ("blog/tom/index.html", "link", "/"), ("index.html", "link", "/blog/tom/")])
+
+        self.index.put("blog/tom/index.html", "blog/tom/index.md", "/blog/tom/", "Tom", 3, [], 0)
+        self.assertEqual(self.index.links_from("blog/tom/index.html"), [])
+        self.assertEqual(self.index.links_to("/"), ["blog/ann/index.html"])
+
+    def test_content_hash(self):
+        self.assertIsNone(self.index.content_hash("blog/tom/index.html"))
+        self.index.put("blog/tom/index.html", "blog/tom/index.md", "/blog/tom/", "Tom", 3, [], 0,
+                       content_hash="1a2b3c")
+        self.assertEqual(self.index.content_hash("blog/tom/index.html"), "1a2b3c")
+        self.index.remove("blog/tom/index.html")
+        self.assertIsNone(self.index.content_hash("blog/tom/index.html"))
+
+    def test_exception_rolls_back_uncommitted_rows(self):
+        self.index.close()
+        with self.assertRaises(RuntimeError):
+            with PageIndex(self.path) as index:
+                index.remove("index.html")
+                raise RuntimeError("build failed")
+        self.index = PageIndex(self.path)
+        self.assertIsNotNone(self.index.page("index.html"))
+
+    def test_terms(self):
+        self.assertEqual(list(self.index.terms()), [])
+        self.index.put("blog/tom/index.html", "blog/tom/index.md", "/blog/tom/", "Tom", 3, [], 0,
+                       terms={"old": 1, "tom": 2})
+        self.assertEqual([(record.title, terms) for record, terms in self.index.terms()],
+                         [("Tom", {"old": 1, "tom": 2})])
+        self.index.remove("blog/tom/index.html")
+        self.assertEqual(list(self.index.terms()), [])
+
+    def test_changed(self):
+        self.assertTrue(self.index.changed)
+        self.index.close()
+        self.index = PageIndex(self.path)
+        self.assertFalse(self.index.changed)
+        self.assertEqual(self.index.retain(self.index.outputs()), 0)
+        self.assertFalse(self.index.changed)
+        self.index.remove("index.html")
+        self.assertTrue(self.index.changed)
+
+    def test_remove_and_retain(self):
+        self.index.remove("index.html")
+        self.assertEqual(self.index.retain(["blog/tom/index.html"]), 1)
+        self.assertEqual(self.index.outputs(), {"blog/tom/index.html"})
+        self.assertEqual(self.index.links_to("/"), ["blog/tom/index.html"])
+
+    def test_rows_survive_reopening(self):
+        self.index.close()
+        self.index = PageIndex(self.path)
+        self.assertEqual(self.index.count(), 3)
+
+    def test_other_schema_version_starts_empty(self):
+        self.index.close()
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA user_version = 999")
+        db.close()
+        self.index = PageIndex(self.path)
+        self.assertEqual(self.index.count(), 0)
+
+    def test_damaged_index_starts_empty(self):
+        self.index.close()
+        with open(self.path, "wb") as f:
+            f.write(b"not a database" * 100)
+        with redirect_stdout(io.StringIO()):
+            self.index = PageIndex(self.path)
+        self.assertEqual(self.index.count(), 0)
+
+    def test_hardlinked_index_is_copied_before_writing(self):
+        self.index.close()
+        linked = os.path.join(self.test_dir, "staged.sqlite")
+        os.link(self.path, linked)
+        with PageIndex(linked) as staged:
+            staged.remove("index.html")
+        self.index = PageIndex(self.path)
+        self.assertEqual(self.index.count(), 3)
+
+
+class TestBuildIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nSee [Tom](/blog/tom/).")
+        self.write(os.path.join(self.content_dir, "blog", "tom", "index.md"), "# Tom\n\nOld Tom Bombadil.")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self):
+        with redirect_stdout(io.StringIO()):
+            return build_site(self.static_dir, self.content_dir, self.template_path, self.dest_dir,
+                              "/site/")
+
+    def test_build_fills_the_index(self):
+        self.build()
+        with PageIndex.open(self.dest_dir) as index:
+            self.assertEqual(index.outputs(), {"index.html", "blog/tom/index.html"})
+            tom = index.page("blog/tom/index.html")
+            self.assertEqual((tom.title, tom.url, tom.source, tom.words),
+                             ("Tom", "/site/blog/tom/", "blog/tom/index.md", 4))
+            self.assertEqual(index.links_to("/blog/tom/"), ["index.html"])
+
+    def test_incremental_builds_update_the_index(self):
+        self.build()
+        self.write(os.path.join(self.content_dir, "blog", "tom", "index.md"), "# Tom\n\nJust Tom.")
+        os.remove(os.path.join(self.content_dir, "index.md"))
+        self.build()
+        with PageIndex.open(self.dest_dir) as index:
+            self.assertEqual(index.outputs(), {"blog/tom/index.html"})
+            self.assertEqual(index.page("blog/tom/index.html").words, 3)
+
+    def test_lost_index_is_filled_again(self):
+        self.build()
+        os.remove(os.path.join(self.dest_dir, INDEX_FILENAME))
+        result = self.build()
+        self.assertEqual(len(result.rendered), 2)
+        self.assertEqual(result.identical, result.rendered)
+        with PageIndex.open(self.dest_dir) as index:
+            self.assertEqual(index.count(), 2)
+        self.assertEqual(self.build().rendered, [])
+
+    def test_rebuild_changed_updates_the_index(self):
+        self.build()
+        added = os.path.join(self.content_dir, "blog", "ann", "index.md")
+        self.write(added, "# Ann")
+        deleted = os.path.join(self.content_dir, "index.md")
+        os.remove(deleted)
+        with redirect_stdout(io.StringIO()):
+            rebuild_changed([added, deleted], self.static_dir, self.content_dir, self.template_path,
+                            self.dest_dir, "/site/")
+        with PageIndex.open(self.dest_dir) as index:
+            self.assertEqual(index.outputs(), {"blog/ann/index.html", "blog/tom/index.html"})
+            self.assertEqual(index.page("blog/ann/index.html").url, "/site/blog/ann/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from generate_page import generate_pages_recursive, find_pages
+from incremental import build_site
+from manifest import BuildManifest
+from pipeline import run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        """Create a content tree and a template."""
+        self.test_dir = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+
+        with open(self.template_path, "w") as f:
+            f.write('<title>{{ Title }}</title><link href="/index.css">{{ Content }}')
+
+        for i in range(12):
+            page_dir = os.path.join(self.content_dir, f"dir{i % 4}")
+            os.makedirs(page_dir, exist_ok=True)
+            with open(os.path.join(page_dir, f"page{i}.md"), "w") as f:
+                f.write(f"# Page {i}\n\nSome **text** and a [link](/dir0/page0).")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def read_tree(self, root):
+        result = {}
+        for dirpath, dirs, files in os.walk(root):
+            for file in files:
+                path = os.path.join(dirpath, file)
+                with open(path, "r") as f:
+                    result[os.path.relpath(path, root)] = f.read()
+        return result
+
+    def test_pipeline_matches_serial_build(self):
+        serial_dir = os.path.join(self.test_dir, "serial")
+        generate_pages_recursive(self.content_dir, self.template_path, serial_dir, "/site/")
+
+        pipeline_dir = os.path.join(self.test_dir, "pipeline")
+        pages = find_pages(self.content_dir, self.template_path, pipeline_dir)
+        run_pipeline(pages, "/site/", readers=3, renderers=2, writers=2,
+                     read_queue_depth=2, write_queue_depth=1)
+
+        self.assertEqual(self.read_tree(serial_dir), self.read_tree(pipeline_dir))
+
+    def test_pipeline_reports_stage_stats(self):
+        pages = find_pages(self.content_dir, self.template_path, os.path.join(self.test_dir, "out"))
+        stats = run_pipeline(pages)
+
+        self.assertEqual([stage.name for stage in stats.stages()], ["read", "render", "write"])
+        for stage in stats.stages():
+            self.assertEqual(stage.items, 12)
+            self.assertGreaterEqual(stage.waited_input, 0.0)
+            self.assertGreaterEqual(stage.waited_output, 0.0)
+        self.assertIn("render", stats.report())
+
+    def test_pipeline_collects_infos_and_keeps_identical_files(self):
+        pages = find_pages(self.content_dir, self.template_path, os.path.join(self.test_dir, "out"))
+        infos = []
+        run_pipeline(pages, infos=infos)
+        self.assertEqual([info["title"] for info in infos],
+                         [f"Page {os.path.basename(page[0])[4:-3]}" for page in pages])
+        self.assertTrue(all(info["written"] for info in infos))
+        self.assertEqual(infos[0]["links"], [("link", "/dir0/page0")])
+
+        os.utime(pages[0][2], ns=(0, 0))
+        infos = []
+        run_pipeline(pages, infos=infos)
+        self.assertFalse(any(info["written"] for info in infos))
+        self.assertEqual(os.stat(pages[0][2]).st_mtime_ns, 0)
+
+    def test_pipeline_replaces_hardlinked_files(self):
+        # A staging directory seeded with hardlinks to the live site
+        live_dir = os.path.join(self.test_dir, "live")
+        run_pipeline(find_pages(self.content_dir, self.template_path, live_dir))
+        staging_dir = os.path.join(self.test_dir, "staging")
+        shutil.copytree(live_dir, staging_dir, copy_function=os.link)
+
+        with open(os.path.join(self.content_dir, "dir1", "page1.md"), "w") as f:
+            f.write("# Page one")
+        run_pipeline(find_pages(self.content_dir, self.template_path, staging_dir))
+        with open(os.path.join(live_dir, "dir1", "page1.html")) as f:
+            self.assertIn("Page 1", f.read())
+        with open(os.path.join(staging_dir, "dir1", "page1.html")) as f:
+            self.assertIn("Page one", f.read())
+        self.assertEqual(sorted(os.listdir(os.path.join(staging_dir, "dir1"))), ["page1.html", "page5.html",
+                                                                                 "page9.html"])
+
+    def test_build_site_with_pipeline(self):
+        dest_dir = os.path.join(self.test_dir, "docs")
+        static_dir = os.path.join(self.test_dir, "static")
+        with redirect_stdout(io.StringIO()):
+            result = build_site(static_dir, self.content_dir, self.template_path, dest_dir, "/site/",
+                                pipeline={"write_queue_depth": 1})
+        # Twelve pages and a listing page for each of the four directories
+        self.assertEqual((len(result.rendered), len(result.generated)), (12, 4))
+        self.assertEqual(result.pipeline_stats.write.items, 12)
+        self.assertEqual(len(BuildManifest.load(dest_dir).pages), 16)
+
+        with open(os.path.join(self.content_dir, "dir1", "page1.md"), "w") as f:
+            f.write("# Page one")
+        with redirect_stdout(io.StringIO()):
+            result = build_site(static_dir, self.content_dir, self.template_path, dest_dir, "/site/",
+                                pipeline={})
+        self.assertEqual((result.rendered, result.generated), (["dir1/page1.html"], ["dir1/index.html"]))
+        self.assertEqual(result.pipeline_stats.write.items, 1)
+
+    def test_pipeline_raises_render_errors(self):
+        with open(os.path.join(self.content_dir, "dir0", "broken.md"), "w") as f:
+            f.write("no title here")
+        pages = find_pages(self.content_dir, self.template_path, os.path.join(self.test_dir, "out"))
+
+        with self.assertRaises(Exception) as context:
+            run_pipeline(pages, read_queue_depth=1, write_queue_depth=1)
+        self.assertIn("No h1 header found", str(context.exception))
+
+    def test_pipeline_rejects_empty_stage(self):
+        with self.assertRaises(ValueError):
+            run_pipeline([], writers=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from incremental import build_site, rebuild_changed
+from page_index import PageRecord
+from search import (MAX_TERM_LENGTH, PAGES_FILENAME, SEARCH_DIR, SEARCH_INDEX_FILENAME, SEARCH_SCRIPT_FILENAME,
+                    SearchSettings, page_id, shard_filename, shard_for, term_frequencies, write_search_index)
+
+
+def record(output, title):
+    return PageRecord(output, output[:-len(".html")] + ".md", "/" + output, title, None,
+                      "2024-01-01T00:00:00Z", 10, "")
+
+
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def load(self, name):
+        path = os.path.join(self.test_dir, SEARCH_DIR, name)
+        if name.endswith(".gz"):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_settings(self):
+        self.assertEqual(repr(SearchSettings(1024)), "SearchSettings(1024 bytes per shard)")
+        with self.assertRaises(ValueError):
+            SearchSettings(0)
+
+    def test_term_frequencies(self):
+        self.assertEqual(term_frequencies("Old Tom Bombadil is a merry fellow; TOM!"),
+                         {"old": 1, "tom": 2, "bombadil": 1, "is": 1, "a": 1, "merry": 1, "fellow": 1})
+        self.assertEqual(term_frequencies("Éowyn and x" + "y" * MAX_TERM_LENGTH), {"éowyn": 1, "and": 1})
+
+    def test_page_id_and_shard_filename(self):
+        self.assertEqual(page_id("blog/tom.html"), page_id("blog/tom.html"))
+        self.assertNotEqual(page_id("blog/tom.html"), page_id("blog/ann.html"))
+        self.assertEqual(shard_filename("ca"), "t-ca.json.gz")
+        self.assertEqual(shard_filename("é"), "x-c3a9.json.gz")
+        self.assertEqual(shard_filename("_"), "x-5f.json.gz")
+
+    def test_write_search_index(self):
+        pages = [(record("a.html", "A"), {"tom": 2, "tree": 1}),
+                 (record("b.html", "B"), {"tom": 1, "ann": 1})]
+        written = write_search_index(self.test_dir, pages)
+        self.assertEqual([name for name, _ in written],
+                         ["search/index.json", "search/search.js", "search/pages.json.gz",
+                          "search/t-a.json.gz", "search/t-t.json.gz"])
+        self.assertTrue(all(changed for _, changed in written))
+        index = self.load(SEARCH_INDEX_FILENAME)
+        self.assertEqual(index["shards"], {"a": "t-a.json.gz", "t": "t-t.json.gz"})
+        self.assertEqual(self.load(PAGES_FILENAME), {page_id("a.html"): ["/a.html", "A"],
+                                                     page_id("b.html"): ["/b.html", "B"]})
+        self.assertEqual(self.load("t-t.json.gz"), {"tom": [[page_id("a.html"), 2], [page_id("b.html"), 1]],
+                                                     "tree": [[page_id("a.html"), 1]]})
+        self.assertFalse(any(changed for _, changed in write_search_index(self.test_dir, pages)))
+
+    def test_shards_split_to_fit_the_budget(self):
+        terms = {"t": 1, "ta": 1, "tb": 1, "tba": 1, "tbb": 1}
+        pages = [(record(f"p{number}.html", "P"), terms) for number in range(50)]
+        write_search_index(self.test_dir, pages, shard_budget=200)
+        shards = self.load(SEARCH_INDEX_FILENAME)["shards"]
+        self.assertEqual(sorted(shards), ["t", "ta", "tb", "tba", "tbb"])
+        self.assertEqual(list(self.load(shards["t"])), ["t"])
+        self.assertEqual(list(self.load(shards["tb"])), ["tb"])
+
+    def test_shard_for_uses_the_longest_prefix(self):
+        shards = {"t": "t-t.json.gz", "tb": "t-tb.json.gz", "é": "x-c3a9.json.gz"}
+        self.assertEqual(shard_for(shards, "tom"), "t-t.json.gz")
+        self.assertEqual(shard_for(shards, "tb"), "t-tb.json.gz")
+        self.assertEqual(shard_for(shards, "tbb"), "t-tb.json.gz")
+        self.assertEqual(shard_for(shards, "éowyn"), "x-c3a9.json.gz")
+        self.assertIsNone(shard_for(shards, "ann"))
+
+        terms = {"t": 1, "ta": 1, "tb": 1, "tba": 1, "tbb": 1, "tc": 1}
+        pages = [(record(f"p{number}.html", "P"), terms) for number in range(50)]
+        write_search_index(self.test_dir, pages, shard_budget=200)
+        shards = self.load(SEARCH_INDEX_FILENAME)["shards"]
+        for term in terms:
+            self.assertIn(term, self.load(shard_for(shards, term)))
+
+
+@unittest.skipUnless(shutil.which("node"), "node is not installed")
+class TestSearchScript(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def run_script(self, code):
+        """Run code after the search script in node, with fetch reading files; returns its JSON output."""
+        search_dir = os.path.join(self.test_dir, SEARCH_DIR)
+        program = (f"require({json.dumps(os.path.join(search_dir, SEARCH_SCRIPT_FILENAME))});\n"
+                   "globalThis.fetch = async (url) => new Response(require('fs').readFileSync(url));\n"
+                   f"const search = SiteSearch.create({json.dumps(search_dir)});\n"
+                   f"(async () => console.log(JSON.stringify({code})))();\n")
+        output = subprocess.run(["node", "-e", program], capture_output=True, text=True, check=True).stdout
+        return json.loads(output)
+
+    def test_shard_lookup_matches_python(self):
+        shards = {"t": "t-t.json.gz", "tb": "t-tb.json.gz", "é": "x-c3a9.json.gz", "𝔞": "x-f09d949e.json.gz"}
+        terms = ["tom", "tb", "tbb", "éowyn", "𝔞b", "ann"]
+        write_search_index(self.test_dir, [])
+        found = self.run_script(f"{json.dumps(terms)}.map((term) => SiteSearch.shardFor({json.dumps(shards)}, term))")
+        self.assertEqual(found, [shard_for(shards, term) for term in terms])
+
+    def test_terms_match_python(self):
+        text = "Old Tom Bombadil is a merry fellow; TOM! Éowyn_2 x" + "y" * MAX_TERM_LENGTH
+        write_search_index(self.test_dir, [])
+        self.assertEqual(self.run_script(f"SiteSearch.terms({json.dumps(text)})"), list(term_frequencies(text)))
+
+    def test_search_loads_shards(self):
+        terms = {"t": 1, "ta": 1, "tb": 1, "tba": 1, "tbb": 1}
+        pages = [(record(f"p{number}.html", f"P{number}"), terms) for number in range(50)]
+        pages.append((record("tom.html", "Tom"), {"tom": 3, "bombadil": 1}))
+        pages.append((record("ann.html", "Ann"), {"tom": 1, "ann": 1}))
+        write_search_index(self.test_dir, pages, shard_budget=200)
+        results = self.run_script("[await search.search('Tom'), await search.search('tom ANN'), "
+                                  "await search.search('tbb'), await search.search('missing tom'), "
+                                  "await search.search('  ')]")
+        self.assertEqual(results[0], [{"url": "/tom.html", "title": "Tom"}, {"url": "/ann.html", "title": "Ann"}])
+        self.assertEqual(results[1], [{"url": "/ann.html", "title": "Ann"}])
+        self.assertEqual(len(results[2]), 50)
+        self.assertEqual(results[3:], [[], []])
+
+
+class TestSearchBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home\n\nWelcome to the **shire**.")
+        self.write("content/tom.md", "# Tom\n\nOld Tom Bombadil.\n\n```\ncode is skipped\n```")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.test_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, search=SearchSettings()):
+        with redirect_stdout(io.StringIO()):
+            return build_site(self.static_dir, self.content_dir, self.template_path, self.dest_dir,
+                              "/site/", search=search)
+
+    def shard(self, prefix):
+        with gzip.open(os.path.join(self.dest_dir, SEARCH_DIR, shard_filename(prefix)), 'rt') as f:
+            return json.load(f)
+
+    def test_build_writes_search_index(self):
+        result = self.build()
+        self.assertIn("search/index.json", result.generated)
+        self.assertIn("search/" + SEARCH_SCRIPT_FILENAME, result.generated)
+        self.assertEqual(self.shard("s")["shire"], [[page_id("index.html"), 1]])
+        self.assertEqual(self.shard("t")["tom"], [[page_id("tom.html"), 2]])
+        self.assertNotIn("skipped", self.shard("s"))
+        with gzip.open(os.path.join(self.dest_dir, SEARCH_DIR, PAGES_FILENAME), 'rt') as f:
+            self.assertEqual(json.load(f)[page_id("tom.html")], ["/site/tom.html", "Tom"])
+
+    def test_only_changed_shards_are_rewritten(self):
+        self.build()
+        self.assertEqual(self.build().generated, [])
+
+        self.write("content/tom.md", "# Tom\n\nOld Tom Bombadil, merry Tom.")
+        result = self.build()
+        self.assertEqual(result.rendered, ["tom.html"])
+        self.assertEqual(result.generated, ["search/index.json", "search/t-m.json.gz", "search/t-t.json.gz"])
+
+        self.write("content/ann.md", "# Bombadil")
+        with redirect_stdout(io.StringIO()):
+            result, _ = rebuild_changed([os.path.join(self.content_dir, "ann.md")], self.static_dir,
+                                        self.content_dir, self.template_path, self.dest_dir, "/site/",
+                                        search=SearchSettings())
+        self.assertEqual(result.rendered, ["ann.html"])
+        self.assertEqual(result.generated, ["search/pages.json.gz", "search/t-b.json.gz"])
+
+    def test_search_index_is_removed_without_settings(self):
+        self.build()
+        result = self.build(None)
+        self.assertIn("search/index.json", result.generated_removed)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, SEARCH_DIR)))
+
+
+if __name__ == "__main__":
+    unittest.main()
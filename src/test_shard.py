@@ -0,0 +1,239 @@
+import filecmp
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from feed import FeedSettings
+from generate_page import find_pages
+from incremental import build_site, update_generated
+from manifest import BuildManifest, MANIFEST_FILENAME
+from page_index import INDEX_FILENAME, PageIndex
+from search import SearchSettings
+from shard import BY_SIZE, assign_shards, merge_shards, parse_shard, select_shard, shard_of
+from sitemap import page_url
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run by each stand-in node: build one shard into its own directory
+NODE_SCRIPT = """
+import sys
+sys.path.insert(0, {src!r})
+from incremental import build_site
+from shard import parse_shard
+build_site({static!r}, {content!r}, {template!r}, sys.argv[2], shard=parse_shard(sys.argv[1]),
+           shard_by=sys.argv[3])
+"""
+
+
+class TestShardAssignment(unittest.TestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ["0/4", "5/4", "2", "a/b", "-1/3"]:
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_hash_assignment_is_stable(self):
+        sources = [f"blog/post-{i}/index.md" for i in range(200)]
+        assigned = assign_shards(sources, 4)
+        self.assertEqual(assigned, assign_shards(list(reversed(sources)), 4))
+        self.assertEqual(set(assigned.values()), {1, 2, 3, 4})
+        self.assertEqual(shard_of("blog/post-7/index.md", 4), assigned["blog/post-7/index.md"])
+
+    def test_size_assignment_balances_bytes(self):
+        sizes = {"huge.md": 1000, "a.md": 300, "b.md": 300, "c.md": 300, "d.md": 100}
+        assigned = assign_shards(sizes, 2, sizes)
+        loads = {1: 0, 2: 0}
+        for source, shard in assigned.items():
+            loads[shard] += sizes[source]
+        self.assertEqual(sorted(loads.values()), [1000, 1000])
+
+
+class TestShardedBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(os.path.join(self.static_dir, "index.css"), "body {}")
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        for i in range(12):
+            self.write(os.path.join(self.content_dir, "blog", f"post-{i}", "index.md"),
+                       f"# Post {i}\n\n" + "Words. " * (i * 20) + "\n\n![logo](/index.css)")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def path(self, *parts):
+        return os.path.join(self.test_dir, *parts)
+
+    def build_shards(self, count, by="hash"):
+        """Build every shard in its own process, all at once, like separate nodes."""
+        script = NODE_SCRIPT.format(src=SRC_DIR, static=self.static_dir, content=self.content_dir,
+                                    template=self.template_path)
+        nodes = [subprocess.Popen([sys.executable, "-c", script, f"{index}/{count}",
+                                   self.path("shards", str(index)), by],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                 for index in range(1, count + 1)]
+        for node in nodes:
+            _, stderr = node.communicate()
+            self.assertEqual(node.returncode, 0, stderr.decode())
+        return [self.path("shards", str(index)) for index in range(1, count + 1)]
+
+    def merge(self, shard_dirs, feeds=None, site_url=None, search=None):
+        def generate(index, basepath, pages, static, previous):
+            return update_generated(index, self.content_dir, self.template_path, self.path("merged"),
+                                    basepath, pages, static, previous, feeds, site_url, search)
+
+        with redirect_stdout(io.StringIO()):
+            return merge_shards(shard_dirs, self.path("merged"), generate)
+
+    def assert_same_tree(self, a, b, ignore=()):
+        comparison = filecmp.dircmp(a, b, ignore=[MANIFEST_FILENAME, INDEX_FILENAME, *ignore])
+        stack = [comparison]
+        while stack:
+            current = stack.pop()
+            self.assertEqual(current.left_only + current.right_only + current.diff_files, [])
+            _, mismatch, errors = filecmp.cmpfiles(current.left, current.right, current.common_files,
+                                                   shallow=False)
+            self.assertEqual(mismatch + errors, [])
+            stack.extend(current.subdirs.values())
+
+    def test_shards_split_pages_without_overlap(self):
+        pages = find_pages(self.content_dir, self.template_path, self.path("docs"))
+        for by in ["hash", BY_SIZE]:
+            parts = [select_shard(pages, self.content_dir, (index, 3), by) for index in (1, 2, 3)]
+            self.assertEqual(sorted(page for part in parts for page in part), sorted(pages))
+            self.assertTrue(all(parts))
+
+    def test_merged_shards_match_a_single_build(self):
+        with redirect_stdout(io.StringIO()):
+            build_site(self.static_dir, self.content_dir, self.template_path, self.path("docs"))
+        for by in ["hash", BY_SIZE]:
+            shard_dirs = self.build_shards(3, by)
+            # Static files come from the first shard only
+            self.assertFalse(os.path.exists(os.path.join(shard_dirs[1], "index.css")))
+            self.assertEqual(BuildManifest.load(shard_dirs[2]).shard, (3, 3))
+
+            self.merge(shard_dirs)
+            self.assert_same_tree(self.path("docs"), self.path("merged"))
+            merged = BuildManifest.load(self.path("merged"))
+            self.assertIsNone(merged.shard)
+            self.assertEqual(merged.pages, BuildManifest.load(self.path("docs")).pages)
+            with PageIndex.open(self.path("docs")) as single, PageIndex.open(self.path("merged")) as index:
+                self.assertEqual(index.pages(), single.pages())
+                self.assertEqual(index.links_to("/index.css"), single.links_to("/index.css"))
+
+    def test_merged_site_builds_incrementally(self):
+        self.merge(self.build_shards(2))
+        with redirect_stdout(io.StringIO()):
+            result = build_site(self.static_dir, self.content_dir, self.template_path,
+                                self.path("merged"))
+        self.assertEqual((result.rendered, result.generated), ([], []))
+        self.assertEqual((result.unchanged, result.generated_unchanged), (13, 2))
+
+    def test_merge_writes_listings_feeds_and_search(self):
+        feeds = FeedSettings("https://example.com")
+        with redirect_stdout(io.StringIO()):
+            build_site(self.static_dir, self.content_dir, self.template_path, self.path("docs"),
+                       feeds=feeds, site_url="https://example.com", search=SearchSettings())
+        self.merge(self.build_shards(2), feeds, "https://example.com", SearchSettings())
+        # Listings get the time their file was written as lastmod
+        self.assert_same_tree(self.path("docs"), self.path("merged"), ["sitemap.xml"])
+        for rel_path in ["blog/index.html", "blog/page/2/index.html", "blog/feed.xml", "blog/atom.xml"]:
+            self.assertTrue(os.path.exists(self.path("merged", rel_path)), rel_path)
+        with open(self.path("docs", "sitemap.xml")) as single:
+            expected = re.findall("<loc>.*</loc>", single.read())
+        with open(self.path("merged", "sitemap.xml")) as merged:
+            self.assertEqual(re.findall("<loc>.*</loc>", merged.read()), expected)
+        self.assertTrue(os.listdir(self.path("merged", "search")))
+        self.assertEqual(BuildManifest.load(self.path("merged")).pages,
+                         BuildManifest.load(self.path("docs")).pages)
+
+    def test_merged_manifest_holds_on_another_checkout(self):
+        self.merge(self.build_shards(2))
+        with redirect_stdout(io.StringIO()):
+            build_site(self.static_dir, self.content_dir, self.template_path, self.path("merged"))
+        # A fresh checkout has the same bytes with new mtimes
+        css = os.path.join(self.static_dir, "index.css")
+        os.utime(css, ns=(0, os.stat(css).st_mtime_ns + 10**12))
+        with redirect_stdout(io.StringIO()):
+            result = build_site(self.static_dir, self.content_dir, self.template_path,
+                                self.path("merged"))
+        self.assertEqual(result.rendered, [])
+        self.assertEqual(result.static_copied, [])
+
+    def test_disagreeing_static_records_keep_no_mtime(self):
+        shard_dirs = self.build_shards(2)
+        size, mtime = BuildManifest.load(shard_dirs[0]).static["index.css"]
+        # As if the second shard had been built on another checkout
+        second = BuildManifest.load(shard_dirs[1])
+        second.static["index.css"] = [size, mtime + 1]
+        second.save()
+        self.merge(shard_dirs)
+        self.assertEqual(BuildManifest.load(self.path("merged")).static["index.css"], [size, None])
+
+    def test_remerge_only_writes_changes(self):
+        shard_dirs = self.build_shards(2)
+        self.merge(shard_dirs)
+        self.write(os.path.join(self.content_dir, "index.md"), "# New home")
+        os.remove(os.path.join(self.content_dir, "blog", "post-3", "index.md"))
+        shard_dirs = self.build_shards(2)
+        # The home page and both blog listing pages, which lost post 3
+        self.assertEqual(self.merge(shard_dirs), (3, 12, 1))
+
+    def test_sitemap_lists_every_page(self):
+        self.merge(self.build_shards(2), site_url="https://example.com")
+        with open(self.path("merged", "sitemap.xml")) as f:
+            sitemap = f.read()
+        self.assertIn("<loc>https://example.com/</loc>", sitemap)
+        self.assertIn("<loc>https://example.com/blog/post-11/</loc>", sitemap)
+        # 13 pages and the 2 blog listing pages
+        self.assertEqual(sitemap.count("<url>"), 15)
+
+    def test_missing_shard_is_an_error(self):
+        shard_dirs = self.build_shards(3)
+        with self.assertRaisesRegex(ValueError, "Missing shard"):
+            self.merge(shard_dirs[:2])
+        with self.assertRaisesRegex(ValueError, "both shard"):
+            self.merge([shard_dirs[0], shard_dirs[0], shard_dirs[1]])
+        with self.assertRaisesRegex(ValueError, "No build manifest"):
+            self.merge(shard_dirs + [self.path("nowhere")])
+
+    def test_conflicting_outputs_are_reported(self):
+        shard_dirs = self.build_shards(2)
+        first = BuildManifest.load(shard_dirs[0])
+        second = BuildManifest.load(shard_dirs[1])
+        rel_dest = next(iter(second.pages))
+        first.pages[rel_dest] = second.pages[rel_dest]
+        first.save()
+        self.write(os.path.join(shard_dirs[0], rel_dest), "something else")
+
+        with self.assertRaises(ValueError) as caught:
+            self.merge(shard_dirs)
+        message = str(caught.exception)
+        self.assertIn(f"{rel_dest} was generated by both", message)
+        self.assertIn(f"{rel_dest} differs between", message)
+        self.assertFalse(os.path.exists(self.path("merged")))
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html", "/", "https://example.com"), "https://example.com/")
+        self.assertEqual(page_url("blog/tom/index.html", "/site/", "https://example.com/"),
+                         "https://example.com/site/blog/tom/")
+        self.assertEqual(page_url("about.html", "/"), "/about.html")
+
+
+if __name__ == "__main__":
+    unittest.main()
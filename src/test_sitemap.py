@@ -0,0 +1,129 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from contextlib import redirect_stdout
+from incremental import build_site, rebuild_changed
+from sitemap import SITEMAP_FILENAME, SITEMAP_NAMESPACE, page_url, sitemap_pages, sitemap_part, write_sitemaps
+
+NS = {"s": SITEMAP_NAMESPACE}
+
+
+class TestSitemap(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def parse(self, name):
+        return ET.parse(os.path.join(self.test_dir, name)).getroot()
+
+    def write(self, pages, **limits):
+        with redirect_stdout(io.StringIO()):
+            return write_sitemaps(self.test_dir, lambda: iter(pages), "/site/", "https://example.com", **limits)
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html", "/site/", "https://example.com/"), "https://example.com/site/")
+        self.assertEqual(page_url("blog/tom/index.html"), "/blog/tom/")
+        self.assertEqual(page_url("blog/page.html", "/"), "/blog/page.html")
+
+    def test_single_sitemap(self):
+        pages = [("index.html", "2024-01-01T00:00:00Z"), ("blog/a&b.html", None)]
+        self.assertEqual(self.write(pages), [(SITEMAP_FILENAME, True)])
+        urls = self.parse(SITEMAP_FILENAME).findall("s:url", NS)
+        self.assertEqual([url.findtext("s:loc", namespaces=NS) for url in urls],
+                         ["https://example.com/site/", "https://example.com/site/blog/a&b.html"])
+        self.assertEqual(urls[0].findtext("s:lastmod", namespaces=NS), "2024-01-01T00:00:00Z")
+        self.assertIsNone(urls[1].find("s:lastmod", NS))
+        self.assertEqual(self.write(pages), [(SITEMAP_FILENAME, False)])
+
+    def test_split_by_url_count(self):
+        pages = [(f"p{number}.html", f"2024-01-0{number + 1}T00:00:00Z") for number in range(5)]
+        written = self.write(pages, max_urls=2)
+        self.assertEqual([name for name, _ in written],
+                         [SITEMAP_FILENAME, sitemap_part(1), sitemap_part(2), sitemap_part(3)])
+        sitemaps = self.parse(SITEMAP_FILENAME).findall("s:sitemap", NS)
+        self.assertEqual(sitemaps[0].findtext("s:loc", namespaces=NS), "https://example.com/site/sitemap-1.xml")
+        self.assertEqual([sitemap.findtext("s:lastmod", namespaces=NS) for sitemap in sitemaps],
+                         ["2024-01-02T00:00:00Z", "2024-01-04T00:00:00Z", "2024-01-05T00:00:00Z"])
+        self.assertEqual([len(self.parse(sitemap_part(number)).findall("s:url", NS)) for number in (1, 2, 3)],
+                         [2, 2, 1])
+
+    def test_split_by_size(self):
+        pages = [(f"p{number}.html", None) for number in range(5)]
+        written = self.write(pages, max_bytes=250)
+        for name, _ in written[1:]:
+            self.assertLessEqual(os.path.getsize(os.path.join(self.test_dir, name)), 250)
+        locs = [loc.text for name, _ in written[1:]
+                for loc in self.parse(name).iter(f"{{{SITEMAP_NAMESPACE}}}loc")]
+        self.assertEqual(locs, [page_url(rel_dest, "/site/", "https://example.com") for rel_dest, _ in pages])
+
+    def test_sitemap_pages(self):
+        with open(os.path.join(self.test_dir, "listing.html"), "w") as f:
+            f.write("listing")
+        os.utime(os.path.join(self.test_dir, "listing.html"), (0, 86400))
+        pages = sitemap_pages(["a.html", "listing.html", "missing.html", "z.html"],
+                              [("a.html", "2024-01-01T00:00:00Z"), ("b.html", "x"),
+                               ("z.html", "2024-01-02T00:00:00Z")],
+                              self.test_dir)
+        self.assertEqual(list(pages), [("a.html", "2024-01-01T00:00:00Z"),
+                                       ("listing.html", "1970-01-02T00:00:00Z"),
+                                       ("missing.html", None), ("z.html", "2024-01-02T00:00:00Z")])
+
+
+class TestSitemapBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.test_dir, "static")
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(os.path.join(self.test_dir, "template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+        self.write(os.path.join(self.content_dir, "blog", "tom.md"), "# Tom")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, site_url="https://example.com"):
+        with redirect_stdout(io.StringIO()):
+            return build_site(self.static_dir, self.content_dir, self.template_path, self.dest_dir,
+                              "/site/", site_url=site_url)
+
+    def locs(self):
+        root = ET.parse(os.path.join(self.dest_dir, SITEMAP_FILENAME)).getroot()
+        return [url.findtext("s:loc", namespaces=NS) for url in root.findall("s:url", NS)]
+
+    def test_build_writes_sitemap(self):
+        result = self.build()
+        self.assertIn(SITEMAP_FILENAME, result.generated)
+        self.assertEqual(self.locs(), ["https://example.com/site/blog/", "https://example.com/site/blog/tom.html",
+                                       "https://example.com/site/"])
+        self.assertEqual(self.build().generated, [])
+
+        self.write(os.path.join(self.content_dir, "blog", "ann.md"), "# Ann")
+        with redirect_stdout(io.StringIO()):
+            result, _ = rebuild_changed([os.path.join(self.content_dir, "blog", "ann.md")], self.static_dir,
+                                        self.content_dir, self.template_path, self.dest_dir, "/site/",
+                                        site_url="https://example.com")
+        self.assertIn(SITEMAP_FILENAME, result.generated)
+        self.assertIn("https://example.com/site/blog/ann.html", self.locs())
+
+    def test_sitemap_is_removed_without_site_url(self):
+        self.build()
+        self.assertEqual(self.build(None).generated_removed, [SITEMAP_FILENAME])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, SITEMAP_FILENAME)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from snapshot import SiteSnapshot, TreeSnapshot
+
+
+class TestTreeSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.test_dir, "content")
+        for rel_path in ["index.md", "blog/tom/index.md", "blog/b.md", "blog/a.md", "about/index.md",
+                         "blog/tom/tom.png"]:
+            self.write(rel_path, rel_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.root, *rel_path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def rel_paths(self, snapshot):
+        return [entry.rel_path for entry in snapshot.files()]
+
+    def walked(self):
+        """What a sorted os.walk lists, for comparison."""
+        paths = []
+        for root, dirs, files in os.walk(self.root):
+            dirs.sort()
+            rel_root = os.path.relpath(root, self.root).replace(os.sep, "/")
+            paths.extend(name if rel_root == "." else f"{rel_root}/{name}" for name in sorted(files))
+        return paths
+
+    def test_walk_matches_sorted_os_walk(self):
+        snapshot = TreeSnapshot(self.root)
+        self.assertEqual(self.rel_paths(snapshot), self.walked())
+        self.assertEqual(snapshot.reads, 4)
+        self.assertEqual([rel_dir for rel_dir, _, _ in snapshot.walk()],
+                         ["", "about", "blog", "blog/tom"])
+
+    def test_listing_does_not_stat(self):
+        snapshot = TreeSnapshot(self.root)
+        # Not statted while listing, so the size seen is the one at first use
+        self.write("blog/a.md", "grown after the listing")
+        self.assertEqual(snapshot.get("blog/a.md").size, len("grown after the listing"))
+
+        entry = snapshot.get("blog/tom/index.md")
+        stat = os.stat(entry.path)
+        self.assertEqual(entry.inode, stat.st_ino)
+        self.assertEqual(entry.record(), [stat.st_size, stat.st_mtime_ns])
+        self.assertIsNone(snapshot.get("blog/missing.md"))
+
+    def test_missing_root(self):
+        snapshot = TreeSnapshot(os.path.join(self.test_dir, "nowhere"))
+        self.assertFalse(snapshot.exists)
+        self.assertEqual(list(snapshot.walk()), [])
+
+    def test_update_rereads_only_changed_directories(self):
+        snapshot = TreeSnapshot(self.root)
+        old_size = snapshot.get("blog/a.md").size
+        reads = snapshot.reads
+
+        self.write("blog/a.md", "a much longer body than before")
+        self.write("blog/c.md", "new")
+        snapshot.update([os.path.join(self.root, "blog", "a.md"), os.path.join(self.root, "blog", "c.md")])
+
+        self.assertEqual(snapshot.reads, reads + 1)
+        self.assertNotEqual(snapshot.get("blog/a.md").size, old_size)
+        self.assertEqual(self.rel_paths(snapshot), self.walked())
+
+    def test_update_with_new_and_deleted_directories(self):
+        snapshot = TreeSnapshot(self.root)
+        self.write("guides/setup/install.md", "new")
+        shutil.rmtree(os.path.join(self.root, "blog"))
+        snapshot.update([os.path.join(self.root, "guides", "setup", "install.md"),
+                         os.path.join(self.root, "blog")])
+        self.assertEqual(self.rel_paths(snapshot), self.walked())
+        self.assertNotIn("blog/tom", [rel_dir for rel_dir, _, _ in snapshot.walk()])
+
+    def test_update_ignores_paths_outside_root(self):
+        snapshot = TreeSnapshot(self.root)
+        reads = snapshot.reads
+        snapshot.update([os.path.join(self.test_dir, "template.html"), self.root + "-other/x.md"])
+        self.assertEqual(snapshot.reads, reads)
+
+    def test_update_when_root_appears(self):
+        other = os.path.join(self.test_dir, "static")
+        snapshot = SiteSnapshot(other, self.root)
+        os.makedirs(os.path.join(other, "css"))
+        with open(os.path.join(other, "css", "site.css"), "w") as f:
+            f.write("body {}")
+        snapshot.update([os.path.join(other, "css", "site.css")])
+        self.assertEqual(self.rel_paths(snapshot.static), ["css/site.css"])
+
+
+if __name__ == "__main__":
+    unittest.main()
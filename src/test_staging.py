@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from output import write_if_changed
+from staging import build_staged, current_build, list_builds, rollback, stage_build, publish_build
+
+
+class TestStagedBuilds(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.dest_dir = os.path.join(self.test_dir, "docs")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def read(self, name):
+        with open(os.path.join(self.dest_dir, name)) as f:
+            return f.read()
+
+    def build_with(self, content, **kwargs):
+        def build(staging_dir):
+            write_if_changed(os.path.join(staging_dir, "index.html"), content)
+        build_staged(self.dest_dir, build, **kwargs)
+
+    def test_publish_switches_symlink(self):
+        self.build_with("one")
+        self.assertTrue(os.path.islink(self.dest_dir))
+        self.assertEqual(self.read("index.html"), "one")
+        self.assertEqual(current_build(self.dest_dir), list_builds(self.dest_dir)[-1])
+
+    def test_existing_directory_is_kept_as_a_build(self):
+        os.makedirs(self.dest_dir)
+        write_if_changed(os.path.join(self.dest_dir, "index.html"), "plain")
+        self.build_with("one")
+        self.assertEqual(len(list_builds(self.dest_dir)), 2)
+        rollback(self.dest_dir)
+        self.assertEqual(self.read("index.html"), "plain")
+
+    def test_directory_is_replaced_by_a_ready_symlink(self):
+        os.makedirs(self.dest_dir)
+        real_rename = os.rename
+        moves = []
+
+        def rename(src, dst):
+            if src == self.dest_dir:
+                moves.append(os.path.islink(self.dest_dir + ".link-tmp"))
+            real_rename(src, dst)
+
+        with mock.patch("staging.os.rename", rename):
+            self.build_with("one")
+        self.assertEqual(moves, [True])
+        self.assertEqual(self.read("index.html"), "one")
+
+    def test_directory_is_kept_again_after_a_manual_replacement(self):
+        for content in ["one", "two"]:
+            self.build_with(content)
+            os.remove(self.dest_dir)
+            os.makedirs(self.dest_dir)
+            write_if_changed(os.path.join(self.dest_dir, "index.html"), "plain " + content)
+        self.build_with("three", keep=2)
+        self.assertTrue(list_builds(self.dest_dir)[0].endswith("-initial"))
+        rollback(self.dest_dir)
+        self.assertEqual(self.read("index.html"), "plain two")
+
+    def test_seeded_staging_does_not_touch_live_site(self):
+        self.build_with("one")
+        staging_dir = stage_build(self.dest_dir)
+        self.assertTrue(os.path.samefile(os.path.join(staging_dir, "index.html"),
+                                         os.path.join(self.dest_dir, "index.html")))
+
+        write_if_changed(os.path.join(staging_dir, "index.html"), "two")
+        self.assertEqual(self.read("index.html"), "one")
+        publish_build(self.dest_dir, staging_dir)
+        self.assertEqual(self.read("index.html"), "two")
+
+    def test_failed_build_leaves_live_site(self):
+        self.build_with("one")
+
+        def failing_build(staging_dir):
+            write_if_changed(os.path.join(staging_dir, "index.html"), "broken")
+            raise RuntimeError("render failed")
+
+        with self.assertRaises(RuntimeError):
+            build_staged(self.dest_dir, failing_build)
+        self.assertEqual(self.read("index.html"), "one")
+        self.assertEqual(len(list_builds(self.dest_dir)), 1)
+        self.assertEqual(os.listdir(self.dest_dir + ".builds"), list_builds(self.dest_dir))
+
+    def test_rollback_and_keep(self):
+        for content in ["one", "two", "three", "four"]:
+            self.build_with(content, keep=3)
+        self.assertEqual(len(list_builds(self.dest_dir)), 3)
+
+        rollback(self.dest_dir, 2)
+        self.assertEqual(self.read("index.html"), "two")
+        with self.assertRaises(ValueError):
+            rollback(self.dest_dir)
+
+    def test_rollback_requires_published_build(self):
+        os.makedirs(self.dest_dir)
+        with self.assertRaises(ValueError):
+            rollback(self.dest_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from template import (
+    TemplateSyntaxError,
+    compile_template,
+    load_template,
+    clear_template_cache,
+    find_template,
+    set_asset_dir,
+    set_template_cache_dir,
+    template_files,
+    template_watch_files,
+)
+
+
+class TestCompiledTemplate(unittest.TestCase):
+
+    def test_slots(self):
+        template = compile_template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.assertEqual(template.slots(), ["Title", "Content"])
+
+    def test_render_fills_every_occurrence(self):
+        template = compile_template("<title>{{ Title }}</title><h1>{{ Title }}</h1>{{ Content }}")
+        result = template.render({"Title": "Hi", "Content": "<p>x</p>"})
+        self.assertEqual(result, "<title>Hi</title><h1>Hi</h1><p>x</p>")
+
+    def test_unknown_placeholder_is_kept(self):
+        template = compile_template("{{ Title }} {{ Other }}")
+        self.assertEqual(template.render({"Title": "Hi"}), "Hi {{ Other }}")
+
+    def test_values_are_not_rescanned(self):
+        template = compile_template("{{ Title }}|{{ Content }}")
+        result = template.render({"Title": "{{ Content }}", "Content": "body"})
+        self.assertEqual(result, "{{ Content }}|body")
+
+    def test_root_relative_urls_become_basepath_slots(self):
+        template = compile_template('<link href="/index.css"><img src="/a.png"><a href="https://x.dev/">')
+        self.assertEqual(template.slots(), ["basepath"])
+        result = template.render({"basepath": "/site/"})
+        self.assertEqual(result, '<link href="/site/index.css"><img src="/site/a.png"><a href="https://x.dev/">')
+
+    def test_protocol_relative_urls_are_untouched(self):
+        template = compile_template('<script src="//cdn.example.com/x.js"></script>')
+        self.assertEqual(template.slots(), [])
+
+    def test_urls_lists_root_relative_urls(self):
+        template = compile_template('<link href="/index.css"><a href="/">x</a><img src="/index.css">')
+        self.assertEqual(template.urls, ["/index.css", "/"])
+
+    def test_missing_basepath_keeps_slash(self):
+        template = compile_template('<link href="/index.css">')
+        self.assertEqual(template.render({}), '<link href="/index.css">')
+
+    def test_write_matches_render(self):
+        template = compile_template("<a>{{ Title }}</a>{{ Content }}<b></b>")
+        values = {"Title": "T", "Content": "C"}
+        out = io.StringIO()
+        template.write(out, values)
+        self.assertEqual(out.getvalue(), template.render(values))
+
+
+class TestFingerprints(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.test_dir, "index.css"), "w") as f:
+            f.write("body {}")
+        set_asset_dir(self.test_dir)
+
+    def tearDown(self):
+        set_asset_dir(None)
+        shutil.rmtree(self.test_dir)
+
+    def test_fingerprint_query_becomes_content_hash(self):
+        template = compile_template('<link href="/index.css?fingerprint">')
+        self.assertEqual(template.urls, ["/index.css"])
+        self.assertEqual(template.assets, ["index.css"])
+        self.assertRegex(template.render({"basepath": "/site/"}),
+                         r'^<link href="/site/index.css\?v=[0-9a-f]{12}">$')
+
+    def test_fingerprint_follows_file_contents(self):
+        template = compile_template('<link href="/index.css?fingerprint">')
+        first = template.render({})
+        with open(os.path.join(self.test_dir, "index.css"), "w") as f:
+            f.write("body { color: red }")
+        self.assertNotEqual(template.render({}), first)
+
+    def test_missing_asset_is_left_bare(self):
+        template = compile_template('<script src="/missing.js?fingerprint"></script>')
+        self.assertEqual(template.render({}), '<script src="/missing.js"></script>')
+        set_asset_dir(None)
+        template = compile_template('<link href="/index.css?fingerprint">')
+        self.assertEqual(template.render({}), '<link href="/index.css">')
+
+
+class TestTemplateLanguage(unittest.TestCase):
+
+    def test_dotted_variables(self):
+        template = compile_template("{{ page.title }} by {{ page.author.name }}")
+        values = {"page": {"title": "Tom", "author": {"name": "JRRT"}}}
+        self.assertEqual(template.render(values), "Tom by JRRT")
+
+    def test_missing_attribute_renders_empty(self):
+        template = compile_template("[{{ page.missing }}]")
+        self.assertEqual(template.render({"page": {}}), "[]")
+
+    def test_for_loop(self):
+        template = compile_template('<ul>{% for post in pages %}<li><a href="/{{ post.url }}">{{ post.title }}</a></li>{% endfor %}</ul>')
+        values = {
+            "pages": [{"url": "blog/tom", "title": "Tom"}, {"url": "blog/majesty", "title": "Majesty"}],
+            "basepath": "/site/",
+        }
+        self.assertEqual(
+            template.render(values),
+            '<ul><li><a href="/site/blog/tom">Tom</a></li><li><a href="/site/blog/majesty">Majesty</a></li></ul>',
+        )
+
+    def test_loop_variable_does_not_leak(self):
+        template = compile_template("{% for Title in items %}{{ Title }}{% endfor %}|{{ Title }}")
+        self.assertEqual(template.render({"items": ["a", "b"], "Title": "T"}), "ab|T")
+
+    def test_nested_loops(self):
+        template = compile_template("{% for row in rows %}{% for cell in row %}{{ cell }}{% endfor %};{% endfor %}")
+        self.assertEqual(template.render({"rows": [[1, 2], [3]]}), "12;3;")
+
+    def test_if_elif_else(self):
+        template = compile_template("{% if draft %}draft{% elif not published %}pending{% else %}live{% endif %}")
+        self.assertEqual(template.render({"draft": True}), "draft")
+        self.assertEqual(template.render({"published": False}), "pending")
+        self.assertEqual(template.render({"published": True}), "live")
+
+    def test_empty_blocks(self):
+        template = compile_template("{% if x %}{% else %}{% endif %}{% for i in items %}{% endfor %}")
+        self.assertEqual(template.render({"x": True, "items": [1]}), "")
+
+    def test_syntax_errors(self):
+        for source in [
+            "{% if x %}unclosed",
+            "{% endfor %}",
+            "{% else %}",
+            "{% for x pages %}{% endfor %}",
+            "{{ not a name }}",
+            "{% include partial.html %}",
+            "{% unknown %}",
+        ]:
+            with self.assertRaises(TemplateSyntaxError, msg=source):
+                compile_template(source)
+
+    def test_syntax_error_reports_line(self):
+        with self.assertRaises(TemplateSyntaxError) as context:
+            compile_template("line one\nline two {% bogus %}")
+        self.assertIn("line 2", str(context.exception))
+
+
+class TestTemplateLoading(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        with open(self.template_path, "w") as f:
+            f.write("<h1>{{ Title }}</h1>")
+        clear_template_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        clear_template_cache()
+
+    def test_load_template_is_cached(self):
+        first = load_template(self.template_path)
+        second = load_template(self.template_path)
+        self.assertIs(first, second)
+
+    def test_load_template_reloads_changed_file(self):
+        first = load_template(self.template_path)
+        with open(self.template_path, "w") as f:
+            f.write("<h2>{{ Title }}</h2>!")
+        stat = os.stat(self.template_path)
+        os.utime(self.template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        second = load_template(self.template_path)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.render({"Title": "x"}), "<h2>x</h2>!")
+
+    def test_include_is_relative_to_template(self):
+        partials = os.path.join(self.test_dir, "partials")
+        os.makedirs(partials)
+        with open(os.path.join(partials, "nav.html"), "w") as f:
+            f.write('<nav><a href="/">{{ Title }}</a>{% include "item.html" %}</nav>')
+        with open(os.path.join(partials, "item.html"), "w") as f:
+            f.write("<i>item</i>")
+        with open(self.template_path, "w") as f:
+            f.write('{% include "partials/nav.html" %}{{ Content }}')
+
+        template = load_template(self.template_path)
+        self.assertEqual(template.includes, ["partials/nav.html"])
+        result = template.render({"Title": "Home", "Content": "<p>x</p>", "basepath": "/s/"})
+        self.assertEqual(result, '<nav><a href="/s/">Home</a><i>item</i></nav><p>x</p>')
+
+    def test_template_files_follow_includes(self):
+        partials = os.path.join(self.test_dir, "partials")
+        os.makedirs(partials)
+        with open(os.path.join(partials, "nav.html"), "w") as f:
+            f.write('<nav>{% include "item.html" %}</nav>')
+        with open(os.path.join(partials, "item.html"), "w") as f:
+            f.write("<i>item</i>")
+        with open(os.path.join(self.test_dir, "post.html"), "w") as f:
+            f.write("{{ Content }}")
+        with open(self.template_path, "w") as f:
+            f.write('{% include "partials/nav.html" %}{{ Content }}')
+
+        included = {self.template_path, os.path.join(partials, "nav.html"), os.path.join(partials, "item.html")}
+        self.assertEqual(template_files(self.template_path), included)
+        self.assertEqual(template_watch_files(self.template_path),
+                         included | {os.path.join(self.test_dir, "post.html")})
+
+    def test_template_watch_files_keeps_broken_templates(self):
+        with open(self.template_path, "w") as f:
+            f.write("{% if Title %}")
+        self.assertEqual(template_watch_files(self.template_path), {self.template_path})
+
+    def test_recursive_include_is_an_error(self):
+        with open(self.template_path, "w") as f:
+            f.write('{% include "template.html" %}')
+        with self.assertRaises(TemplateSyntaxError):
+            load_template(self.template_path).render({})
+
+    def test_disk_cache_reuses_code_objects(self):
+        cache_dir = os.path.join(self.test_dir, "cache")
+        set_template_cache_dir(cache_dir)
+        try:
+            first = load_template(self.template_path)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            clear_template_cache()
+            second = load_template(self.template_path)
+            self.assertIsNot(first, second)
+            self.assertEqual(second.code, first.code)
+            self.assertEqual(second.slots(), ["Title"])
+            self.assertEqual(second.render({"Title": "x"}), "<h1>x</h1>")
+        finally:
+            set_template_cache_dir(None)
+
+    def test_find_template_uses_closest_override(self):
+        content = os.path.join(self.test_dir, "content")
+        blog = os.path.join(content, "blog", "post")
+        os.makedirs(blog)
+        override = os.path.join(content, "blog", "template.html")
+        with open(override, "w") as f:
+            f.write("blog")
+
+        self.assertEqual(find_template(blog, content, self.template_path), override)
+        self.assertEqual(find_template(content, content, self.template_path), self.template_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 from textnode import TextNode, TextType
-from text_to_html import text_node_to_html_node
+from text_to_html import text_node_to_html_node, resolve_url
 
 
 class TestTextNodeToHTMLNode(unittest.TestCase):
@@ -113,6 +113,22 @@ class TestTextNodeToHTMLNode(unittest.TestCase):
         html_node = text_node_to_html_node(node)
         self.assertEqual(html_node.to_html(), "<b></b>")
 
+    def test_link_resolved_against_basepath(self):
+        node = TextNode("Home", TextType.LINK, "/blog/tom")
+        html_node = text_node_to_html_node(node, basepath="/static-site-gen/")
+        self.assertEqual(html_node.props, {"href": "/static-site-gen/blog/tom"})
+
+    def test_image_resolved_against_basepath(self):
+        node = TextNode("Tom", TextType.IMAGE, "/images/tom.png")
+        html_node = text_node_to_html_node(node, basepath="/site/")
+        self.assertEqual(html_node.props["src"], "/site/images/tom.png")
+
+    def test_resolve_url_leaves_other_urls_alone(self):
+        self.assertEqual(resolve_url("https://boot.dev/x", "/site/"), "https://boot.dev/x")
+        self.assertEqual(resolve_url("//cdn.dev/x.js", "/site/"), "//cdn.dev/x.js")
+        self.assertEqual(resolve_url("relative/page", "/site/"), "relative/page")
+        self.assertEqual(resolve_url("/page", None), "/page")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,105 @@
+import copy
+import unittest
+from htmlnode import LeafNode, ParentNode
+from block_markdown import markdown_to_html_node
+from node_factory import NodeFactory
+from tree_diff import DiffOp, subtree_hash, diff_trees, apply_diff
+
+
+def build_list(items):
+    return ParentNode("div", [
+        ParentNode("ul", [ParentNode("li", [LeafNode(None, item)]) for item in items]),
+    ])
+
+
+class TestTreeDiff(unittest.TestCase):
+
+    def assert_roundtrip(self, old, new):
+        ops = diff_trees(old, new)
+        patched = apply_diff(copy.deepcopy(old), ops)
+        self.assertEqual(patched.to_html(), new.to_html())
+        return ops
+
+    def test_identical_trees_have_no_changes(self):
+        old = markdown_to_html_node("# Title\n\nSome **bold** text")
+        new = markdown_to_html_node("# Title\n\nSome **bold** text")
+        self.assertEqual(diff_trees(old, new), [])
+
+    def test_subtree_hash_depends_on_props(self):
+        a = LeafNode("a", "link", {"href": "/one"})
+        b = LeafNode("a", "link", {"href": "/two"})
+        self.assertNotEqual(subtree_hash(a), subtree_hash(b))
+        self.assertEqual(subtree_hash(a), subtree_hash(LeafNode("a", "link", {"href": "/one"})))
+
+    def test_hash_collision_does_not_hide_a_change(self):
+        # hash(-1) == hash(-2) in CPython, so these subtrees hash alike
+        old = ParentNode("p", [LeafNode("b", -1)])
+        new = ParentNode("p", [LeafNode("b", -2)])
+        self.assertEqual(subtree_hash(old), subtree_hash(new))
+        ops = self.assert_roundtrip(old, new)
+        self.assertEqual(ops, [DiffOp(DiffOp.REPLACE, (0,), new.children[0])])
+
+    def test_changed_leaf_is_replaced(self):
+        old = build_list(["one", "two", "three"])
+        new = build_list(["one", "TWO", "three"])
+        ops = self.assert_roundtrip(old, new)
+        self.assertEqual(len(ops), 1)
+        self.assertEqual(ops[0].op, DiffOp.REPLACE)
+        self.assertEqual(ops[0].path, (0, 1, 0))
+
+    def test_changed_tag_replaces_whole_subtree(self):
+        old = markdown_to_html_node("- one\n- two")
+        new = markdown_to_html_node("1. one\n2. two")
+        ops = self.assert_roundtrip(old, new)
+        self.assertEqual(ops, [DiffOp(DiffOp.REPLACE, (0,), new.children[0])])
+
+    def test_insert_in_middle(self):
+        old = build_list(["one", "three"])
+        new = build_list(["one", "two", "three"])
+        ops = self.assert_roundtrip(old, new)
+        self.assertEqual([(op.op, op.path) for op in ops], [(DiffOp.INSERT, (0, 1))])
+
+    def test_delete_from_middle(self):
+        old = build_list(["one", "two", "three", "four"])
+        new = build_list(["one", "four"])
+        ops = self.assert_roundtrip(old, new)
+        self.assertEqual(
+            [(op.op, op.path) for op in ops],
+            [(DiffOp.DELETE, (0, 1)), (DiffOp.DELETE, (0, 1))],
+        )
+
+    def test_mixed_changes_roundtrip(self):
+        old = markdown_to_html_node("# A\n\npara one\n\n- x\n- y\n\n> quote")
+        new = markdown_to_html_node("# A\n\npara _one_\n\n- x\n- y\n- z\n\nnew para\n\n> quote")
+        self.assert_roundtrip(old, new)
+
+    def test_root_replacement(self):
+        old = LeafNode("p", "old")
+        new = LeafNode("p", "new")
+        ops = diff_trees(old, new)
+        self.assertEqual(ops, [DiffOp(DiffOp.REPLACE, (), new)])
+        self.assertIs(apply_diff(old, ops), new)
+
+    def test_diff_applies_to_factory_built_tree(self):
+        factory = NodeFactory()
+        old = markdown_to_html_node("# Title\n\n- one\n- two\n\nText", factory)
+        new = markdown_to_html_node("# Title\n\n- one\n- TWO\n- three\n\nText", factory)
+        before = old.to_html()
+
+        patched = apply_diff(old, diff_trees(old, new))
+        self.assertEqual(patched.to_html(), new.to_html())
+        # The shared nodes other pages may hold are left as they were
+        self.assertEqual(old.to_html(), before)
+        self.assertIs(patched.children[0], old.children[0])
+
+    def test_large_tree_single_change(self):
+        items = [f"item {i}" for i in range(20000)]
+        old = build_list(items)
+        items[12345] = "changed"
+        new = build_list(items)
+        ops = diff_trees(old, new)
+        self.assertEqual([(op.op, op.path) for op in ops], [(DiffOp.REPLACE, (0, 12345, 0))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from watcher import (
+    EVERYTHING,
+    IN_Q_OVERFLOW,
+    InotifyWatcher,
+    PollingWatcher,
+    _EVENT_HEADER,
+    create_watcher,
+    is_ignored,
+    wait_for_changes,
+)
+
+
+class WatcherTests:
+    """Tests shared by both watcher implementations."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.test_dir, "content")
+        self.template_path = os.path.join(self.test_dir, "template.html")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home")
+        self.write(self.template_path, "{{ Content }}")
+        self.watcher = self.make_watcher([self.content_dir], [self.template_path])
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_no_changes_times_out(self):
+        self.assertEqual(self.watcher.poll(0.05), set())
+
+    def test_modified_file(self):
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home page")
+        self.assertEqual(wait_for_changes(self.watcher, timeout=2),
+                         {os.path.join(self.content_dir, "index.md")})
+
+    def test_new_file_in_new_directory(self):
+        path = os.path.join(self.content_dir, "blog", "tom", "index.md")
+        self.write(path, "# Tom")
+        self.assertIn(path, wait_for_changes(self.watcher, timeout=2))
+
+    def test_deleted_file(self):
+        os.remove(os.path.join(self.content_dir, "index.md"))
+        self.assertEqual(wait_for_changes(self.watcher, timeout=2),
+                         {os.path.join(self.content_dir, "index.md")})
+
+    def test_single_file_and_ignored_files(self):
+        self.write(os.path.join(self.test_dir, "notes.txt"), "not watched")
+        self.write(os.path.join(self.content_dir, ".index.md.swp"), "swap")
+        self.write(self.template_path, "<main>{{ Content }}</main>")
+        self.assertEqual(wait_for_changes(self.watcher, timeout=2), {self.template_path})
+
+    def test_dot_directories_are_watched(self):
+        path = os.path.join(self.content_dir, ".well-known", "security.txt")
+        self.write(path, "Contact: mailto:security@example.com")
+        self.assertIn(path, wait_for_changes(self.watcher, timeout=2))
+
+    def test_add_files(self):
+        partial = os.path.join(self.test_dir, "partials", "nav.html")
+        self.write(partial, "<nav></nav>")
+        self.watcher.add_files([partial, self.template_path])
+        self.write(partial, "<nav>Home</nav>")
+        self.assertEqual(wait_for_changes(self.watcher, timeout=2), {partial})
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+
+    def make_watcher(self, dirs, files):
+        return PollingWatcher(dirs, files, interval=0.01)
+
+    def write(self, path, content):
+        super().write(path, content)
+        # Make the change visible even on filesystems with coarse mtimes
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def inotify_available():
+    watcher = create_watcher([])
+    watcher.close()
+    return isinstance(watcher, InotifyWatcher)
+
+
+@unittest.skipUnless(inotify_available(), "inotify is not available")
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+
+    def make_watcher(self, dirs, files):
+        return InotifyWatcher(dirs, files)
+
+    def test_queue_overflow_reports_everything(self):
+        # Directories created while events were dropped are watched afterwards
+        blog = os.path.join(self.content_dir, "blog")
+        os.makedirs(blog)
+        os.read(self.watcher._fd, 1 << 16)
+        overflow = _EVENT_HEADER.pack(-1, IN_Q_OVERFLOW, 0, 0)
+        self.assertEqual(list(self.watcher._parse(overflow)), [EVERYTHING])
+        self.write(os.path.join(blog, "index.md"), "# Blog")
+        self.assertEqual(wait_for_changes(self.watcher, timeout=2), {os.path.join(blog, "index.md")})
+
+
+class TestIsIgnored(unittest.TestCase):
+
+    def test_is_ignored(self):
+        self.assertTrue(is_ignored("/site/content/.index.md.swp"))
+        self.assertTrue(is_ignored("/site/content/.index.md.swx"))
+        self.assertTrue(is_ignored("/site/content/.#index.md"))
+        self.assertTrue(is_ignored("/site/content/index.md~"))
+        self.assertTrue(is_ignored("/site/docs/.index.html.4242-139871.tmp"))
+        self.assertFalse(is_ignored("/site/content/index.md"))
+        self.assertFalse(is_ignored("/site/static/.well-known/security.txt"))
+        self.assertFalse(is_ignored("/site/static/.htaccess"))
+
+
+if __name__ == "__main__":
+    unittest.main()
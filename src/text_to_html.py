@@ -2,12 +2,15 @@ from textnode import TextType
 from htmlnode import LeafNode
 
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, factory=None, basepath=None):
     """
     Convert a TextNode to an HTMLNode (specifically a LeafNode).
     
     Args:
         text_node: A TextNode object with text, text_type, and optional url
+        factory: Optional NodeFactory used to share identical leaves
+        basepath: Optional site basepath; root-relative link and image URLs
+            are prefixed with it
         
     Returns:
         LeafNode: An HTMLNode representing the text node as HTML
@@ -16,26 +19,50 @@ def text_node_to_html_node(text_node):
         ValueError: If the TextNode has an unsupported text_type
     """
     if text_node.text_type == TextType.TEXT:
-        return LeafNode(None, text_node.text)
+        return _make_leaf(None, text_node.text, factory=factory)
     
     elif text_node.text_type == TextType.BOLD:
-        return LeafNode("b", text_node.text)
+        return _make_leaf("b", text_node.text, factory=factory)
     
     elif text_node.text_type == TextType.ITALIC:
-        return LeafNode("i", text_node.text)
+        return _make_leaf("i", text_node.text, factory=factory)
     
     elif text_node.text_type == TextType.CODE:
-        return LeafNode("code", text_node.text)
+        return _make_leaf("code", text_node.text, factory=factory)
     
     elif text_node.text_type == TextType.LINK:
         if text_node.url is None:
             raise ValueError("Link TextNode must have a URL")
-        return LeafNode("a", text_node.text, {"href": text_node.url})
+        url = resolve_url(text_node.url, basepath)
+        return _make_leaf("a", text_node.text, {"href": url}, factory=factory)
     
     elif text_node.text_type == TextType.IMAGE:
         if text_node.url is None:
             raise ValueError("Image TextNode must have a URL")
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        url = resolve_url(text_node.url, basepath)
+        return _make_leaf("img", "", {"src": url, "alt": text_node.text}, factory=factory)
     
     else:
         raise ValueError(f"Unsupported TextType: {text_node.text_type}")
+
+
+def resolve_url(url, basepath):
+    """
+    Prefix a root-relative URL with the site basepath.
+    
+    Absolute URLs, protocol-relative URLs ("//host/...") and relative paths
+    are returned unchanged, as is everything when basepath is None.
+    
+    Example:
+        resolve_url("/images/a.png", "/site/") -> "/site/images/a.png"
+    """
+    if basepath is None or not url.startswith("/") or url.startswith("//"):
+        return url
+    return basepath + url[1:]
+
+
+def _make_leaf(tag, value, props=None, factory=None):
+    """Create a LeafNode, or fetch the shared one when a factory is given."""
+    if factory is not None:
+        return factory.leaf(tag, value, props)
+    return LeafNode(tag, value, props)
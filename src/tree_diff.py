@@ -0,0 +1,217 @@
+from htmlnode import ParentNode
+
+
+class DiffOp:
+    """
+    A single change needed to turn one HTMLNode tree into another.
+
+    Paths are tuples of child indices starting at the root, so () is the root
+    itself and (2, 0) is the first child of the root's third child. Operations
+    are meant to be applied in the order they are emitted; each path refers to
+    the tree as it looks after the previous operations were applied.
+
+    Attributes:
+        op: One of "replace", "insert" or "delete"
+        path: Tuple of child indices addressing the affected node
+        node: The new node for "replace" and "insert", None for "delete"
+    """
+
+    REPLACE = "replace"
+    INSERT = "insert"
+    DELETE = "delete"
+
+    def __init__(self, op, path, node=None):
+        self.op = op
+        self.path = path
+        self.node = node
+
+    def __eq__(self, other):
+        return (self.op == other.op and
+                self.path == other.path and
+                self.node is other.node)
+
+    def __repr__(self):
+        return f"DiffOp({self.op}, {self.path}, {self.node})"
+
+
+def subtree_hash(node, memo=None):
+    """
+    Compute a structural hash for a node and everything below it.
+
+    Subtrees with different hashes differ, which lets the diff tell changed
+    subtrees apart without walking their children. Equal hashes can still
+    collide, so the diff confirms them node by node with _same_subtree.
+
+    Args:
+        node: HTMLNode to hash
+        memo: Optional dict mapping id(node) to an already computed hash
+
+    Returns:
+        Integer hash of the subtree
+    """
+    if memo is None:
+        memo = {}
+
+    node_id = id(node)
+    if node_id in memo:
+        return memo[node_id]
+
+    props = tuple(node.props.items()) if node.props else None
+    if node.children is None:
+        child_hashes = None
+    else:
+        child_hashes = tuple(subtree_hash(child, memo) for child in node.children)
+
+    result = hash((type(node).__name__, node.tag, node.value, props, child_hashes))
+    memo[node_id] = result
+    return result
+
+
+def diff_trees(old_root, new_root):
+    """
+    Compute a list of changes that turns old_root into new_root.
+
+    Identical subtrees are detected by their subtree hash, confirmed node by
+    node so a hash collision cannot hide a change, and skipped. Each node is
+    confirmed at most once, so this stays linear in the size of the trees.
+    Children are aligned by trimming their common prefix and suffix; the
+    remaining children are paired positionally and diffed recursively, and any
+    surplus becomes insert or delete operations.
+
+    Args:
+        old_root: HTMLNode tree from the previous render
+        new_root: HTMLNode tree from the current render
+
+    Returns:
+        List of DiffOp objects; an empty list means the trees are identical
+    """
+    old_memo = {}
+    new_memo = {}
+    ops = []
+    _diff_node(old_root, new_root, (), ops, old_memo, new_memo)
+    return ops
+
+
+def _same_shell(old_node, new_node):
+    """Check whether two nodes match apart from their children."""
+    return (type(old_node) is type(new_node) and
+            old_node.tag == new_node.tag and
+            old_node.value == new_node.value and
+            old_node.props == new_node.props and
+            (old_node.children is None) == (new_node.children is None))
+
+
+def _same_subtree(old_node, new_node, old_memo, new_memo):
+    """Check whether two subtrees are identical, comparing hashes before nodes."""
+    if old_node is new_node:
+        return True
+    if subtree_hash(old_node, old_memo) != subtree_hash(new_node, new_memo):
+        return False
+    if not _same_shell(old_node, new_node):
+        return False
+    if old_node.children is None:
+        return True
+    if len(old_node.children) != len(new_node.children):
+        return False
+    for old_child, new_child in zip(old_node.children, new_node.children):
+        if not _same_subtree(old_child, new_child, old_memo, new_memo):
+            return False
+    return True
+
+
+def _diff_node(old_node, new_node, path, ops, old_memo, new_memo):
+    """Append the operations for one pair of nodes to ops."""
+    if _same_subtree(old_node, new_node, old_memo, new_memo):
+        return
+
+    if not _same_shell(old_node, new_node) or old_node.children is None:
+        ops.append(DiffOp(DiffOp.REPLACE, path, new_node))
+        return
+
+    old_children = old_node.children
+    new_children = new_node.children
+    old_len = len(old_children)
+    new_len = len(new_children)
+
+    # Skip the unchanged prefix
+    start = 0
+    while (start < old_len and start < new_len and
+           _same_subtree(old_children[start], new_children[start], old_memo, new_memo)):
+        start += 1
+
+    # Skip the unchanged suffix
+    old_end = old_len
+    new_end = new_len
+    while (old_end > start and new_end > start and
+           _same_subtree(old_children[old_end - 1], new_children[new_end - 1], old_memo, new_memo)):
+        old_end -= 1
+        new_end -= 1
+
+    # Pair up the changed middle section positionally
+    old_middle = old_end - start
+    new_middle = new_end - start
+    paired = min(old_middle, new_middle)
+    for offset in range(paired):
+        index = start + offset
+        _diff_node(old_children[index], new_children[index], path + (index,),
+                   ops, old_memo, new_memo)
+
+    # Whatever is left over is either new or gone
+    for offset in range(paired, new_middle):
+        index = start + offset
+        ops.append(DiffOp(DiffOp.INSERT, path + (index,), new_children[index]))
+
+    for _ in range(paired, old_middle):
+        ops.append(DiffOp(DiffOp.DELETE, path + (start + paired,)))
+
+
+def apply_diff(root, ops):
+    """
+    Apply operations produced by diff_trees to a tree.
+
+    Nodes with a list of children are changed in place. Shared nodes from a
+    NodeFactory are immutable and hold their children in a tuple, so a
+    shared node on the path of an operation is rebuilt instead, with the
+    same class, tag and props; the shared original, which other pages may
+    use, is left untouched.
+
+    Args:
+        root: The old HTMLNode tree that was passed to diff_trees
+        ops: List of DiffOp objects
+
+    Returns:
+        The resulting root node (a new object if the root itself was replaced
+        or rebuilt)
+    """
+    for op in ops:
+        if not op.path:
+            if op.op != DiffOp.REPLACE:
+                raise ValueError(f"Cannot {op.op} the root node")
+            root = op.node
+            continue
+        root = _apply_op(root, op.path, op)
+
+    return root
+
+
+def _apply_op(node, path, op):
+    """Apply one operation below node and return the node to use in its place."""
+    if not isinstance(node, ParentNode):
+        raise ValueError(f"Invalid diff path: {op.path}")
+
+    children = node.children if isinstance(node.children, list) else list(node.children)
+    index = path[0]
+    if len(path) > 1:
+        children[index] = _apply_op(children[index], path[1:], op)
+    elif op.op == DiffOp.REPLACE:
+        children[index] = op.node
+    elif op.op == DiffOp.INSERT:
+        children.insert(index, op.node)
+    elif op.op == DiffOp.DELETE:
+        del children[index]
+    else:
+        raise ValueError(f"Unknown diff operation: {op.op}")
+
+    if children is node.children:
+        return node
+    return type(node)(node.tag, children, node.props)
@@ -0,0 +1,284 @@
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import time
+
+
+# inotify event flags from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[]
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Reported in place of paths when the watcher lost track of what changed;
+# never an absolute path, so it cannot clash with a real change
+EVERYTHING = "<everything>"
+
+
+# Emacs lock files (.#name), vim swap files (.name.swp, .swo, .swx),
+# backups (name~) and the temp files output.py renames into place
+# (.name.<pid>-<thread>.tmp). Other dot files, such as the contents of
+# static/.well-known/, are inputs like any other.
+_IGNORED = re.compile(r"^\.#|\.sw[pox]$|~$|^\..+\.\d+-\d+\.tmp$")
+
+
+def is_ignored(path):
+    """Editor swap files, backups and our own temp files are not changes."""
+    return _IGNORED.search(os.path.basename(path)) is not None
+
+
+class PollingWatcher:
+    """
+    Detects changes by comparing os.scandir snapshots of the watched paths.
+
+    Works everywhere, at the cost of one stat per file per poll.
+
+    Args:
+        dirs: Directories watched recursively
+        files: Individual files watched
+        interval: Seconds between scans
+    """
+
+    def __init__(self, dirs, files=(), interval=0.1):
+        self.dirs = [os.path.abspath(d) for d in dirs]
+        self.files = [os.path.abspath(f) for f in files]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def add_files(self, files):
+        """Watch more individual files, such as partials a template started to include."""
+        for path in files:
+            path = os.path.abspath(path)
+            if path not in self.files:
+                self.files.append(path)
+                self._stat_file(path, self._snapshot)
+
+    def _stat_file(self, path, snapshot):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+    def _scan(self):
+        snapshot = {}
+        for path in self.files:
+            self._stat_file(path, snapshot)
+
+        stack = [d for d in self.dirs if os.path.isdir(d)]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif not is_ignored(entry.path):
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout=None):
+        """
+        Wait for changes.
+
+        Args:
+            timeout: Seconds to wait at most, or None to wait until something
+                changes
+
+        Returns:
+            Set of changed, created or deleted file paths (empty on timeout)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return set()
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Detects changes with Linux inotify, called through ctypes.
+
+    The kernel reports changes as they happen, so nothing is scanned after
+    the initial directory walk.
+
+    Args:
+        dirs: Directories watched recursively
+        files: Individual files watched (through their parent directory)
+
+    Raises:
+        OSError: If inotify is not available
+    """
+
+    def __init__(self, dirs, files=()):
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch descriptor -> (directory, recursive)
+        self._watches = {}
+        # Directory -> names of the individual files watched in it
+        self._files = {}
+        self._dirs = [os.path.abspath(path) for path in dirs]
+        try:
+            self.add_files(files)
+            for path in self._dirs:
+                if os.path.isdir(path):
+                    self._add_tree(path)
+        except OSError:
+            self.close()
+            raise
+
+    def add_files(self, files):
+        """Watch more individual files, such as partials a template started to include."""
+        for path in files:
+            directory, name = os.path.split(os.path.abspath(path))
+            if name not in self._files.get(directory, ()):
+                self._files.setdefault(directory, set()).add(name)
+                self._add_watch(directory, recursive=False)
+
+    def _add_watch(self, directory, recursive):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        # A directory watched for single files may also be watched recursively
+        previous = self._watches.get(wd)
+        self._watches[wd] = (directory, recursive or (previous is not None and previous[1]))
+
+    def _add_tree(self, directory):
+        """Watch a directory and everything below it; return the files found."""
+        found = []
+        for root, dirs, files in os.walk(directory):
+            self._add_watch(root, recursive=True)
+            found.extend(os.path.join(root, file) for file in files)
+        return found
+
+    def poll(self, timeout=None):
+        """
+        Wait for changes.
+
+        Args:
+            timeout: Seconds to wait at most, or None to wait until something
+                changes
+
+        Returns:
+            Set of changed, created or deleted file paths (empty on timeout),
+            or a set holding EVERYTHING if the kernel dropped events
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            changed.update(self._parse(data))
+        return {path for path in changed if not is_ignored(path)}
+
+    def _parse(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # The kernel's event queue filled up and events were dropped;
+                # directories created meanwhile are not watched yet either
+                for path in self._dirs:
+                    if os.path.isdir(path):
+                        self._add_tree(path)
+                yield EVERYTHING
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches or not name:
+                continue
+
+            directory, recursive = self._watches[wd]
+            path = os.path.join(directory, name)
+            if not recursive:
+                if name in self._files.get(directory, ()):
+                    yield path
+                continue
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land in a new directory before it is watched
+                    yield from self._add_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    # Stands for every file that was below it
+                    yield path
+                continue
+            yield path
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(dirs, files=(), interval=0.1):
+    """Return an InotifyWatcher where inotify works, else a PollingWatcher."""
+    try:
+        return InotifyWatcher(dirs, files)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(dirs, files, interval)
+
+
+def wait_for_changes(watcher, quiet=0.02, timeout=None):
+    """
+    Wait for a burst of changes to finish.
+
+    Editors and git checkouts touch many files at once; this keeps
+    collecting until no new change has arrived for `quiet` seconds, so one
+    burst causes one rebuild.
+
+    Returns:
+        Set of changed paths (empty if timeout passed without a change)
+    """
+    changed = watcher.poll(timeout)
+    while changed:
+        more = watcher.poll(quiet)
+        if not more:
+            break
+        changed |= more
+    return changed